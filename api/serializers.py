@@ -0,0 +1,130 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from courses.models import CourseSession, ExternalCourse, InternalCourse
+from fees.models import Fee
+
+
+def get_requested_fields(request):
+    """Returns the field names listed in the `fields` query parameter,
+    e.g. `?fields=slug,title`, or None if all fields are requested.
+    """
+    value = request.query_params.get("fields", "")
+    fields = {name.strip() for name in value.split(",") if name.strip()}
+    return fields or None
+
+
+class SparseFieldsMixin:
+    """Leaves out all fields that are not in `fields`"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class CourseSessionSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = CourseSession
+        fields = [
+            "id",
+            "title",
+            "date",
+            "start_time",
+            "end_time",
+            "is_dan_preparation",
+            "price_override",
+            "capacity",
+        ]
+
+
+class InternalCourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializes an internal course. The translations and the sessions
+    are read from prefetched rows.
+    """
+
+    title = serializers.CharField(read_only=True)
+    description = serializers.CharField(read_only=True)
+    location = serializers.CharField(read_only=True)
+    additional_info = serializers.CharField(read_only=True)
+    registration_status = serializers.CharField(
+        source="get_registration_status_display", read_only=True)
+    registration_url = serializers.SerializerMethodField()
+    sessions = CourseSessionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = InternalCourse
+        fields = [
+            "id",
+            "slug",
+            "title",
+            "description",
+            "location",
+            "additional_info",
+            "teacher",
+            "organizer",
+            "start_date",
+            "end_date",
+            "course_type",
+            "fee_category",
+            "registration_status",
+            "registration_start_date",
+            "registration_end_date",
+            "registration_url",
+            "bank_transfer_until",
+            "discount_percentage",
+            "dan_discount",
+            "has_dan_preparation",
+            "has_dinner",
+            "capacity",
+            "flyer",
+            "updated_at",
+            "sessions",
+        ]
+
+    def get_registration_url(self, course):
+        url = reverse("register_course", kwargs={"slug": course.slug})
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+class ExternalCourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    title = serializers.CharField(read_only=True)
+    description = serializers.CharField(read_only=True)
+    location = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ExternalCourse
+        fields = [
+            "id",
+            "slug",
+            "title",
+            "description",
+            "location",
+            "teacher",
+            "organizer",
+            "url",
+            "start_date",
+            "end_date",
+            "updated_at",
+        ]
+
+
+class FeeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    fee_type_display = serializers.CharField(
+        source="get_fee_type_display", read_only=True)
+
+    class Meta:
+        model = Fee
+        fields = [
+            "course_type",
+            "fee_category",
+            "fee_type",
+            "fee_type_display",
+            "amount",
+            "extra_fee_external",
+            "extra_fee_cash",
+        ]
@@ -0,0 +1,257 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from course_registrations.feed import DELETION_RETENTION
+from course_registrations.models import CourseRegistration
+from courses.models import CourseSession, ExternalCourse, InternalCourse
+from fees.models import Fee
+from users.models import User
+
+
+class ApiTest(TestCase):
+    """Tests for the read-only JSON API"""
+
+    def setUp(self):
+        # Parler caches translations by primary key
+        cache.clear()
+        self.course = self.create_course("Sommerlehrgang", days=10)
+        self.course.set_current_language("en")
+        self.course.title = "Summer course"
+        self.course.save()
+        self.session = CourseSession.objects.create(
+            title="Training",
+            course=self.course,
+            date=self.course.start_date,
+            capacity=20,
+        )
+        self.url = reverse("api:course_list")
+
+    def create_course(self, title, days, **kwargs):
+        values = {
+            "title": title,
+            "start_date": date.today() + timedelta(days=days),
+            "end_date": date.today() + timedelta(days=days + 1),
+            "course_type": "dan_bw_teacher",
+            "fee_category": "regular",
+            "status": 1,
+            **kwargs,
+        }
+        return InternalCourse.objects.create(**values)
+
+    def test_course_list(self):
+        print("\ntest_course_list")
+        self.create_course("Vorschau", days=20, status=0)
+        self.create_course("Vergangen", days=-10)
+        self.create_course("Veröffentlicht", days=30, status=0,
+                           publication_date=date.today())
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Access-Control-Allow-Origin"], "*")
+        results = response.json()["results"]
+        self.assertEqual(
+            [course["title"] for course in results],
+            ["Sommerlehrgang", "Veröffentlicht"],
+        )
+        self.assertEqual(results[0]["sessions"][0]["title"], "Training")
+        self.assertEqual(results[0]["sessions"][0]["capacity"], 20)
+        self.assertTrue(results[0]["registration_url"].startswith("http://testserver/"))
+
+    def test_language_selection(self):
+        print("\ntest_language_selection")
+        response = self.client.get(self.url, {"language": "en"})
+        self.assertEqual(response.json()["results"][0]["title"], "Summer course")
+
+        response = self.client.get(self.url, HTTP_ACCEPT_LANGUAGE="en")
+        self.assertEqual(response.json()["results"][0]["title"], "Summer course")
+
+        # Missing translations fall back to German
+        response = self.client.get(self.url, {"language": "en"})
+        self.assertEqual(
+            response.json()["results"][0]["sessions"][0]["title"], "Training")
+
+    def test_sparse_fields(self):
+        print("\ntest_sparse_fields")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as sparse_queries:
+            response = self.client.get(self.url, {"fields": "slug,title"})
+
+        self.assertEqual(
+            response.json()["results"],
+            [{"slug": self.course.slug, "title": "Sommerlehrgang"}],
+        )
+        # Sessions and their translations are not loaded
+        self.assertEqual(len(sparse_queries), len(queries) - 2)
+
+    def test_cursor_pagination(self):
+        print("\ntest_cursor_pagination")
+        for days in range(11, 14):
+            self.create_course(f"Lehrgang {days}", days=days)
+
+        first_page = self.client.get(self.url, {"page_size": 3}).json()
+        second_page = self.client.get(first_page["next"]).json()
+
+        titles = [course["title"] for course in first_page["results"] + second_page["results"]]
+        self.assertEqual(
+            titles,
+            ["Sommerlehrgang", "Lehrgang 11", "Lehrgang 12", "Lehrgang 13"],
+        )
+        self.assertIsNone(second_page["next"])
+
+    def test_query_count_does_not_grow_with_courses(self):
+        print("\ntest_query_count_does_not_grow_with_courses")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        query_count = len(queries)
+
+        for days in range(11, 16):
+            course = self.create_course(f"Lehrgang {days}", days=days)
+            CourseSession.objects.create(title="Training", course=course)
+
+        with self.assertNumQueries(query_count):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()["results"]), 6)
+
+    def test_etag(self):
+        print("\ntest_etag")
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.session.capacity = 10
+        self.session.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_course_detail(self):
+        print("\ntest_course_detail")
+        preview = self.create_course("Vorschau", days=20, status=0)
+
+        response = self.client.get(
+            reverse("api:course_detail", kwargs={"slug": self.course.slug}))
+        self.assertEqual(response.json()["title"], "Sommerlehrgang")
+        self.assertEqual(len(response.json()["sessions"]), 1)
+
+        response = self.client.get(
+            reverse("api:course_detail", kwargs={"slug": preview.slug}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_external_course_list(self):
+        print("\ntest_external_course_list")
+        ExternalCourse.objects.create(
+            title="Lehrgang in Paris",
+            start_date=date.today() + timedelta(days=5),
+            end_date=date.today() + timedelta(days=6),
+            organizer="FFAAA",
+            url="https://example.com",
+        )
+
+        response = self.client.get(reverse("api:external_course_list"))
+
+        course, = response.json()["results"]
+        self.assertEqual(course["title"], "Lehrgang in Paris")
+        self.assertEqual(course["url"], "https://example.com")
+
+    def test_fee_list(self):
+        print("\ntest_fee_list")
+        Fee.objects.create(
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+            fee_type="single_session",
+            amount=15,
+        )
+        Fee.objects.create(
+            course_type="children",
+            fee_category="regular",
+            fee_type="entire_course",
+            amount=10,
+        )
+        url = reverse("api:fee_list")
+        self.client.get(url)
+
+        # The fees are read from the cached fee matrix
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"course_type": "children"})
+
+        fee, = response.json()
+        self.assertEqual(fee["fee_type"], "entire_course")
+        self.assertEqual(fee["amount"], "10.00")
+
+        response = self.client.get(
+            url, {"course_type": "children"}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+@patch("course_registrations.feed.FEED_DELAY", timedelta(0))
+class RegistrationChangesTest(TestCase):
+    """Tests for the registration change feed endpoint"""
+
+    def setUp(self):
+        course = InternalCourse.objects.create(
+            title="Test course",
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.registration = CourseRegistration.objects.create(
+            course=course, email="guest@example.com", accept_terms=True)
+        self.user = User.objects.create_user(
+            username="treasurer", password="testpassword", is_staff=True)
+        self.user.user_permissions.add(
+            Permission.objects.get(codename="view_courseregistration"))
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse("api:registration_changes")
+
+    def get(self, token=None, **params):
+        headers = {}
+        if token:
+            headers["HTTP_AUTHORIZATION"] = f"Token {token.key}"
+        return self.client.get(self.url, params, **headers)
+
+    def test_requires_token(self):
+        print("\ntest_requires_token")
+        self.client.force_login(self.user)
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_requires_permission(self):
+        print("\ntest_requires_permission")
+        user = User.objects.create_user(username="user", password="testpassword")
+        response = self.get(Token.objects.create(user=user))
+        self.assertEqual(response.status_code, 403)
+
+    def test_changes(self):
+        print("\ntest_changes")
+        response = self.get(self.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["changed"][0]["id"], self.registration.pk)
+
+        pk = self.registration.pk
+        self.registration.delete()
+        response = self.get(self.token, cursor=response.json()["cursor"])
+        self.assertEqual(response.json()["changed"], [])
+        self.assertEqual(response.json()["deleted"], [pk])
+
+    def test_invalid_cursor(self):
+        print("\ntest_invalid_cursor")
+        response = self.get(self.token, cursor="invalid")
+        self.assertEqual(response.status_code, 400)
+
+    def test_expired_cursor(self):
+        print("\ntest_expired_cursor")
+        cursor = self.get(self.token).json()["cursor"]
+        later = timezone.now() + DELETION_RETENTION + timedelta(minutes=1)
+        with patch("django.utils.timezone.now", return_value=later):
+            response = self.get(self.token, cursor=cursor)
+        self.assertEqual(response.status_code, 410)
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = "api"
+
+urlpatterns = [
+    path("courses/", views.InternalCourseList.as_view(), name="course_list"),
+    path("courses/<slug:slug>/", views.InternalCourseDetail.as_view(), name="course_detail"),
+    path("external-courses/", views.ExternalCourseList.as_view(), name="external_course_list"),
+    path("fees/", views.FeeList.as_view(), name="fee_list"),
+    path("registrations/changes/", views.RegistrationChanges.as_view(), name="registration_changes"),
+]
@@ -0,0 +1,199 @@
+"""Read-only JSON API for embedding the courses on other websites.
+
+Every list page is loaded with a fixed number of queries. The language
+of the translated fields is selected with the `language` query
+parameter or the Accept-Language header. Anonymous requests get an ETag
+and are answered with 304 Not Modified while the data is unchanged.
+
+The registration change feed is the only endpoint that is not public.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import translation
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import generics, permissions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from course_registrations.feed import (
+    FEED_PAGE_SIZE,
+    MAX_FEED_PAGE_SIZE,
+    ExpiredCursor,
+    InvalidCursor,
+    get_changes,
+)
+from courses.models import Course, CourseSession, ExternalCourse, InternalCourse
+from courses.queries import published_courses_filter, translations_prefetch
+from danbw_website.conditional import content_condition
+from fees.cache import get_fee_matrix, get_fee_matrix_version
+
+from . import serializers
+
+
+def select_language(view):
+    """Activates the language of the `language` query parameter"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        language = request.GET.get("language")
+        if language in dict(settings.LANGUAGES):
+            with translation.override(language):
+                return view(request, *args, **kwargs)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def fee_etag(request, *args, **kwargs):
+    value = ":".join([
+        get_fee_matrix_version(),
+        request.get_full_path(),
+        translation.get_language() or "",
+    ])
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+class CoursePagination(CursorPagination):
+    ordering = ("start_date", "pk")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class PublicApiMixin:
+    """Read-only endpoint that other websites may call from JavaScript"""
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault(
+            "fields", serializers.get_requested_fields(self.request))
+        return super().get_serializer(*args, **kwargs)
+
+    def is_field_requested(self, name):
+        fields = serializers.get_requested_fields(self.request)
+        return fields is None or name in fields
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        response["Access-Control-Allow-Origin"] = "*"
+        return response
+
+
+class InternalCourseMixin(PublicApiMixin):
+    serializer_class = serializers.InternalCourseSerializer
+
+    def get_queryset(self):
+        queryset = InternalCourse.objects.filter(
+            published_courses_filter()
+        ).prefetch_related(translations_prefetch(InternalCourse))
+        if self.is_field_requested("sessions"):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "sessions",
+                    queryset=CourseSession.objects.prefetch_related(
+                        translations_prefetch(CourseSession)
+                    ),
+                )
+            )
+        return queryset
+
+
+@method_decorator(
+    [select_language, content_condition(Course, CourseSession)], name="dispatch")
+class InternalCourseList(InternalCourseMixin, generics.ListAPIView):
+    """Lists the published internal courses that have not ended yet"""
+
+    pagination_class = CoursePagination
+
+    def paginate_queryset(self, queryset):
+        courses = super().paginate_queryset(queryset)
+        # The registration status is computed from the course dates
+        today = date.today()
+        for course in courses:
+            course.apply_date_transitions(today)
+        return courses
+
+
+@method_decorator(
+    [select_language, content_condition(Course, CourseSession)], name="dispatch")
+class InternalCourseDetail(InternalCourseMixin, generics.RetrieveAPIView):
+    """Shows a published internal course with its sessions"""
+
+    lookup_field = "slug"
+
+    def get_object(self):
+        course = super().get_object()
+        course.apply_date_transitions()
+        return course
+
+
+@method_decorator(
+    [select_language, content_condition(Course)], name="dispatch")
+class ExternalCourseList(PublicApiMixin, generics.ListAPIView):
+    """Lists the external courses that have not ended yet"""
+
+    serializer_class = serializers.ExternalCourseSerializer
+    pagination_class = CoursePagination
+
+    def get_queryset(self):
+        return ExternalCourse.objects.filter(
+            end_date__gte=date.today()
+        ).prefetch_related(translations_prefetch(ExternalCourse))
+
+
+@method_decorator([select_language, condition(etag_func=fee_etag)], name="dispatch")
+class FeeList(PublicApiMixin, generics.GenericAPIView):
+    """Lists the fees, optionally of one course type and fee category.
+    The fees are read from the cached fee matrix.
+    """
+
+    serializer_class = serializers.FeeSerializer
+
+    def get(self, request):
+        course_type = request.query_params.get("course_type")
+        fee_category = request.query_params.get("fee_category")
+        fees = [
+            fee for fee in get_fee_matrix().values()
+            if (course_type is None or fee.course_type == course_type)
+            and (fee_category is None or fee.fee_category == fee_category)
+        ]
+        fees.sort(key=lambda fee: (fee.course_type, fee.fee_category or "", fee.fee_type))
+        serializer = self.get_serializer(fees, many=True)
+        return Response(serializer.data)
+
+
+class CanViewRegistrations(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.has_perm("course_registrations.view_courseregistration")
+
+
+class RegistrationChanges(APIView):
+    """Lists the registrations changed and deleted since the `cursor` of
+    the previous call. Requires a token of a user who may view course
+    registrations. Expired cursors are answered with 410 Gone, after
+    which the client syncs again without a cursor.
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated, CanViewRegistrations]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", FEED_PAGE_SIZE))
+        except ValueError:
+            limit = FEED_PAGE_SIZE
+        limit = min(max(limit, 1), MAX_FEED_PAGE_SIZE)
+
+        try:
+            changes = get_changes(request.query_params.get("cursor"), limit)
+        except ExpiredCursor as e:
+            return Response({"detail": str(e)}, status=status.HTTP_410_GONE)
+        except InvalidCursor as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(changes)
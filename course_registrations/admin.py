@@ -1,14 +1,19 @@
-import csv
 from datetime import date
 
 from django.contrib import admin
-from django.http import HttpResponse
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
-from courses.models import Course
+from courses.models import Course, CourseSession, InternalCourse
+from courses.queries import translations_prefetch
 from danbw_website import constants, utils
+from danbw_website.admin_actions import toggled, update_selected
 
 from .models import CourseRegistration
 
@@ -44,8 +49,9 @@ class CourseFilter(admin.SimpleListFilter):
     def lookups(self, request, model_admin):
         # Get distinct course IDs from registrations
         course_ids = CourseRegistration.objects.values_list('course', flat=True).distinct()
-        # Get course objects and let parler handle translation
-        courses = Course.objects.filter(id__in=course_ids).order_by('-start_date')
+        # Get course objects with their translations in a single prefetch query
+        courses = Course.objects.filter(id__in=course_ids).order_by(
+            '-start_date').prefetch_related(translations_prefetch(Course))
         # Use course ID as value, title as display (parler auto-translates)
         return tuple((str(course.id), course.title) for course in courses)
 
@@ -55,6 +61,29 @@ class CourseFilter(admin.SimpleListFilter):
         return queryset
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the planner's row estimate instead of COUNT(*)
+    for the unfiltered changelist of a large table on PostgreSQL.
+    """
+
+    # Below this many rows the exact count is cheap enough
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.estimate_threshold:
+                return int(row[0])
+        return super().count
+
+
 @admin.register(CourseRegistration)
 class CourseRegistrationAdmin(admin.ModelAdmin):
     list_display = [
@@ -72,6 +101,7 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
         "truncated_comment",
         "dinner",
         "overnight_stay",
+        "waitlisted",
         "registration_date",
     ]
     fields = [
@@ -97,6 +127,7 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
         "comment",
         "dinner",
         "overnight_stay",
+        "waitlisted",
     ]
     readonly_fields = [
         "registration_date",
@@ -120,12 +151,38 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
     ]
     search_fields = ["course__translations__title", "first_name", "last_name", "email"]
     list_filter = [FutureCourseFilter, CourseFilter, "payment_status",
-                   "payment_method", "exam"]
+                   "payment_method", "exam", "waitlisted"]
     ordering = ["-course__start_date", "-registration_date"]
+    list_select_related = ["course"]
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     actions = [
-        "toggle_payment_status", "export_csv"
+        "mark_paid", "mark_unpaid", "toggle_payment_status", "export_csv"
     ]
 
+    def get_queryset(self, request):
+        """Loads the translated course titles and selected sessions and
+        counts the course sessions in SQL for the session column
+        """
+        course_session_count = (
+            CourseSession.objects.filter(course=OuterRef("course_id"))
+            .order_by()
+            .values("course")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return super().get_queryset(request).annotate(
+            course_session_count=Coalesce(Subquery(course_session_count), 0),
+        ).prefetch_related(
+            translations_prefetch(InternalCourse, "course__translations"),
+            Prefetch(
+                "selected_sessions",
+                queryset=CourseSession.objects.prefetch_related(
+                    translations_prefetch(CourseSession)
+                ),
+            ),
+        )
+
     def registration_str(self, obj):
         return str(obj)
     registration_str.short_description = _("Name")
@@ -144,11 +201,26 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         return ("add" in request.path or "change" in request.path)
 
+    def mark_paid(self, request, queryset):
+        """Action for marking registrations as paid"""
+        update_selected(self, request, queryset, payment_status=1)
+
+    mark_paid.short_description = _("Mark selected registrations as paid")
+
+    def mark_unpaid(self, request, queryset):
+        """Action for marking registrations as unpaid"""
+        update_selected(self, request, queryset, payment_status=0)
+
+    mark_unpaid.short_description = _("Mark selected registrations as unpaid")
+
     def toggle_payment_status(self, request, queryset):
         """Action for toggling the payment status of registrations"""
-        for registration in queryset:
-            registration.payment_status = not registration.payment_status
-            registration.save()
+        update_selected(
+            self,
+            request,
+            queryset,
+            payment_status=toggled(CourseRegistration, "payment_status"),
+        )
 
     toggle_payment_status.short_description = _(
         "Toggle payment status of selected registrations"
@@ -157,15 +229,8 @@ class CourseRegistrationAdmin(admin.ModelAdmin):
     def export_csv(self, request, queryset):
         """Action for exporting course registrations to CSV"""
 
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = (
-            f"attachment; filename={_('csv_export')}_{slugify(date.today())}.csv"
-        )
-        writer = csv.writer(response)
-
-        utils.write_registrations_csv(writer, queryset)
-
-        return response
+        return utils.stream_registrations_csv(
+            queryset, f"{_('csv_export')}_{slugify(date.today())}.csv")
 
     export_csv.short_description = _(
         "Export selected course registrations to CSV")
@@ -6,3 +6,6 @@ class CourseRegistrationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'course_registrations'
     verbose_name = _("Course Registrations")
+
+    def ready(self):
+        from . import signals
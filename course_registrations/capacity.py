@@ -0,0 +1,192 @@
+"""Seat reservation for courses and sessions with a limited capacity.
+
+Registrations for a course with a capacity, or for a session with a
+capacity, are counted and saved while the course row is locked, so two
+simultaneous registrations can never take the last seat twice. Once the
+course or a selected session is full, new registrations are put on the
+waitlist. When a registration is cancelled, the oldest waitlisted
+registrations that fit are moved off the waitlist.
+"""
+import time
+
+from django.db import OperationalError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from courses.models import CourseSession, InternalCourse
+from danbw_website.utils import send_waitlist_promotion
+
+from .models import CourseRegistration
+
+# Attempts to acquire the course lock before giving up
+LOCK_ATTEMPTS = 5
+
+# Seconds to wait before the next attempt, multiplied by the attempt
+LOCK_RETRY_DELAY = 0.05
+
+
+def lock_course(course_id):
+    """Locks the course row until the end of the transaction.
+
+    The lock is taken with an UPDATE that writes the row back unchanged,
+    which locks the row on PostgreSQL and the database on SQLite, where
+    SELECT ... FOR UPDATE is not supported.
+    """
+    InternalCourse.objects.filter(pk=course_id).update(
+        registration_status=F("registration_status"))
+
+
+def run_locked(course_id, func):
+    """Calls `func` in a transaction that holds the lock on the course
+    and returns its result.
+
+    SQLite reports a busy database instead of waiting for the lock, so
+    the whole transaction is retried a few times. Inside an outer
+    transaction the error is raised right away.
+    """
+    retry = not transaction.get_connection().in_atomic_block
+    for attempt in range(1, LOCK_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                lock_course(course_id)
+                return func()
+        except OperationalError:
+            if not retry or attempt == LOCK_ATTEMPTS:
+                raise
+            time.sleep(LOCK_RETRY_DELAY * attempt)
+
+
+def full(queryset):
+    """Filters courses or sessions down to those without a free seat.
+    Waitlisted registrations don't take a seat.
+    """
+    taken = Count(
+        "courseregistration",
+        filter=Q(courseregistration__waitlisted=False),
+    )
+    return (
+        queryset.filter(capacity__isnull=False)
+        .alias(taken=taken)
+        .filter(taken__gte=F("capacity"))
+    )
+
+
+def is_course_full(course_id):
+    return full(InternalCourse.objects.filter(pk=course_id)).exists()
+
+
+def is_session_full(session_ids):
+    """Returns True if any of the given sessions is full"""
+    return full(CourseSession.objects.filter(pk__in=session_ids)).exists()
+
+
+def has_capacity(course, sessions):
+    return course.capacity is not None or any(
+        session.capacity is not None for session in sessions)
+
+
+def save_registration(registration, selected_sessions):
+    """Saves a new registration together with its selected sessions.
+
+    If the course or one of the selected sessions is full, the
+    registration is saved on the waitlist. Duplicate registrations raise
+    IntegrityError. Returns the registration.
+    """
+    course = registration.course
+    selected_sessions = list(selected_sessions)
+
+    if not has_capacity(course, selected_sessions):
+        with transaction.atomic():
+            registration.save()
+            registration.selected_sessions.set(selected_sessions)
+        return registration
+
+    def reserve():
+        # A failed attempt may have assigned a primary key
+        registration.pk = None
+        registration.waitlisted = (
+            is_course_full(course.pk)
+            or is_session_full([session.pk for session in selected_sessions])
+        )
+        registration.save()
+        registration.selected_sessions.set(selected_sessions)
+        return registration
+
+    return run_locked(course.pk, reserve)
+
+
+def update_registration(registration, selected_sessions, previous_session_ids):
+    """Saves a changed registration together with its selected sessions.
+
+    Newly selected sessions must have a free seat unless the registration
+    is on the waitlist. Seats freed by deselected sessions go to the
+    waitlist. Returns the full sessions, in which case nothing is saved.
+    """
+    course = registration.course
+    selected_sessions = list(selected_sessions)
+    added = [
+        session for session in selected_sessions
+        if session.pk not in previous_session_ids
+    ]
+    removed = previous_session_ids - {session.pk for session in selected_sessions}
+
+    def update():
+        if not registration.waitlisted and added:
+            full_sessions = list(full(CourseSession.objects.filter(
+                pk__in=[session.pk for session in added])))
+            if full_sessions:
+                return full_sessions
+        registration.save()
+        registration.selected_sessions.set(selected_sessions)
+        if removed and not registration.waitlisted:
+            promote_waitlisted(course.pk)
+        return []
+
+    if not has_capacity(course, course.sessions.all()):
+        with transaction.atomic():
+            return update()
+    return run_locked(course.pk, update)
+
+
+def promote_waitlisted(course_id):
+    """Moves the oldest waitlisted registrations of the course that fit
+    into the free seats off the waitlist and notifies the participants.
+    Must be called with the course locked. Returns the promoted
+    registrations.
+    """
+    promoted = []
+    waitlist = (
+        CourseRegistration.objects.filter(course_id=course_id, waitlisted=True)
+        .select_related("user", "course")
+        .prefetch_related("selected_sessions")
+        .order_by("registration_date", "pk")
+    )
+    for registration in waitlist:
+        if is_course_full(course_id):
+            break
+        session_ids = [session.pk for session in registration.selected_sessions.all()]
+        if is_session_full(session_ids):
+            continue
+        CourseRegistration.objects.filter(pk=registration.pk).update(
+            waitlisted=False, updated_at=timezone.now())
+        registration.waitlisted = False
+        send_waitlist_promotion(registration)
+        promoted.append(registration)
+    return promoted
+
+
+def delete_registration(registration):
+    """Deletes the registration and gives its seat to the waitlist.
+    Returns the promoted registrations.
+    """
+    if registration.waitlisted:
+        registration.delete()
+        return []
+
+    pk = registration.pk
+
+    def release():
+        CourseRegistration.objects.filter(pk=pk).delete()
+        return promote_waitlisted(registration.course_id)
+
+    return run_locked(registration.course_id, release)
@@ -0,0 +1,112 @@
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils.translation import gettext as _
+
+from courses.models import AccommodationOption, CourseSession
+from courses.queries import translations_prefetch
+from danbw_website import constants
+from fees.cache import get_course_fees
+
+
+class RegistrationContext:
+    """Everything the registration form of a course needs, loaded once per
+    request.
+
+    The sessions and accommodation options are prefetched on the course,
+    so the form choices, the form validation, the fee calculation and the
+    template all read the same rows. With a `registration`, the ids of
+    its selected sessions are loaded as well.
+    """
+
+    def __init__(self, course, registration=None):
+        lookups = [
+            Prefetch(
+                "sessions",
+                queryset=CourseSession.objects.prefetch_related(
+                    translations_prefetch(CourseSession)
+                ),
+            ),
+        ]
+        if course.course_type == "family_reunion":
+            lookups.append(
+                Prefetch(
+                    "accommodation_options",
+                    queryset=AccommodationOption.objects.prefetch_related(
+                        translations_prefetch(AccommodationOption)
+                    ),
+                )
+            )
+        prefetch_related_objects([course], *lookups)
+
+        self.course = course
+        self.sessions = course.sessions.all()
+        if course.course_type == "family_reunion":
+            self.accommodation_options = course.accommodation_options.all()
+        else:
+            self.accommodation_options = AccommodationOption.objects.none()
+
+        self.fees = get_course_fees(course.course_type, course.fee_category)
+        # A course is free if all of its fees are 0
+        self.is_free_course = all(
+            fee.amount == 0 and fee.extra_fee_cash == 0 and fee.extra_fee_external == 0
+            for fee in self.fees
+        )
+
+        self.selected_session_ids = set()
+        if registration is not None and registration.pk:
+            self.selected_session_ids = set(
+                registration.selected_sessions.values_list("pk", flat=True))
+
+    def get_course_data(self):
+        """Returns the course data passed to the fee calculation in
+        JavaScript
+        """
+        course = self.course
+        course_data = {
+            "course_type": course.course_type,
+            "fee_category": course.fee_category,
+            "fees": [
+                {
+                    "fee_type": fee.fee_type,
+                    "fee_type_display": fee.get_fee_type_display(),
+                    # Convert Decimal to float for JSON compatibility
+                    "amount": float(fee.amount),
+                    "extra_fee_cash": float(fee.extra_fee_cash),
+                    "extra_fee_external": float(fee.extra_fee_external)
+                }
+                for fee in self.fees
+            ],
+            "discount_percentage": course.discount_percentage,
+            "discount_display": _("reduced"),
+            "dan_member_display": _("D.A.N. Member"),
+            "course_has_dan_preparation": course.has_dan_preparation,
+        }
+
+        # Add accommodation options for family reunion courses
+        if course.course_type == "family_reunion":
+            course_data["accommodation_options"] = [
+                {
+                    "id": option.id,
+                    "name": option.name,
+                    "fee": float(option.fee)
+                }
+                for option in self.accommodation_options
+            ]
+        return course_data
+
+    def get_template_context(self, form):
+        """Prepares data to be passed to the template"""
+        course = self.course
+        if not self.fees:
+            raise ValueError(
+                f"No fees found for course type {course.course_type} and fee category {course.fee_category}"
+            )
+
+        return {
+            "course": course,
+            "form": form,
+            "course_data": self.get_course_data(),
+            "exam_courses": constants.EXAM_COURSES,
+            "dan_preparation_courses": constants.DAN_PREPARATION_COURSES,
+            "is_free_course": self.is_free_course,
+            "selected_session_ids": self.selected_session_ids,
+        }
@@ -0,0 +1,180 @@
+"""Change feed of course registrations for incremental syncs.
+
+A page of the feed lists the registrations that were created or changed
+and the ids of the registrations that were deleted since the position
+given by an opaque cursor. Both are read in the order of `updated_at`
+and `deleted_at` using their indexes. The cursor of each page is the
+position to continue from, so a sync only transfers what has changed
+since the previous one.
+
+Changes are only reported once they are `FEED_DELAY` old. A transaction
+that is still open while a page is read may write an `updated_at` that
+lies before the end of that page, and the delay makes sure it has been
+committed by then.
+
+Deletions are kept for `DELETION_RETENTION` and then removed by
+`prune_deletions()`. A cursor also records the time up to which its
+client has seen all deletions. Once that is further back than the
+retention, deletions may be missing after it and the cursor is rejected
+with ExpiredCursor, so the client has to sync again from the start.
+"""
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CourseRegistration, DeletedCourseRegistration
+
+FEED_DELAY = timedelta(seconds=10)
+
+# Default and maximum number of changes and deletions per page
+FEED_PAGE_SIZE = 500
+MAX_FEED_PAGE_SIZE = 5000
+
+# Deleted registrations are reported for this long
+DELETION_RETENTION = timedelta(days=90)
+
+CURSOR_SALT = "course_registrations.feed"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(InvalidCursor):
+    pass
+
+
+def encode_cursor(position):
+    return signing.dumps(position, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """Returns the position of the cursor as a dict with the keys
+    "changed" and "deleted", each None or a (timestamp, pk) tuple, and
+    "synced", the time up to which all deletions have been seen.
+    """
+    if not cursor:
+        return {"changed": None, "deleted": None, "synced": None}
+    try:
+        position = signing.loads(cursor, salt=CURSOR_SALT)
+        decoded = {
+            key: (
+                (datetime.fromisoformat(position[key][0]), position[key][1])
+                if position[key] else None
+            )
+            for key in ("changed", "deleted")
+        }
+        decoded["synced"] = datetime.fromisoformat(position["synced"])
+    except (signing.BadSignature, KeyError, TypeError, IndexError, ValueError):
+        raise InvalidCursor("Invalid cursor.")
+
+    if decoded["synced"] < timezone.now() - DELETION_RETENTION:
+        raise ExpiredCursor(
+            "The cursor has expired. Sync again without a cursor.")
+    return decoded
+
+
+def after(queryset, field_name, position):
+    """Filters the queryset down to the rows after the (timestamp, pk)
+    position in the order of `field_name` and pk.
+    """
+    if position is None:
+        return queryset
+    timestamp, pk = position
+    return queryset.filter(
+        Q(**{f"{field_name}__gt": timestamp})
+        | Q(**{field_name: timestamp, "pk__gt": pk})
+    )
+
+
+def registration_row(registration):
+    """Returns the fields of a registration that are relevant for
+    accounting
+    """
+    return {
+        "id": registration.pk,
+        "course": registration.course.slug,
+        "user": registration.user_id,
+        "first_name": registration.first_name,
+        "last_name": registration.last_name,
+        "email": registration.email,
+        "registration_date": registration.registration_date.isoformat(),
+        "final_fee": str(registration.final_fee),
+        "deposit_paid": (
+            str(registration.deposit_paid)
+            if registration.deposit_paid is not None else None
+        ),
+        "discount": registration.discount,
+        "dan_member": registration.dan_member,
+        "payment_method": registration.get_payment_method_display(),
+        "payment_status": registration.get_payment_status_display(),
+        "attended": registration.attended,
+        "waitlisted": registration.waitlisted,
+        "updated_at": registration.updated_at.isoformat(),
+    }
+
+
+def get_changes(cursor=None, limit=FEED_PAGE_SIZE):
+    """Returns a page of the change feed as a dict with the changed
+    registrations, the ids of the deleted registrations, the cursor of
+    the next page and whether more changes are waiting. Raises
+    InvalidCursor for cursors that were not issued by the feed and
+    ExpiredCursor for cursors older than DELETION_RETENTION.
+    """
+    position = decode_cursor(cursor)
+    until = timezone.now() - FEED_DELAY
+
+    changed = list(
+        after(
+            CourseRegistration.objects.filter(updated_at__lte=until),
+            "updated_at",
+            position["changed"],
+        )
+        .select_related("course")
+        .order_by("updated_at", "pk")[:limit + 1]
+    )
+    deleted = list(
+        after(
+            DeletedCourseRegistration.objects.filter(deleted_at__lte=until),
+            "deleted_at",
+            position["deleted"],
+        )
+        .order_by("deleted_at", "pk")[:limit + 1]
+    )
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed = changed[:limit]
+    deleted = deleted[:limit]
+
+    if changed:
+        position["changed"] = (changed[-1].updated_at, changed[-1].pk)
+    if deleted:
+        position["deleted"] = (deleted[-1].deleted_at, deleted[-1].pk)
+    # All deletions up to `until` have been listed unless the page is full
+    if len(deleted) < limit:
+        synced = until
+    else:
+        synced = position["deleted"][0]
+
+    cursor = {
+        key: (position[key][0].isoformat(), position[key][1]) if position[key] else None
+        for key in ("changed", "deleted")
+    }
+    cursor["synced"] = synced.isoformat()
+    return {
+        "changed": [registration_row(registration) for registration in changed],
+        "deleted": [tombstone.registration_id for tombstone in deleted],
+        "cursor": encode_cursor(cursor),
+        "has_more": has_more,
+    }
+
+
+def prune_deletions():
+    """Removes the deletions older than DELETION_RETENTION and returns
+    their number
+    """
+    cutoff = timezone.now() - DELETION_RETENTION
+    count, _ = DeletedCourseRegistration.objects.filter(
+        deleted_at__lt=cutoff).delete()
+    return count
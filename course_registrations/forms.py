@@ -1,21 +1,95 @@
 import random
 from django import forms
 from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 from django.utils.translation import gettext_lazy as _
 
-from courses.models import AccommodationOption, CourseSession
 from danbw_website import constants, utils
 
+from .context import RegistrationContext
 from .models import CourseRegistration
 
 
+class LoadedChoiceIterator(ModelChoiceIterator):
+    """Iterates over the rows of the queryset instead of running it again"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.queryset:
+            yield self.choice(obj)
+
+
+class LoadedChoicesMixin:
+    """Takes the choices of a model choice field from its queryset once
+    and validates submitted values against them without querying the
+    database again.
+    """
+
+    iterator = LoadedChoiceIterator
+
+    def _set_queryset(self, queryset):
+        # Unlike ModelChoiceField, keep the rows of an evaluated queryset
+        self._queryset = queryset
+        self.widget.choices = self.choices
+
+    queryset = property(forms.ModelChoiceField._get_queryset, _set_queryset)
+
+    def get_loaded_objects(self):
+        key = self.to_field_name or "pk"
+        return {str(getattr(obj, key)): obj for obj in self.queryset}
+
+
+class LoadedModelChoiceField(LoadedChoicesMixin, forms.ModelChoiceField):
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, self.to_field_name or "pk")
+        try:
+            return self.get_loaded_objects()[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+
+
+class LoadedModelMultipleChoiceField(LoadedChoicesMixin, forms.ModelMultipleChoiceField):
+    def _check_values(self, value):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise ValidationError(
+                self.error_messages["invalid_list"],
+                code="invalid_list",
+            )
+        objects = self.get_loaded_objects()
+        for val in value:
+            if str(val) not in objects:
+                raise ValidationError(
+                    self.error_messages["invalid_choice"],
+                    code="invalid_choice",
+                    params={"value": val},
+                )
+        selected = {str(val) for val in value}
+        return [obj for key, obj in objects.items() if key in selected]
+
+
 class CourseRegistrationForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         course = kwargs.pop("course", None)
+        registration_context = kwargs.pop("registration_context", None)
         user_profile = kwargs.pop("user_profile", None)
         captcha_target_display = kwargs.pop("captcha_target_display", None)
         super().__init__(*args, **kwargs)
 
+        if registration_context is None:
+            registration_context = RegistrationContext(course)
+        course = registration_context.course
+        self.registration_context = registration_context
+
         self.course = course
         self.user_profile = user_profile
 
@@ -28,9 +102,7 @@ class CourseRegistrationForm(forms.ModelForm):
             self.captcha_target_display = _("AI")
 
         if course:
-            self.fields["selected_sessions"].queryset = CourseSession.objects.filter(
-                course=course
-            )
+            self.fields["selected_sessions"].queryset = registration_context.sessions
 
             self.fields["dinner"] = forms.BooleanField(
                 required=False, label=_("I would like to join the dinner on Saturday evening."))
@@ -61,15 +133,15 @@ class CourseRegistrationForm(forms.ModelForm):
         if user_profile and user_profile.grade >= 6:
             self.fields["exam"].disabled = True
 
+        self.fields["accommodation_option"].queryset = (
+            registration_context.accommodation_options)
+
         # Disable payment method for family reunion (always bank transfer)
         if course.course_type == "family_reunion":
             self.fields["payment_method"].disabled = True
             self.fields["payment_method"].initial = constants.BANK
 
             # Configure accommodation options
-            self.fields["accommodation_option"].queryset = AccommodationOption.objects.filter(
-                course=course
-            ).order_by("order")
             self.fields["accommodation_option"].required = True
             self.fields["accommodation_option"].label = _("Accommodation")
             self.fields["accommodation_option"].empty_label = _("Select accommodation option")
@@ -81,19 +153,8 @@ class CourseRegistrationForm(forms.ModelForm):
         if course.discount_percentage == 0:
             self.fields["discount"].widget = forms.HiddenInput()
 
-        # Check if course is completely free (all fees are 0)
-        from fees.models import Fee
-        fees = Fee.objects.filter(
-            course_type=course.course_type,
-            fee_category=course.fee_category
-        )
-        is_free_course = all(
-            fee.amount == 0 and fee.extra_fee_cash == 0 and fee.extra_fee_external == 0
-            for fee in fees
-        )
-
         # Hide payment method for completely free courses
-        if is_free_course:
+        if registration_context.is_free_course:
             self.fields["payment_method"].widget = forms.HiddenInput()
 
         # Make payment method not required (will be handled dynamically on frontend)
@@ -102,7 +163,7 @@ class CourseRegistrationForm(forms.ModelForm):
     accept_terms = forms.BooleanField(
         required=True, label=_("I accept the terms and conditions below.")
     )
-    selected_sessions = forms.ModelMultipleChoiceField(
+    selected_sessions = LoadedModelMultipleChoiceField(
         label=_("I will attend the following sessions:"),
         queryset=None,
         widget=forms.CheckboxSelectMultiple,
@@ -167,6 +228,9 @@ class CourseRegistrationForm(forms.ModelForm):
             "overnight_stay",
             "accommodation_option",
         ]
+        field_classes = {
+            "accommodation_option": LoadedModelChoiceField,
+        }
 
     def clean(self):
         cleaned_data = super().clean()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from course_registrations.feed import DELETION_RETENTION, prune_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove the deleted registrations older than "
+        f"{DELETION_RETENTION.days} days from the change feed. Cursors older "
+        "than that are rejected and the client has to sync in full. Run it daily."
+    )
+
+    def handle(self, *args, **kwargs):
+        count = prune_deletions()
+        self.stdout.write(f"Removed {count} deleted registration(s).")
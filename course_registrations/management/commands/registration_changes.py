@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from course_registrations.feed import FEED_PAGE_SIZE, InvalidCursor, get_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the course registrations changed and deleted since the given "
+        "cursor as JSON. Pass the cursor of the output to the next call."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cursor",
+            help="Cursor returned by the previous call. Omit it for all registrations.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=FEED_PAGE_SIZE,
+            help="Maximum number of changed and of deleted registrations",
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            changes = get_changes(kwargs["cursor"], kwargs["limit"])
+        except InvalidCursor as e:
+            raise CommandError(str(e))
+        self.stdout.write(json.dumps(changes, indent=2))
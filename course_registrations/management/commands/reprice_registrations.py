@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from course_registrations.repricing import reprice_registrations
+from courses.models import InternalCourse
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculate the final fee of all registrations of the given courses, "
+        "e.g. after a fee has been corrected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "slugs",
+            nargs="+",
+            help="Slugs of the courses whose registrations are repriced",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the changes without saving them",
+        )
+
+    def handle(self, *args, **kwargs):
+        slugs = kwargs["slugs"]
+        courses = list(InternalCourse.objects.filter(slug__in=slugs).only("pk", "slug"))
+
+        missing = set(slugs) - {course.slug for course in courses}
+        if missing:
+            raise CommandError(
+                f"Course(s) not found: {', '.join(sorted(missing))}")
+
+        course_slugs = {course.pk: course.slug for course in courses}
+        changes, errors = reprice_registrations(
+            courses, dry_run=kwargs["dry_run"])
+
+        for registration, old_fee, new_fee in changes:
+            self.stdout.write(
+                f"{course_slugs[registration.course_id]} #{registration.pk} {registration}: "
+                f"{old_fee} -> {new_fee}"
+            )
+        for registration, message in errors:
+            self.stderr.write(
+                f"{course_slugs[registration.course_id]} #{registration.pk} {registration}: {message}")
+
+        verb = "Would update" if kwargs["dry_run"] else "Updated"
+        self.stdout.write(
+            f"{verb} {len(changes)} registration(s), {len(errors)} error(s).")
@@ -1,11 +1,13 @@
 from django.db import models
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
 from courses.models import AccommodationOption, CourseSession, InternalCourse
 from danbw_website import constants
-from fees.models import Fee
+from fees import pricing
+from fees.cache import get_fee_matrix
 from users.models import User, UserProfile
 
 
@@ -146,6 +148,16 @@ class CourseRegistration(models.Model):
         null=True,
         help_text=_("Amount of deposit received from the participant. See 'Remaining Balance' below."),
     )
+    waitlisted = models.BooleanField(
+        _("Waitlist"),
+        default=False,
+        help_text=_("The course or one of the selected sessions was full at the time of registration."),
+    )
+    updated_at = models.DateTimeField(
+        _("Updated at"),
+        auto_now=True,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
@@ -165,154 +177,30 @@ class CourseRegistration(models.Model):
 
     def get_fee_type(self, course, selected_sessions):
         """Determine the fee type based on course type and selected sessions."""
-        entire_course_selected = len(
-            selected_sessions) == len(course.sessions.all())
-        entire_course_without_dan_prep_selected = selected_sessions.filter(
-            is_dan_preparation=True).count() == 0 and course.has_dan_preparation
-        single_day = len({session.date for session in selected_sessions}) == 1
-
-        fee_type = ""
-
-        if course.course_type == "sensei_emmerson":
-            if course.fee_category == "dan_seminar":
-                fee_type = "single_day" if single_day else "entire_course_dan_preparation" if course.has_dan_preparation else "entire_course"
-            elif entire_course_selected:
-                fee_type = "entire_course_dan_preparation" if course.has_dan_preparation else "entire_course"
-            elif entire_course_without_dan_prep_selected:
-                fee_type = "entire_course"
-            else:
-                fee_type = "single_session"
-
-        elif course.course_type == "hombu_dojo":
-            if entire_course_selected:
-                fee_type = "entire_course"
-            else:
-                fee_type = "single_day" if single_day else "entire_course"
-
-        elif course.course_type == "external_teacher":
-            if course.fee_category == "dan_seminar":
-                fee_type = "single_session"
-            elif entire_course_selected:
-                fee_type = "entire_course_dan_preparation" if course.has_dan_preparation else "entire_course"
-            elif entire_course_without_dan_prep_selected:
-                fee_type = "entire_course"
-            else:
-                fee_type = "single_session"
-
-        elif course.course_type == "dan_bw_teacher":
-            fee_type = "single_session"
-
-        elif course.course_type == "children":
-            fee_type = "entire_course"
-
-        elif course.course_type == "family_reunion":
-            # For family reunion: entire course = at least one session selected on each unique day
-            all_course_days = set(course.sessions.values_list('date', flat=True))
-            selected_days = set(selected_sessions.values_list('date', flat=True))
-            entire_course_selected = all_course_days == selected_days
-
-            has_dan_sessions = selected_sessions.filter(is_dan_preparation=True).exists()
-            if entire_course_selected:
-                fee_type = "entire_course_with_dan_seminar" if has_dan_sessions else "entire_course"
-            else:
-                fee_type = "single_day_with_dan_seminar" if has_dan_sessions else "single_day"
-
-        elif course.course_type == "other":
-            fee_type = "entire_course" if entire_course_selected else "single_session"
-
-        return fee_type
+        return pricing.get_fee_type(
+            pricing.course_info(course),
+            [pricing.session_info(session) for session in selected_sessions],
+        )
+
+    def price(self, course, selected_sessions, fee_matrix=None):
+        """Returns the PriceResult of this registration for the selected
+        sessions. See fees.pricing.price_registration.
+        """
+        return pricing.price_registration(
+            pricing.course_info(course),
+            [pricing.session_info(session) for session in selected_sessions],
+            fee_matrix if fee_matrix is not None else get_fee_matrix(),
+            payment_method=self.payment_method,
+            dan_member=self.dan_member,
+            discount=self.discount,
+            accommodation_fee=(
+                self.accommodation_option.fee if self.accommodation_option else None
+            ),
+        )
 
     def calculate_fees(self, course, selected_sessions):
         """Calculate the final fee for a course registration"""
-        final_fee = 0
-        fee_type = self.get_fee_type(course, selected_sessions)
-
-        if "single_session" in fee_type:
-            # Charge per session (e.g., for sensei_emmerson, external_teacher, dan_bw_teacher)
-            for session in selected_sessions:
-                if session.price_override is not None:
-                    session_fee = session.price_override
-                    fee_type_for_session = "single_session_dan_preparation" if session.is_dan_preparation else "single_session"
-                    try:
-                        fee_obj = Fee.objects.get(
-                            course_type=course.course_type,
-                            fee_category=course.fee_category,
-                            fee_type=fee_type_for_session,
-                        )
-                        if self.payment_method == constants.CASH:
-                            session_fee += fee_obj.extra_fee_cash
-                        if not self.dan_member:
-                            session_fee += fee_obj.extra_fee_external
-                    except Fee.DoesNotExist:
-                        pass
-                    final_fee += session_fee
-                else:
-                    fee_type = "single_session_dan_preparation" if session.is_dan_preparation else "single_session"
-                    # Check if fee exists (use None as default to distinguish from 0)
-                    fee = Fee.get_fee(
-                        course.course_type,
-                        course.fee_category,
-                        fee_type,
-                        self.payment_method,
-                        self.dan_member,
-                        default=None
-                    )
-                    if fee is None:
-                        raise ValueError(
-                            _(f"No fee found for {course.course_type}, {course.fee_category}, {fee_type}, payment method: {self.payment_method}, dan member: {self.dan_member}"))
-
-                    final_fee += fee
-
-        elif course.course_type == "family_reunion" and "single_day" in fee_type:
-            # Charge per unique day for family_reunion
-            # Group sessions by date
-            from collections import defaultdict
-            sessions_by_date = defaultdict(list)
-            for session in selected_sessions:
-                sessions_by_date[session.date].append(session)
-
-            # Charge for each day
-            for date, day_sessions in sessions_by_date.items():
-                has_dan_session = any(s.is_dan_preparation for s in day_sessions)
-                day_fee_type = "single_day_with_dan_seminar" if has_dan_session else "single_day"
-                # Check if fee exists (use None as default to distinguish from 0)
-                fee = Fee.get_fee(
-                    course.course_type,
-                    course.fee_category,
-                    day_fee_type,
-                    self.payment_method,
-                    self.dan_member,
-                    default=None
-                )
-                if fee is None:
-                    raise ValueError(
-                        _(f"No fee found for {course.course_type}, {course.fee_category}, {day_fee_type}, payment method: {self.payment_method}, dan member: {self.dan_member}"))
-
-                final_fee += fee
-
-        else:
-            # Charge once for entire course or other fixed fee types
-            # Check if fee exists (use None as default to distinguish from 0)
-            final_fee = Fee.get_fee(
-                course.course_type,
-                course.fee_category,
-                fee_type,
-                self.payment_method,
-                self.dan_member,
-                default=None
-            )
-            if final_fee is None:
-                raise ValueError(
-                    _(f"No fee found for {course.course_type}, {course.fee_category}, {fee_type}, payment method: {self.payment_method}, dan member: {self.dan_member}"))
-
-        # Apply discount to course fee
-        final_fee = float(final_fee) * (1 - course.discount_percentage / 100) if self.discount else float(final_fee)
-
-        # Add accommodation fee (not subject to discount)
-        if self.accommodation_option:
-            final_fee += float(self.accommodation_option.fee)
-
-        return final_fee
+        return self.price(course, selected_sessions).total
 
     def set_exam(self, user=None):
         if self.exam:
@@ -346,8 +234,11 @@ class CourseRegistration(models.Model):
         return f"{self.first_name} {self.last_name}"
 
     def truncated_session_display(self):
-        all_sessions = self.course.sessions.all()
-        if len(self.selected_sessions.all()) == len(all_sessions):
+        # The admin changelist annotates the number of course sessions
+        course_session_count = getattr(self, "course_session_count", None)
+        if course_session_count is None:
+            course_session_count = len(self.course.sessions.all())
+        if len(self.selected_sessions.all()) == course_session_count:
             return _("Entire Course")
         else:
             sessions = "\n".join([str(session)
@@ -370,3 +261,23 @@ class CourseRegistration(models.Model):
         deposit = self.deposit_paid if self.deposit_paid else 0
         return self.final_fee - deposit
     remaining_balance.short_description = _("Remaining Balance")
+
+
+class DeletedCourseRegistration(models.Model):
+    """Records the deletion of a course registration for the change feed"""
+
+    registration_id = models.BigIntegerField(
+        _("Registration ID"),
+    )
+    deleted_at = models.DateTimeField(
+        _("Deleted at"),
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = _("Deleted Course Registration")
+        verbose_name_plural = _("Deleted Course Registrations")
+
+    def __str__(self):
+        return f"#{self.registration_id}"
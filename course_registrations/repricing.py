@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from courses.models import CourseSession, InternalCourse
+from fees import pricing
+from fees.cache import get_fee_matrix
+
+from .models import CourseRegistration
+
+
+def reprice_registrations(courses, dry_run=False):
+    """Recalculates the final fee of all registrations of the given courses.
+
+    The courses and their sessions, the registrations and their selected
+    sessions are loaded with a fixed number of queries and the fee matrix
+    is read once. Changed fees are written with a single bulk update
+    unless `dry_run` is set.
+
+    Returns a tuple of (changes, errors): changes is a list of
+    (registration, old_fee, new_fee), errors a list of
+    (registration, message) for registrations that could not be priced.
+    """
+    course_ids = [course.pk for course in courses]
+    courses = InternalCourse.objects.filter(pk__in=course_ids).prefetch_related(
+        Prefetch("sessions", queryset=CourseSession.objects.order_by())
+    )
+    course_infos = {course.pk: pricing.course_info(course) for course in courses}
+    session_infos = {
+        session.pk: pricing.session_info(session)
+        for course in courses
+        for session in course.sessions.all()
+    }
+    fee_matrix = get_fee_matrix()
+
+    registrations = (
+        CourseRegistration.objects.filter(course_id__in=course_ids)
+        .select_related("accommodation_option")
+        .prefetch_related(
+            Prefetch(
+                "selected_sessions",
+                queryset=CourseSession.objects.order_by().only("pk"),
+            )
+        )
+        .order_by("course_id", "pk")
+    )
+
+    changes = []
+    errors = []
+    for registration in registrations:
+        accommodation_option = registration.accommodation_option
+        try:
+            new_fee = pricing.price_registration(
+                course_infos[registration.course_id],
+                [
+                    session_infos[session.pk]
+                    for session in registration.selected_sessions.all()
+                ],
+                fee_matrix,
+                payment_method=registration.payment_method,
+                dan_member=registration.dan_member,
+                discount=registration.discount,
+                accommodation_fee=(
+                    accommodation_option.fee if accommodation_option else None
+                ),
+            ).total
+        except ValueError as error:
+            errors.append((registration, str(error)))
+            continue
+
+        if new_fee != registration.final_fee:
+            changes.append((registration, registration.final_fee, new_fee))
+            registration.final_fee = new_fee
+
+    if changes and not dry_run:
+        # bulk_update() does not set auto_now fields
+        now = timezone.now()
+        for registration, _, _ in changes:
+            registration.updated_at = now
+
+        with transaction.atomic():
+            CourseRegistration.objects.bulk_update(
+                [registration for registration, _, _ in changes],
+                ["final_fee", "updated_at"],
+                batch_size=500,
+            )
+
+    return changes, errors
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import CourseRegistration, DeletedCourseRegistration
+
+
+@receiver(post_delete, sender=CourseRegistration)
+def registration_deleted(sender, instance, **kwargs):
+    DeletedCourseRegistration.objects.create(registration_id=instance.pk)
@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+
+from django.contrib.admin.models import LogEntry
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import CourseSession, InternalCourse
+from users.models import User
+
+from .models import CourseRegistration
+
+
+class CourseRegistrationAdminTest(TestCase):
+    """Tests for the CourseRegistrationAdmin changelist"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(
+            username="admin", password="testpassword", email="admin@example.com")
+        cls.courses = [
+            InternalCourse.objects.create(
+                title=f"Test course {i}",
+                start_date=date.today() + timedelta(days=i),
+                end_date=date.today() + timedelta(days=i + 1),
+                course_type="dan_bw_teacher",
+                fee_category="regular",
+            )
+            for i in range(3)
+        ]
+        cls.sessions = {
+            course.pk: [
+                CourseSession.objects.create(
+                    title=f"Session {i}", course=course, date=course.start_date)
+                for i in range(3)
+            ]
+            for course in cls.courses
+        }
+
+    def create_registrations(self, count):
+        offset = CourseRegistration.objects.count()
+        registrations = CourseRegistration.objects.bulk_create(
+            CourseRegistration(
+                course=self.courses[i % len(self.courses)],
+                email=f"guest-{i}@example.com",
+                first_name="Guest",
+                last_name=str(i),
+                accept_terms=True,
+                comment="A long comment that will be truncated in the list" if i % 2 else "",
+            )
+            for i in range(offset, offset + count)
+        )
+        through = CourseRegistration.selected_sessions.through
+        through.objects.bulk_create(
+            through(courseregistration_id=registration.pk, coursesession_id=session.pk)
+            for i, registration in enumerate(registrations)
+            for session in self.sessions[registration.course_id][:1 + i // 3 % 3]
+        )
+
+    def test_changelist_query_count_is_constant(self):
+        print("\ntest_changelist_query_count_is_constant")
+        self.client.force_login(self.admin_user)
+        url = reverse("admin:course_registrations_courseregistration_changelist")
+        self.create_registrations(5)
+        self.client.get(url)
+
+        # Session, user, filter courses and translations, count, page,
+        # course translations, selected sessions and their translations
+        with self.assertNumQueries(9):
+            self.client.get(url)
+
+        self.create_registrations(3000)
+        with self.assertNumQueries(9):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+        self.assertContains(response, "Ganzer Lehrgang")
+        self.assertContains(response, "Session 0")
+
+    def test_changelist_course_filter(self):
+        print("\ntest_changelist_course_filter")
+        self.client.force_login(self.admin_user)
+        self.create_registrations(6)
+        url = reverse("admin:course_registrations_courseregistration_changelist")
+
+        response = self.client.get(url, {"course": self.courses[1].pk})
+
+        self.assertEqual(response.context["cl"].result_count, 2)
+        self.assertContains(response, "Test course 2")
+
+    def test_mark_paid_action(self):
+        print("\ntest_mark_paid_action")
+        self.client.force_login(self.admin_user)
+        url = reverse("admin:course_registrations_courseregistration_changelist")
+        self.create_registrations(300)
+        selected = CourseRegistration.objects.filter(course=self.courses[0])
+
+        response = self.client.post(url, {
+            "action": "mark_paid",
+            "_selected_action": list(selected.values_list("pk", flat=True)),
+        }, follow=True)
+
+        self.assertEqual(selected.filter(payment_status=1).count(), 100)
+        self.assertEqual(
+            CourseRegistration.objects.filter(payment_status=1).count(), 100)
+        self.assertContains(response, "100")
+        log_entry = LogEntry.objects.get()
+        self.assertEqual(log_entry.user, self.admin_user)
+        self.assertIn("100", log_entry.object_repr)
+
+    def test_toggle_payment_status_action(self):
+        print("\ntest_toggle_payment_status_action")
+        self.client.force_login(self.admin_user)
+        url = reverse("admin:course_registrations_courseregistration_changelist")
+        self.create_registrations(2)
+        CourseRegistration.objects.filter(last_name="0").update(payment_status=1)
+
+        self.client.post(url, {
+            "action": "toggle_payment_status",
+            "_selected_action": list(
+                CourseRegistration.objects.values_list("pk", flat=True)),
+        })
+
+        self.assertEqual(
+            dict(CourseRegistration.objects.values_list("last_name", "payment_status")),
+            {"0": 0, "1": 1},
+        )
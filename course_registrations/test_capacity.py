@@ -0,0 +1,184 @@
+import threading
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from courses.models import CourseSession, InternalCourse
+from outbox.models import QueuedEmail
+
+from . import capacity
+from .models import CourseRegistration
+
+
+def create_course(**kwargs):
+    return InternalCourse.objects.create(
+        title="Test course",
+        start_date=date.today(),
+        end_date=date.today() + timedelta(days=1),
+        registration_status=1,
+        course_type="dan_bw_teacher",
+        fee_category="regular",
+        **kwargs,
+    )
+
+
+def register(course, sessions, number):
+    registration = CourseRegistration(
+        course=course,
+        email=f"guest{number}@example.com",
+        first_name="Guest",
+        last_name=str(number),
+        accept_terms=True,
+    )
+    return capacity.save_registration(registration, sessions)
+
+
+class CapacityTest(TestCase):
+    """Tests for the seat reservation and the waitlist"""
+
+    def setUp(self):
+        self.course = create_course(capacity=2)
+        self.session = CourseSession.objects.create(
+            title="Training", course=self.course, capacity=1)
+        self.session2 = CourseSession.objects.create(
+            title="Dinner", course=self.course)
+
+    def test_registrations_beyond_capacity_are_waitlisted(self):
+        print("\ntest_registrations_beyond_capacity_are_waitlisted")
+        first = register(self.course, [self.session2], 1)
+        second = register(self.course, [self.session2], 2)
+        third = register(self.course, [self.session2], 3)
+
+        self.assertFalse(first.waitlisted)
+        self.assertFalse(second.waitlisted)
+        self.assertTrue(third.waitlisted)
+        self.assertEqual(third.selected_sessions.get(), self.session2)
+
+    def test_full_session_waitlists_registration(self):
+        print("\ntest_full_session_waitlists_registration")
+        first = register(self.course, [self.session], 1)
+        second = register(self.course, [self.session, self.session2], 2)
+        third = register(self.course, [self.session2], 3)
+
+        self.assertFalse(first.waitlisted)
+        self.assertTrue(second.waitlisted)
+        self.assertFalse(third.waitlisted)
+
+    def test_course_without_capacity(self):
+        print("\ntest_course_without_capacity")
+        course = create_course()
+        session = CourseSession.objects.create(title="Training", course=course)
+
+        registrations = [register(course, [session], number) for number in range(3)]
+
+        self.assertFalse(any(registration.waitlisted for registration in registrations))
+
+    def test_cancellation_promotes_oldest_waitlisted_registration(self):
+        print("\ntest_cancellation_promotes_oldest_waitlisted_registration")
+        first = register(self.course, [self.session2], 1)
+        register(self.course, [self.session2], 2)
+        third = register(self.course, [self.session2], 3)
+        fourth = register(self.course, [self.session2], 4)
+
+        promoted = capacity.delete_registration(first)
+
+        self.assertEqual(promoted, [third])
+        third.refresh_from_db()
+        fourth.refresh_from_db()
+        self.assertFalse(third.waitlisted)
+        self.assertTrue(fourth.waitlisted)
+        self.assertEqual(
+            QueuedEmail.objects.get().to, ["guest3@example.com"])
+
+    def test_promotion_skips_registrations_for_full_sessions(self):
+        print("\ntest_promotion_skips_registrations_for_full_sessions")
+        register(self.course, [self.session], 1)
+        cancelled = register(self.course, [self.session2], 2)
+        second = register(self.course, [self.session, self.session2], 3)
+        third = register(self.course, [self.session2], 4)
+
+        promoted = capacity.delete_registration(cancelled)
+
+        self.assertEqual(promoted, [third])
+        second.refresh_from_db()
+        self.assertTrue(second.waitlisted)
+
+    def test_cancelling_waitlisted_registration_promotes_nobody(self):
+        print("\ntest_cancelling_waitlisted_registration_promotes_nobody")
+        for number in range(3):
+            register(self.course, [self.session2], number)
+        waitlisted = register(self.course, [self.session2], 3)
+
+        self.assertEqual(capacity.delete_registration(waitlisted), [])
+        self.assertEqual(
+            CourseRegistration.objects.filter(waitlisted=True).count(), 1)
+
+    def test_update_rejects_full_session(self):
+        print("\ntest_update_rejects_full_session")
+        register(self.course, [self.session], 1)
+        registration = register(self.course, [self.session2], 2)
+
+        full_sessions = capacity.update_registration(
+            registration, [self.session, self.session2], {self.session2.pk})
+
+        self.assertEqual(full_sessions, [self.session])
+        self.assertEqual(registration.selected_sessions.get(), self.session2)
+
+    def test_update_frees_session_seat(self):
+        print("\ntest_update_frees_session_seat")
+        first = register(self.course, [self.session, self.session2], 1)
+        second = register(self.course, [self.session], 2)
+
+        capacity.update_registration(
+            first, [self.session2], {self.session.pk, self.session2.pk})
+
+        second.refresh_from_db()
+        self.assertFalse(second.waitlisted)
+
+
+class ConcurrentRegistrationTest(TransactionTestCase):
+    """Registrations made at the same time must not exceed the capacity"""
+
+    # The in-memory test database reports a locked table right away
+    # instead of waiting for the lock like a database file
+    @patch.object(capacity, "LOCK_ATTEMPTS", 100)
+    @patch.object(capacity, "LOCK_RETRY_DELAY", 0.001)
+    def test_simultaneous_registrations_respect_capacity(self):
+        print("\ntest_simultaneous_registrations_respect_capacity")
+        course = create_course(capacity=5)
+        session = CourseSession.objects.create(
+            title="Training", course=course, capacity=3)
+        other_session = CourseSession.objects.create(
+            title="Dinner", course=course)
+        thread_count = 20
+        barrier = threading.Barrier(thread_count)
+        errors = []
+
+        def worker(number):
+            try:
+                barrier.wait()
+                sessions = [session] if number % 2 else [other_session]
+                register(course, sessions, number)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(thread_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        registrations = CourseRegistration.objects.filter(course=course)
+        self.assertEqual(registrations.count(), thread_count)
+        seated = registrations.filter(waitlisted=False)
+        self.assertEqual(seated.count(), 5)
+        self.assertLessEqual(
+            seated.filter(selected_sessions=session).count(), 3)
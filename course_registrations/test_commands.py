@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from courses.models import CourseSession, InternalCourse
+from fees.models import Fee
+from users.models import User, UserProfile
+
+from .models import CourseRegistration
+
+
+class RepriceRegistrationsCommandTest(TestCase):
+    """Tests for the reprice_registrations management command"""
+
+    def setUp(self):
+        self.fee = Fee.objects.create(
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+            fee_type="single_session",
+            amount=Decimal("10.00"),
+            extra_fee_external=Decimal("5.00"),
+        )
+        Fee.objects.create(
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+            fee_type="single_session_dan_preparation",
+            amount=Decimal("20.00"),
+        )
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=31),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.sessions = [
+            CourseSession.objects.create(
+                title=f"Session {i}",
+                course=self.course,
+                date=self.course.start_date,
+            )
+            for i in range(2)
+        ]
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword")
+        UserProfile.objects.create(user=self.user)
+        self.registration = CourseRegistration.objects.create(
+            user=self.user,
+            course=self.course,
+            accept_terms=True,
+            dan_member=True,
+        )
+        self.registration.selected_sessions.set(self.sessions)
+        self.registration.final_fee = self.registration.calculate_fees(
+            self.course, self.registration.selected_sessions.all())
+        self.registration.save()
+
+    def test_reprice_registrations(self):
+        print("\ntest_reprice_registrations")
+        self.fee.amount = Decimal("12.50")
+        self.fee.save()
+
+        updated_at = self.registration.updated_at
+
+        out = StringIO()
+        call_command("reprice_registrations", self.course.slug, stdout=out)
+
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.final_fee, Decimal("25.00"))
+        # Repriced registrations show up in the change feed
+        self.assertGreater(self.registration.updated_at, updated_at)
+        self.assertIn("20.00 -> 25.00", out.getvalue())
+        self.assertIn("Updated 1 registration(s), 0 error(s).", out.getvalue())
+
+    def test_reprice_registrations_dry_run(self):
+        print("\ntest_reprice_registrations_dry_run")
+        self.fee.amount = Decimal("12.50")
+        self.fee.save()
+
+        out = StringIO()
+        call_command(
+            "reprice_registrations", self.course.slug, "--dry-run", stdout=out)
+
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.final_fee, Decimal("20.00"))
+        self.assertIn("Would update 1 registration(s)", out.getvalue())
+
+    def test_reprice_registrations_query_count_is_constant(self):
+        print("\ntest_reprice_registrations_query_count_is_constant")
+        for i in range(20):
+            user = User.objects.create_user(
+                username=f"user{i}", password="testpassword",
+                email=f"user{i}@example.com")
+            UserProfile.objects.create(user=user)
+            registration = CourseRegistration.objects.create(
+                user=user, course=self.course, accept_terms=True)
+            registration.selected_sessions.set(self.sessions[:1 + i % 2])
+        self.fee.amount = Decimal("11.00")
+        self.fee.save()
+
+        # Course slugs, courses, sessions, registrations, selected sessions,
+        # fee matrix, savepoint, bulk update and savepoint release
+        with self.assertNumQueries(9):
+            call_command(
+                "reprice_registrations", self.course.slug, stdout=StringIO())
+
+        self.assertFalse(
+            CourseRegistration.objects.filter(dan_member=False)
+            .exclude(final_fee__in=[Decimal("16.00"), Decimal("32.00")])
+            .exists()
+        )
+
+    def test_reprice_registrations_unknown_course(self):
+        print("\ntest_reprice_registrations_unknown_course")
+        with self.assertRaises(CommandError):
+            call_command("reprice_registrations", "unknown", stdout=StringIO())
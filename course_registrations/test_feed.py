@@ -0,0 +1,173 @@
+import json
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from courses.models import InternalCourse
+
+from . import feed
+from .models import CourseRegistration, DeletedCourseRegistration
+
+
+@patch("course_registrations.feed.FEED_DELAY", timedelta(0))
+class RegistrationFeedTest(TestCase):
+    """Tests for the change feed of course registrations"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.registrations = [
+            self.create_registration(number) for number in range(3)
+        ]
+
+    def create_registration(self, number):
+        return CourseRegistration.objects.create(
+            course=self.course,
+            email=f"guest{number}@example.com",
+            first_name="Guest",
+            last_name=str(number),
+            accept_terms=True,
+        )
+
+    def test_first_sync_lists_all_registrations(self):
+        print("\ntest_first_sync_lists_all_registrations")
+        changes = feed.get_changes()
+
+        self.assertEqual(
+            [row["id"] for row in changes["changed"]],
+            [registration.pk for registration in self.registrations],
+        )
+        self.assertEqual(changes["changed"][0]["course"], self.course.slug)
+        self.assertEqual(changes["deleted"], [])
+        self.assertFalse(changes["has_more"])
+
+    def test_sync_lists_only_changes_since_cursor(self):
+        print("\ntest_sync_lists_only_changes_since_cursor")
+        cursor = feed.get_changes()["cursor"]
+        self.assertEqual(feed.get_changes(cursor)["changed"], [])
+
+        registration = self.registrations[1]
+        registration.payment_status = 1
+        registration.save()
+        new_registration = self.create_registration(3)
+        deleted_pk = self.registrations[0].pk
+        self.registrations[0].delete()
+
+        changes = feed.get_changes(cursor)
+
+        self.assertEqual(
+            [row["id"] for row in changes["changed"]],
+            [registration.pk, new_registration.pk],
+        )
+        self.assertEqual(changes["deleted"], [deleted_pk])
+
+        changes = feed.get_changes(changes["cursor"])
+        self.assertEqual(changes["changed"], [])
+        self.assertEqual(changes["deleted"], [])
+
+    def test_feed_is_paginated(self):
+        print("\ntest_feed_is_paginated")
+        changes = feed.get_changes(limit=2)
+        self.assertEqual(len(changes["changed"]), 2)
+        self.assertTrue(changes["has_more"])
+
+        changes = feed.get_changes(changes["cursor"], limit=2)
+        self.assertEqual(
+            [row["id"] for row in changes["changed"]], [self.registrations[2].pk])
+        self.assertFalse(changes["has_more"])
+
+    def test_registrations_with_the_same_timestamp(self):
+        print("\ntest_registrations_with_the_same_timestamp")
+        updated_at = self.registrations[0].updated_at
+        CourseRegistration.objects.update(updated_at=updated_at)
+
+        first = feed.get_changes(limit=1)
+        second = feed.get_changes(first["cursor"], limit=2)
+
+        self.assertEqual(
+            [row["id"] for row in first["changed"] + second["changed"]],
+            [registration.pk for registration in self.registrations],
+        )
+
+    def test_recent_changes_are_held_back(self):
+        print("\ntest_recent_changes_are_held_back")
+        with patch("course_registrations.feed.FEED_DELAY", timedelta(minutes=1)):
+            changes = feed.get_changes()
+
+        self.assertEqual(changes["changed"], [])
+        # The held back changes are listed by the next sync
+        self.assertEqual(len(feed.get_changes(changes["cursor"])["changed"]), 3)
+
+    def test_invalid_cursor(self):
+        print("\ntest_invalid_cursor")
+        with self.assertRaises(feed.InvalidCursor):
+            feed.get_changes("invalid")
+
+    def test_expired_cursor(self):
+        print("\ntest_expired_cursor")
+        cursor = feed.get_changes()["cursor"]
+        later = timezone.now() + feed.DELETION_RETENTION + timedelta(minutes=1)
+
+        with patch("django.utils.timezone.now", return_value=later):
+            with self.assertRaises(feed.ExpiredCursor):
+                feed.get_changes(cursor)
+            # A full sync issues a new cursor
+            cursor = feed.get_changes()["cursor"]
+            self.assertEqual(feed.get_changes(cursor)["changed"], [])
+
+    def test_cursor_of_full_deletion_page_keeps_its_position(self):
+        print("\ntest_cursor_of_full_deletion_page_keeps_its_position")
+        cursor = feed.get_changes()["cursor"]
+        for registration in self.registrations:
+            registration.delete()
+        DeletedCourseRegistration.objects.update(
+            deleted_at=timezone.now() - feed.DELETION_RETENTION + timedelta(minutes=1))
+
+        changes = feed.get_changes(cursor, limit=1)
+        self.assertTrue(changes["has_more"])
+
+        # The remaining deletions are older than the retention soon
+        later = timezone.now() + timedelta(minutes=2)
+        with patch("django.utils.timezone.now", return_value=later):
+            with self.assertRaises(feed.ExpiredCursor):
+                feed.get_changes(changes["cursor"])
+
+    def test_prune_deletions(self):
+        print("\ntest_prune_deletions")
+        old_pk, recent_pk = self.registrations[0].pk, self.registrations[1].pk
+        self.registrations[0].delete()
+        self.registrations[1].delete()
+        DeletedCourseRegistration.objects.filter(registration_id=old_pk).update(
+            deleted_at=timezone.now() - feed.DELETION_RETENTION - timedelta(days=1))
+
+        out = StringIO()
+        call_command("prune_registration_deletions", stdout=out)
+
+        self.assertIn("Removed 1 deleted registration(s).", out.getvalue())
+        self.assertEqual(
+            list(DeletedCourseRegistration.objects.values_list("registration_id", flat=True)),
+            [recent_pk],
+        )
+
+    def test_command(self):
+        print("\ntest_command")
+        out = StringIO()
+        call_command("registration_changes", "--limit", "2", stdout=out)
+        changes = json.loads(out.getvalue())
+        self.assertEqual(len(changes["changed"]), 2)
+
+        out = StringIO()
+        call_command("registration_changes", "--cursor", changes["cursor"], stdout=out)
+        self.assertEqual(len(json.loads(out.getvalue())["changed"]), 1)
+
+        with self.assertRaises(CommandError):
+            call_command("registration_changes", "--cursor", "invalid", stdout=StringIO())
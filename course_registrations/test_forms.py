@@ -3,10 +3,11 @@ from datetime import date, timedelta, time
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-from courses.models import CourseSession, InternalCourse
+from courses.models import AccommodationOption, CourseSession, InternalCourse
 from fees.models import Fee
 from users.models import User, UserProfile
 
+from .context import RegistrationContext
 from .forms import CourseRegistrationForm
 
 
@@ -362,3 +363,81 @@ class TestCourseRegistrationFormValidation(TestCase):
 
         # Verify that dojo is set to the display value
         self.assertEqual(form.cleaned_data["dojo"], "Aikido am Rhein")
+
+
+class TestRegistrationContext(TestCase):
+    """Tests for the form choices loaded by the registration context"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Course",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="family_reunion",
+            fee_category="family_reunion",
+        )
+        self.other_course = InternalCourse.objects.create(
+            title="Other course",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.sessions = [
+            CourseSession.objects.create(
+                title=f"Session {i}", course=self.course, date=date.today())
+            for i in range(3)
+        ]
+        self.other_session = CourseSession.objects.create(
+            title="Other session", course=self.other_course, date=date.today())
+        self.option = AccommodationOption.objects.create(
+            name="Zwei Nächte", course=self.course, fee=80)
+
+    def get_form(self, registration_context, **data):
+        return CourseRegistrationForm(
+            data={
+                "email": "guest@example.com",
+                "first_name": "Guest",
+                "last_name": "User",
+                "dojo": "AAR",
+                "grade": 1,
+                "accept_terms": True,
+                "payment_method": 0,
+                **data,
+            },
+            registration_context=registration_context,
+        )
+
+    def test_validation_uses_loaded_choices(self):
+        print("\ntest_validation_uses_loaded_choices")
+        registration_context = RegistrationContext(self.course)
+
+        form = self.get_form(
+            registration_context,
+            selected_sessions=[self.sessions[2].pk, self.sessions[0].pk],
+            accommodation_option=self.option.pk,
+        )
+        # Only the model validation checks the accommodation option
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid(), form.errors)
+            str(form["selected_sessions"])
+
+        self.assertEqual(
+            form.cleaned_data["selected_sessions"],
+            [self.sessions[0], self.sessions[2]],
+        )
+        self.assertEqual(form.cleaned_data["accommodation_option"], self.option)
+
+    def test_choices_of_other_courses_are_rejected(self):
+        print("\ntest_choices_of_other_courses_are_rejected")
+        registration_context = RegistrationContext(self.course)
+
+        form = self.get_form(
+            registration_context,
+            selected_sessions=[self.other_session.pk],
+            accommodation_option=self.option.pk + 1,
+        )
+
+        self.assertFalse(form.is_valid())
+        self.assertIn("selected_sessions", form.errors)
+        self.assertIn("accommodation_option", form.errors)
@@ -4,6 +4,7 @@ from decimal import Decimal
 from django.test import TestCase
 
 from courses.models import AccommodationOption, CourseSession, InternalCourse
+from fees.cache import invalidate_fee_matrix
 from fees.models import Fee
 from users.models import User, UserProfile
 
@@ -1108,6 +1109,8 @@ class TestCourseRegistrationErrorHandling(TestCase):
     """Tests for fee calculation error handling"""
 
     def setUp(self):
+        # Fees of earlier tests are rolled back without a post_delete signal
+        invalidate_fee_matrix()
         self.user = User.objects.create_user(
             username="testuser",
             password="testpassword",
@@ -1,10 +1,14 @@
 from datetime import date, datetime, timedelta
-from smtplib import SMTPException
-from unittest.mock import patch
+from io import StringIO
 
 from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import translation
 from django.utils.translation import gettext_lazy as _
 
 from danbw_website import constants
@@ -12,7 +16,7 @@ from courses.models import Course, CourseSession, InternalCourse
 from fees.models import Fee
 from users.models import User, UserProfile
 
-from .models import CourseRegistration
+from .models import CourseRegistration, DeletedCourseRegistration
 
 
 class RegisterCourseTest(TestCase):
@@ -75,6 +79,28 @@ class RegisterCourseTest(TestCase):
         # Session without override renders an empty attribute
         self.assertContains(response, 'data-price-override=""')
 
+    def test_query_count_does_not_grow_with_sessions(self):
+        print("\ntest_query_count_does_not_grow_with_sessions")
+        url = reverse("register_course", kwargs={"slug": self.course.slug})
+        # Without accepted terms the form is rendered again
+        data = {"selected_sessions": [self.session.pk], "payment_method": 0}
+        self.client.get(url)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as get_queries:
+                self.client.get(url)
+            with CaptureQueriesContext(connection) as post_queries:
+                response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 200)
+            return len(get_queries), len(post_queries)
+
+        query_counts = count_queries()
+        for i in range(10):
+            CourseSession.objects.create(
+                title=f"Session {i}", course=self.course, date=date.today())
+
+        self.assertEqual(count_queries(), query_counts)
+
     def test_get_registration_form_authenticated_with_profile(self):
         print("\ntest_get_registration_form_authenticated_with_profile")
         self.client.force_login(self.user)
@@ -142,14 +168,15 @@ class RegisterCourseTest(TestCase):
         self.course.save()
 
         # Create a DAN preparation session
-        CourseSession.objects.create(
-            title="DAN Prep Session",
-            course=self.course,
-            date=date.today(),
-            start_time=datetime.now().time(),
-            end_time=datetime.now().time(),
-            is_dan_preparation=True,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseSession.objects.create(
+                title="DAN Prep Session",
+                course=self.course,
+                date=date.today(),
+                start_time=datetime.now().time(),
+                end_time=datetime.now().time(),
+                is_dan_preparation=True,
+            )
 
         url = reverse("register_course", kwargs={"slug": self.course.slug})
         self.client.get(url)
@@ -157,6 +184,17 @@ class RegisterCourseTest(TestCase):
         self.course.refresh_from_db()
         self.assertTrue(self.course.has_dan_preparation)
 
+    def test_get_does_not_save_course(self):
+        print("\ntest_get_does_not_save_course")
+        self.client.force_login(self.user)
+        updated_at = InternalCourse.objects.get(pk=self.course.pk).updated_at
+
+        url = reverse("register_course", kwargs={"slug": self.course.slug})
+        self.client.get(url)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.updated_at, updated_at)
+
     def test_post_valid_registration_form(self):
         print("\ntest_post_valid_registration_form")
         url = reverse("register_course", kwargs={"slug": self.course.slug})
@@ -173,6 +211,12 @@ class RegisterCourseTest(TestCase):
         queryset = CourseRegistration.objects.all()
         self.assertEqual(len(queryset), 1)
 
+        # Emails are queued and sent by the outbox worker
+        self.assertEqual(len(mail.outbox), 0)
+        call_command("send_queued_emails", "--once", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["test@example.com"])
+
     def test_post_invalid_registration_form(self):
         print("\ntest_post_invalid_registration_form")
         url = reverse("register_course", kwargs={"slug": self.course.slug})
@@ -181,6 +225,29 @@ class RegisterCourseTest(TestCase):
         registrations = CourseRegistration.objects.all()
         self.assertEqual(len(registrations), 0)
 
+    def test_post_registration_for_full_course_is_waitlisted(self):
+        print("\ntest_post_registration_for_full_course_is_waitlisted")
+        self.course.capacity = 1
+        self.course.save()
+        CourseRegistration.objects.create(
+            course=self.course, email="guest@example.com", accept_terms=True)
+
+        url = reverse("register_course", kwargs={"slug": self.course.slug})
+        response = self.client.post(
+            url,
+            {
+                "selected_sessions": [self.session.id],
+                "accept_terms": True,
+                "exam": False,
+                "payment_method": 0,
+            },
+        )
+
+        self.assertRedirects(response, reverse("courseregistration_list"), 302, 200)
+        registration = CourseRegistration.objects.get(user=self.user)
+        self.assertTrue(registration.waitlisted)
+        self.assertEqual(registration.selected_sessions.get(), self.session)
+
     def test_auto_added_exam_grade(self):
         print("\ntest_auto_added_exam_grade")
         url = reverse("register_course", kwargs={"slug": self.course.slug})
@@ -521,67 +588,6 @@ class RegisterCourseTest(TestCase):
         messages_list = list(response.wsgi_request._messages)
         self.assertTrue(any("No fees found" in str(m) for m in messages_list))
 
-    @patch("danbw_website.utils.send_registration_confirmation")
-    def test_post_registration_smtp_error_confirmation(self, mock_send_confirmation):
-        print("\ntest_post_registration_smtp_error_confirmation")
-        # Mock SMTP error during confirmation email
-        mock_send_confirmation.side_effect = SMTPException("SMTP server error")
-
-        url = reverse("register_course", kwargs={"slug": self.course.slug})
-        response = self.client.post(
-            url,
-            {
-                "selected_sessions": [self.session.id],
-                "accept_terms": True,
-                "exam": False,
-                "payment_method": 0,
-            },
-        )
-
-        # Should render form with error
-        self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, "register_course.html")
-
-        # Registration should have been rolled back (deleted)
-        registrations = CourseRegistration.objects.filter(
-            course=self.course, user=self.user
-        )
-        self.assertEqual(registrations.count(), 0)
-
-        # Check form has error
-        form = response.context["form"]
-        self.assertTrue(form.errors)
-
-    @patch("danbw_website.utils.send_registration_notification")
-    @patch("danbw_website.utils.send_registration_confirmation")
-    def test_post_registration_smtp_error_notification(
-        self, mock_send_confirmation, mock_send_notification
-    ):
-        print("\ntest_post_registration_smtp_error_notification")
-        # Confirmation succeeds, notification fails
-        mock_send_notification.side_effect = SMTPException("SMTP server error")
-
-        url = reverse("register_course", kwargs={"slug": self.course.slug})
-        response = self.client.post(
-            url,
-            {
-                "selected_sessions": [self.session.id],
-                "accept_terms": True,
-                "exam": False,
-                "payment_method": 0,
-            },
-        )
-
-        # Should render form with error
-        self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, "register_course.html")
-
-        # Registration should have been rolled back (deleted)
-        registrations = CourseRegistration.objects.filter(
-            course=self.course, user=self.user
-        )
-        self.assertEqual(registrations.count(), 0)
-
 
 class CancelUserCourseRegistrationTest(TestCase):
     """Tests for CancelCouresRegistration view"""
@@ -642,6 +648,30 @@ class CancelUserCourseRegistrationTest(TestCase):
             messages,
         )
 
+    def test_cancel_promotes_waitlisted_registration(self):
+        print("\ntest_cancel_promotes_waitlisted_registration")
+        self.course.capacity = 1
+        self.course.save()
+        CourseRegistration.objects.filter(pk=self.registration2.pk).update(waitlisted=True)
+
+        self.client.post(
+            reverse("cancel_courseregistration", kwargs={"pk": self.registration.pk})
+        )
+
+        self.registration2.refresh_from_db()
+        self.assertFalse(self.registration2.waitlisted)
+
+    def test_cancel_records_deletion(self):
+        print("\ntest_cancel_records_deletion")
+        self.client.post(
+            reverse("cancel_courseregistration", kwargs={"pk": self.registration.pk})
+        )
+
+        self.assertTrue(
+            DeletedCourseRegistration.objects.filter(
+                registration_id=self.registration.pk).exists()
+        )
+
     def test_cancel_forbidden_course_registration_post(self):
         print("\ntest_cancel_forbidden_course_registration_post")
         response = self.client.post(
@@ -673,27 +703,6 @@ class CancelUserCourseRegistrationTest(TestCase):
         )
         self.assertEqual(response.status_code, 403)
 
-    @patch("danbw_website.utils.send_cancellation_notification")
-    def test_cancel_registration_smtp_error(self, mock_send_cancellation):
-        print("\ntest_cancel_registration_smtp_error")
-        # Mock SMTP error during cancellation notification
-        mock_send_cancellation.side_effect = SMTPException("SMTP server error")
-
-        response = self.client.post(
-            reverse("cancel_courseregistration", kwargs={"pk": self.registration.pk})
-        )
-
-        # Should redirect to courseregistration_list
-        self.assertRedirects(response, reverse("courseregistration_list"), 302, 200)
-
-        # Registration should NOT have been deleted
-        registrations = CourseRegistration.objects.filter(pk=self.registration.pk)
-        self.assertEqual(registrations.count(), 1)
-
-        # Check error message
-        messages = [m.message for m in get_messages(response.wsgi_request)]
-        self.assertTrue(any("SMTP server error" in str(m) for m in messages))
-
 
 class UpdateUserCourseRegistrationTest(TestCase):
     """Tests for UpdateUserCourseRegistration view"""
@@ -766,14 +775,15 @@ class UpdateUserCourseRegistrationTest(TestCase):
         )
 
         # Create DAN preparation session
-        dan_session = CourseSession.objects.create(
-            title="DAN Prep Session",
-            course=dan_prep_course,
-            date=date.today(),
-            start_time=datetime.now().time(),
-            end_time=datetime.now().time(),
-            is_dan_preparation=True,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            dan_session = CourseSession.objects.create(
+                title="DAN Prep Session",
+                course=dan_prep_course,
+                date=date.today(),
+                start_time=datetime.now().time(),
+                end_time=datetime.now().time(),
+                is_dan_preparation=True,
+            )
 
         # Create registration
         dan_registration = CourseRegistration.objects.create(
@@ -1129,6 +1139,55 @@ class ExportCourseRegistrationsTest(TestCase):
         self.assertIn("attachment", response["Content-Disposition"])
         self.assertIn("test-export-course", response["Content-Disposition"])
 
+    def test_export_registrations_uses_language_of_request(self):
+        print("\ntest_export_registrations_uses_language_of_request")
+        self.client.force_login(self.staff_user)
+        # The request activates its language, which is restored afterwards
+        with translation.override("en"):
+            url = reverse("export_course_registrations", kwargs={"slug": self.course.slug})
+            response = self.client.post(url, HTTP_ACCEPT_LANGUAGE="en")
+
+        # The content is consumed after the request has finished
+        with translation.override("de"):
+            content = b"".join(response.streaming_content).decode()
+
+        self.assertTrue(content.startswith("Course,"))
+
+    def test_export_registrations_streams_with_fixed_query_count(self):
+        print("\ntest_export_registrations_streams_with_fixed_query_count")
+        self.client.force_login(self.staff_user)
+        session = CourseSession.objects.create(
+            title="Export session", course=self.course, date=date.today())
+        self.registration.selected_sessions.add(session)
+        url = reverse("export_course_registrations", kwargs={"slug": self.course.slug})
+
+        with CaptureQueriesContext(connection) as queries:
+            b"".join(self.client.post(url).streaming_content)
+        query_count = len(queries)
+
+        for i in range(10):
+            user = User.objects.create_user(
+                username=f"user-{i}", password="testpassword", email=f"user-{i}@example.com")
+            UserProfile.objects.create(user=user, dojo="AAR")
+            registration = CourseRegistration.objects.create(
+                user=user, course=self.course, accept_terms=True)
+            registration.selected_sessions.add(session)
+            guest_registration = CourseRegistration.objects.create(
+                email=f"guest-{i}@example.com",
+                first_name="Guest",
+                last_name=str(i),
+                course=self.course,
+                accept_terms=True,
+            )
+            guest_registration.selected_sessions.add(session)
+
+        with self.assertNumQueries(query_count):
+            response = self.client.post(url)
+            content = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(content.count("Export session"), 21)
+        self.assertIn("guest-9@example.com", content)
+
     def test_export_registrations_post_without_registrations(self):
         print("\ntest_export_registrations_post_without_registrations")
         self.client.force_login(self.staff_user)
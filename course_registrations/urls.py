@@ -14,6 +14,16 @@ urlpatterns = [
         views.CourseRegistrationList.as_view(),
         name="courseregistration_list",
     ),
+    path(
+        _("user/registrations/calendar/enable/"),
+        views.EnableCalendarFeed.as_view(),
+        name="enable_calendar_feed",
+    ),
+    path(
+        _("user/registrations/calendar/reset/"),
+        views.ResetCalendarToken.as_view(),
+        name="reset_calendar_token",
+    ),
     path(
         _("user/registrations/cancel/<int:pk>/"),
         views.CancelCourseRegistration.as_view(),
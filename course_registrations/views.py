@@ -1,9 +1,7 @@
-import csv
 import logging
 import os
 import random
 from datetime import date
-from smtplib import SMTPException
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
@@ -11,20 +9,26 @@ from django.contrib.auth import get_user_model
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.exceptions import PermissionDenied
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponseRedirect
 from django.shortcuts import (HttpResponseRedirect, get_object_or_404,
                               redirect, render, reverse)
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 from django.views import View
 
-from courses.models import InternalCourse
+from courses.ical import enable_calendar_feed, reset_calendar_token
+from courses.models import AccommodationOption, CourseSession, InternalCourse
+from courses.queries import translations_prefetch
 from danbw_website import constants, utils
-from fees.models import Fee
+from danbw_website.ratelimit import get_client_ip, rate_limit
+from fees.cache import get_course_fees
 
-from . import forms
-from .models import CourseRegistration, UserProfile
+from . import capacity, forms
+from .context import RegistrationContext
+from .models import CourseRegistration
 
 User = get_user_model()
 
@@ -57,84 +61,30 @@ def validate_course_fees(course):
         'children': {'entire_course'},
         'family_reunion': {'single_day', 'single_day_with_dan_seminar', 'entire_course', 'entire_course_with_dan_seminar'},
     }
-    missing = required_fee_types.get(course.course_type, set()) - {f.fee_type for f in Fee.objects.filter(course_type=course.course_type)}
+    missing = required_fee_types.get(course.course_type, set()) - {f.fee_type for f in get_course_fees(course.course_type, any_category=True)}
     if missing:
         raise ValueError(f"Missing fees for {course.course_type}: {', '.join(sorted(missing))}")
 
-def prepare_context(course, form):
-    """Prepares data to be passed to the template"""
-    fees = Fee.objects.filter(
-        course_type=course.course_type, fee_category=course.fee_category)
-
-    if not fees.exists():
-        raise ValueError(
-            f"No fees found for course type {course.course_type} and fee category {course.fee_category}"
-        )
-
-#    validate_course_fees(course)
-
-    # Check if course is completely free (all fees are 0)
-    is_free_course = all(
-        fee.amount == 0 and fee.extra_fee_cash == 0 and fee.extra_fee_external == 0
-        for fee in fees
-    )
-
-    course_data = {
-        "course_type": course.course_type,
-        "fee_category": course.fee_category,
-        "fees": [
-            {
-                "fee_type": fee.fee_type,
-                "fee_type_display": fee.get_fee_type_display(),
-                # Convert Decimal to float for JSON compatibility
-                "amount": float(fee.amount),
-                "extra_fee_cash": float(fee.extra_fee_cash),
-                "extra_fee_external": float(fee.extra_fee_external)
-            }
-            for fee in fees
-        ],
-        "discount_percentage": course.discount_percentage,
-        "discount_display": _("reduced"),
-        "dan_member_display": _("D.A.N. Member"),
-        "course_has_dan_preparation": course.has_dan_preparation,
-    }
-
-    # Add accommodation options for family reunion courses
-    if course.course_type == "family_reunion":
-        from courses.models import AccommodationOption
-        accommodation_options = AccommodationOption.objects.filter(course=course).order_by('order')
-        course_data["accommodation_options"] = [
-            {
-                "id": option.id,
-                "name": option.name,
-                "fee": float(option.fee)
-            }
-            for option in accommodation_options
-        ]
-
-    context = {
-        "course": course,
-        "form": form,
-        "course_data": course_data,
-        "exam_courses": constants.EXAM_COURSES,
-        "dan_preparation_courses": constants.DAN_PREPARATION_COURSES,
-        "is_free_course": is_free_course,
-    }
-    return context
-
-
+def get_open_course_or_404(slug):
+    """Returns the course with the given slug if its registration is open.
+    The registration status is computed from the course dates on read.
+    """
+    course = get_object_or_404(InternalCourse, slug=slug)
+    course.apply_date_transitions()
+    if course.registration_status != 1:
+        raise Http404
+    return course
+
+@method_decorator(
+    rate_limit("register_course", email_field="email", guests_only=True,
+               failures_only=True),
+    name="post",
+)
 class RegisterCourse(View):
     """Creates a course registration"""
 
     def get(self, request, slug):
-        courses = InternalCourse.objects.filter(registration_status=1)
-        course = get_object_or_404(courses, slug=slug)
-
-        # Update dan preparation flag if needed
-        if course.course_type in constants.DAN_PREPARATION_COURSES:
-            course.update_has_dan_preparation()
-
-        course.save()
+        course = get_open_course_or_404(slug)
 
         if not request.user.is_authenticated and not request.GET.get("allow_guest"):
             messages.info(
@@ -144,7 +94,8 @@ class RegisterCourse(View):
             return redirect('/accounts/login/?next=' + request.path + '&allow_guest=True')
 
         if request.user.is_authenticated:
-            user_profile = UserProfile.objects.filter(user=request.user)
+            # Accessing the profile caches it for the template
+            user_profile = getattr(request.user, "profile", None)
             if not user_profile:
                 messages.warning(
                     request,
@@ -154,7 +105,7 @@ class RegisterCourse(View):
 
             user_registered = CourseRegistration.objects.filter(
                 user=request.user, course=course
-            )
+            ).exists()
 
             if user_registered:
                 messages.warning(
@@ -163,21 +114,25 @@ class RegisterCourse(View):
                 )
                 return HttpResponseRedirect(reverse("course_list"))
 
+        registration_context = RegistrationContext(course)
+
+        if request.user.is_authenticated:
             # Authenticated users don't need CAPTCHA
             registration_form = forms.CourseRegistrationForm(
-                course=course, user_profile=request.user.profile,
+                registration_context=registration_context,
+                user_profile=user_profile,
             )
         else:
             # Generate new captcha for guest users only
             dummy, captcha_display = generate_captcha(request)
 
             registration_form = forms.CourseRegistrationForm(
-                course=course,
+                registration_context=registration_context,
                 captcha_target_display=captcha_display,
             )
 
         try:
-            context = prepare_context(course, registration_form)
+            context = registration_context.get_template_context(registration_form)
         except ValueError as e:
             messages.error(
                 request,
@@ -192,14 +147,14 @@ class RegisterCourse(View):
         )
 
     def post(self, request, slug):
-        queryset = InternalCourse.objects.filter(registration_status=1)
-        course = get_object_or_404(queryset, slug=slug)
+        course = get_open_course_or_404(slug)
+        registration_context = RegistrationContext(course)
 
         # Only validate CAPTCHA for guest users
         if request.user.is_authenticated:
             captcha_valid = True  # Skip CAPTCHA for authenticated users
             registration_form = forms.CourseRegistrationForm(
-                data=request.POST, course=course, user_profile=request.user.profile
+                data=request.POST, registration_context=registration_context, user_profile=request.user.profile
             )
         else:
             # Validate captcha against session for guest users
@@ -210,7 +165,7 @@ class RegisterCourse(View):
             captcha_display = request.session.get("captcha_target_display", "AI")
 
             registration_form = forms.CourseRegistrationForm(
-                data=request.POST, course=course,
+                data=request.POST, registration_context=registration_context,
                 captcha_target_display=captcha_display
             )
 
@@ -218,26 +173,26 @@ class RegisterCourse(View):
         if not captcha_valid:
             logger.warning(
                 "Invalid captcha attempt for course %s from IP %s",
-                slug, request.META.get('REMOTE_ADDR', 'unknown')
+                slug, get_client_ip(request) or 'unknown'
             )
             # Generate new captcha for next render
             dummy, new_captcha_display = generate_captcha(request)
             # Create new form with fresh captcha display
             if request.user.is_authenticated:
                 registration_form = forms.CourseRegistrationForm(
-                    data=request.POST, course=course, user_profile=request.user.profile,
+                    data=request.POST, registration_context=registration_context, user_profile=request.user.profile,
                     captcha_target_display=new_captcha_display
                 )
             else:
                 registration_form = forms.CourseRegistrationForm(
-                    data=request.POST, course=course,
+                    data=request.POST, registration_context=registration_context,
                     captcha_target_display=new_captcha_display
                 )
             # Validate form and then add captcha error as non-field error
             registration_form.is_valid()
             registration_form.add_error(None, _("Incorrect captcha verification. Please try again."))
             try:
-                context = prepare_context(course, registration_form)
+                context = registration_context.get_template_context(registration_form)
             except ValueError as e:
                 messages.error(request, str(e))
                 return HttpResponseRedirect(reverse("course_list"))
@@ -263,7 +218,7 @@ class RegisterCourse(View):
                         None, _("A registration with this name and email already exists for this course.")
                     )
                     try:
-                        context = prepare_context(course, registration_form)
+                        context = registration_context.get_template_context(registration_form)
                     except ValueError as e:
                         messages.error(request, str(e))
                         return HttpResponseRedirect(reverse("course_list"))
@@ -280,7 +235,7 @@ class RegisterCourse(View):
                         None, _("You have already registered for this course.")
                     )
                     try:
-                        context = prepare_context(course, registration_form)
+                        context = registration_context.get_template_context(registration_form)
                     except ValueError as e:
                         messages.error(request, str(e))
                         return HttpResponseRedirect(reverse("course_list"))
@@ -318,13 +273,13 @@ class RegisterCourse(View):
                     registration.last_name = last_name
 
             try:
-                registration.save()
+                capacity.save_registration(registration, selected_sessions)
             except IntegrityError:
                 registration_form.add_error(
                     None, _("A registration with this email/name already exists for this course.")
                 )
                 try:
-                    context = prepare_context(course, registration_form)
+                    context = registration_context.get_template_context(registration_form)
                 except ValueError as e:
                     messages.error(request, str(e))
                     return HttpResponseRedirect(reverse("course_list"))
@@ -334,27 +289,16 @@ class RegisterCourse(View):
                     context,
                 )
 
-            registration.selected_sessions.set(selected_sessions)
-
-            try:
-                utils.send_registration_confirmation(request, registration)
-                utils.send_registration_notification(request, registration)
-            except SMTPException as e:
-                registration_form.add_error("email", e)
-                registration.delete()
-                try:
-                    context = prepare_context(course, registration_form)
-                except ValueError as e:
-                    messages.error(request, str(e))
-                    return HttpResponseRedirect(reverse("course_list"))
-                return render(
-                    request,
-                    "register_course.html",
-                    context,
-                )
+            utils.send_registration_confirmation(request, registration)
+            utils.send_registration_notification(request, registration)
 
             print(f"Registration successful for {email if not request.user.is_authenticated else request.user.email}")
             messages.info(request, _("You have successfully signed up for ") + course.title)
+            if registration.waitlisted:
+                messages.warning(
+                    request,
+                    _("The course is fully booked. You have been put on the waitlist and we will let you know as soon as a place becomes available.")
+                )
 
             # Clear CAPTCHA data from session after successful registration
             if 'captcha_target' in request.session:
@@ -369,7 +313,7 @@ class RegisterCourse(View):
 
         else:
             try:
-                context = prepare_context(course, registration_form)
+                context = registration_context.get_template_context(registration_form)
             except ValueError as e:
                 messages.error(request, str(e))
                 return HttpResponseRedirect(reverse("course_list"))
@@ -384,8 +328,20 @@ class CourseRegistrationList(LoginRequiredMixin, View):
     """Displays a list of a users course registrations"""
 
     def get(self, request):
-        user_registrations = CourseRegistration.objects.filter(
-            user=request.user
+        user_registrations = (
+            CourseRegistration.objects.filter(user=request.user)
+            .select_related("course", "accommodation_option")
+            .prefetch_related(
+                translations_prefetch(InternalCourse, "course__translations"),
+                translations_prefetch(
+                    AccommodationOption, "accommodation_option__translations"),
+                Prefetch(
+                    "selected_sessions",
+                    queryset=CourseSession.objects.prefetch_related(
+                        translations_prefetch(CourseSession)
+                    ),
+                ),
+            )
         )
         past_registrations = [
             registration
@@ -413,10 +369,45 @@ class CourseRegistrationList(LoginRequiredMixin, View):
                 "upcoming_registrations": upcoming_registrations,
                 "unattended_registrations": unattended_registrations,
                 "bank_account": os.environ.get("BANK_ACCOUNT"),
+                "calendar_url": get_calendar_url(request),
             },
         )
 
 
+def get_calendar_url(request):
+    """Returns the URL of the user's personal calendar feed or None if
+    the user has not enabled it
+    """
+    if not request.user.calendar_token:
+        return None
+    return request.build_absolute_uri(reverse(
+        "user_calendar", kwargs={"token": request.user.calendar_token}))
+
+
+class EnableCalendarFeed(LoginRequiredMixin, View):
+    """Creates the link of the user's personal calendar feed"""
+
+    def post(self, request):
+        enable_calendar_feed(request.user)
+        messages.success(
+            request,
+            _("Your calendar link has been created. Please subscribe to it in your calendar app.")
+        )
+        return HttpResponseRedirect(reverse("courseregistration_list"))
+
+
+class ResetCalendarToken(LoginRequiredMixin, View):
+    """Replaces the link of the user's personal calendar feed"""
+
+    def post(self, request):
+        reset_calendar_token(request.user)
+        messages.success(
+            request,
+            _("Your calendar link has been replaced. Please subscribe to the new link in your calendar app.")
+        )
+        return HttpResponseRedirect(reverse("courseregistration_list"))
+
+
 class CancelCourseRegistration(LoginRequiredMixin, SuccessMessageMixin, View):
     """Deletes a course registration instance"""
 
@@ -436,13 +427,9 @@ class CancelCourseRegistration(LoginRequiredMixin, SuccessMessageMixin, View):
         if registration.user != request.user:
             raise PermissionDenied
 
-        try:
-            utils.send_cancellation_notification(request, registration)
-        except SMTPException as e:
-            messages.error(request, e)
-            return HttpResponseRedirect(reverse("courseregistration_list"))
+        utils.send_cancellation_notification(request, registration)
 
-        registration.delete()
+        capacity.delete_registration(registration)
 
         messages.success(
             request,
@@ -457,28 +444,22 @@ class UpdateCourseRegistration(LoginRequiredMixin, View):
     """Updates a course registration"""
 
     def get(self, request, pk):
-        registration = get_object_or_404(CourseRegistration, pk=pk)
-        if registration.user != request.user:
+        registration = get_object_or_404(
+            CourseRegistration.objects.select_related("course"), pk=pk)
+        if registration.user_id != request.user.pk:
             raise PermissionDenied
 
-        course = registration.course
-
-        # Update dan preparation flag if needed
-        if course.course_type in constants.DAN_PREPARATION_COURSES:
-            course.update_has_dan_preparation()
-            course.save()
-
-        selected_sessions = registration.selected_sessions.all()
+        registration_context = RegistrationContext(registration.course, registration)
 
         registration_form = forms.CourseRegistrationForm(
             instance=registration,
-            course=course,
+            registration_context=registration_context,
             user_profile=request.user.profile,
-            initial={"selected_sessions": selected_sessions},
+            initial={"selected_sessions": list(registration_context.selected_session_ids)},
         )
 
         try:
-            context = prepare_context(course, registration_form)
+            context = registration_context.get_template_context(registration_form)
         except ValueError as e:
             messages.error(request, str(e))
             return HttpResponseRedirect(reverse("courseregistration_list"))
@@ -490,17 +471,19 @@ class UpdateCourseRegistration(LoginRequiredMixin, View):
         )
 
     def post(self, request, pk):
-        registration = get_object_or_404(CourseRegistration, pk=pk)
+        registration = get_object_or_404(
+            CourseRegistration.objects.select_related("course"), pk=pk)
 
-        if registration.user != request.user:
+        if registration.user_id != request.user.pk:
             raise PermissionDenied
 
         course = registration.course
+        registration_context = RegistrationContext(course, registration)
 
         registration_form = forms.CourseRegistrationForm(
             data=request.POST,
             instance=registration,
-            course=course,
+            registration_context=registration_context,
             user_profile=request.user.profile,
         )
 
@@ -516,9 +499,24 @@ class UpdateCourseRegistration(LoginRequiredMixin, View):
             registration.final_fee = registration.calculate_fees(
                 course, selected_sessions)
             registration.set_exam(request.user)
-            registration.save()
 
-            registration.selected_sessions.set(selected_sessions)
+            full_sessions = capacity.update_registration(
+                registration,
+                selected_sessions,
+                registration_context.selected_session_ids,
+            )
+            if full_sessions:
+                for session in full_sessions:
+                    registration_form.add_error(
+                        "selected_sessions",
+                        _("%(session)s is fully booked.") % {"session": session.title},
+                    )
+                context = registration_context.get_template_context(registration_form)
+                return render(
+                    request,
+                    "update_courseregistration.html",
+                    context,
+                )
 
             messages.info(
                 request,
@@ -536,7 +534,7 @@ class UpdateCourseRegistration(LoginRequiredMixin, View):
                 )
 
             try:
-                context = prepare_context(course, registration_form)
+                context = registration_context.get_template_context(registration_form)
             except ValueError as e:
                 messages.error(request, str(e))
                 return HttpResponseRedirect(reverse("courseregistration_list"))
@@ -573,13 +571,8 @@ class ExportCourseRegistrations(LoginRequiredMixin, UserPassesTestMixin, View):
             return HttpResponseRedirect(reverse("home"))
 
         filename = f"csv_export_{slugify(slug)}_{date.today()}.csv"
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-
-        writer = csv.writer(response)
-        utils.write_registrations_csv(writer, queryset)
 
-        return response
+        return utils.stream_registrations_csv(queryset, filename)
 
 
 class SetRegistrationAttendenceStatus(LoginRequiredMixin, View):
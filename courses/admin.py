@@ -1,19 +1,47 @@
-import csv
-import tempfile
-import zipfile
 from datetime import date
 
-from django.contrib import admin
-from django.http import HttpResponse
+from django.contrib import admin, messages
+from django.contrib.admin.utils import (
+    display_for_field,
+    display_for_value,
+    label_for_field,
+    lookup_field,
+)
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Count, Prefetch, Q
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from django_prose_editor.widgets import AdminProseEditorWidget
 from parler.admin import TranslatableAdmin, TranslatableTabularInline
 
 from course_registrations.models import CourseRegistration
+from course_registrations.repricing import reprice_registrations
 from danbw_website import constants, utils
+from danbw_website.admin_actions import toggled, update_selected
+from danbw_website.page_cache import invalidate_page_cache
 
+from .cloning import clone_courses
 from .models import AccommodationOption, CourseSession, ExternalCourse, InternalCourse
+from .queries import translations_prefetch
+
+
+def duplicate_courses(modeladmin, request, queryset, next_year=False):
+    """Copies the selected courses and warns about the ones that were
+    skipped because they have no translation to take the title from
+    """
+    clone_courses(queryset, next_year=next_year)
+    skipped = queryset.filter(translations__isnull=True).count()
+    if skipped:
+        modeladmin.message_user(
+            request,
+            _("%(count)d course(s) without a translation were not duplicated.") % {
+                "count": skipped},
+            level=messages.WARNING,
+        )
 
 
 class CoursesByYearFilter(admin.SimpleListFilter):
@@ -62,7 +90,7 @@ class CourseSessionInline(TranslatableTabularInline):
 
     model = CourseSession
     extra = 0  # Set number of additional rows to 0
-    fields = ('title', 'date', 'start_time', 'end_time', 'is_dan_preparation', 'price_override')
+    fields = ('title', 'date', 'start_time', 'end_time', 'is_dan_preparation', 'price_override', 'capacity')
 
 
 class AccommodationOptionInline(TranslatableTabularInline):
@@ -73,61 +101,28 @@ class AccommodationOptionInline(TranslatableTabularInline):
     fields = ["name", "fee", "order"]
 
 
-class CourseRegistrationInline(admin.TabularInline):
-    """Displays CourseRegistrations as an inline model"""
-
-    model = CourseRegistration
-    extra = 0  # Set number of additional rows to 0
-    max_num = 0  # Hide option to add more rows
-    fields = [
-        "first_name",
-        "last_name",
-        "email",
-        "grade",
-        "dojo",
-        "truncated_session_display",
-        "final_fee",
-        "deposit_paid",
-        "remaining_balance",
-        "payment_status",
-        "payment_method",
-        "discount",
-        "exam",
-        "truncated_comment",
-        "accept_terms",
-        "dinner",
-        "overnight_stay",
-        "accommodation_option",
-    ]
-    readonly_fields = [
-        "first_name",
-        "last_name",
-        "email",
-        "truncated_session_display",
-        "exam",
-        "accept_terms",
-        "final_fee",
-        "remaining_balance",
-        "payment_method",
-        "discount",
-        "truncated_comment",
-        "dinner",
-        "overnight_stay",
-        "accommodation_option",
-        "grade",
-        "dojo",
-    ]
-
-    def get_fields(self, request, obj=None):
-        """Conditionally show deposit fields only for deposit courses"""
-        fields = list(super().get_fields(request, obj))
-        if obj and obj.course_type not in constants.DEPOSIT_COURSES:
-            # Remove deposit fields for non-deposit courses
-            if "deposit_paid" in fields:
-                fields.remove("deposit_paid")
-            if "remaining_balance" in fields:
-                fields.remove("remaining_balance")
-        return fields
+# Columns of the registration panel on the course change page
+REGISTRATION_PANEL_FIELDS = [
+    "first_name",
+    "last_name",
+    "email",
+    "grade",
+    "dojo",
+    "truncated_session_display",
+    "final_fee",
+    "deposit_paid",
+    "remaining_balance",
+    "payment_status",
+    "payment_method",
+    "discount",
+    "exam",
+    "truncated_comment",
+    "accept_terms",
+    "dinner",
+    "overnight_stay",
+    "accommodation_option",
+    "waitlisted",
+]
 
 
 @admin.register(InternalCourse)
@@ -155,7 +150,8 @@ class InternalCourseAdmin(TranslatableAdmin):
                 "end_date",
                 "registration_status",
                 "registration_start_date",
-                "registration_end_date"
+                "registration_end_date",
+                "capacity",
             )
         }),
         (_("Payment Information"), {
@@ -182,17 +178,28 @@ class InternalCourseAdmin(TranslatableAdmin):
         "start_date",
         "end_date",
         "get_course_registration_count",
+        "get_paid_count",
+        "get_unpaid_count",
+        "get_exam_count",
     )
     search_fields = ["translations__title", "translations__description"]
     list_filter = (CoursesByYearFilter, FutureCourseFilter,
                    "course_type", "status", "registration_status")
-    inlines = [CourseSessionInline, AccommodationOptionInline, CourseRegistrationInline]
+    inlines = [CourseSessionInline, AccommodationOptionInline]
+    # Registrations per page in the registration panel of the change page
+    registrations_per_page = 50
     ordering = ["-start_date"]
     actions = [
         "duplicate_selected_courses",
+        "duplicate_for_next_year",
+        "publish",
+        "unpublish",
+        "open_registration",
+        "close_registration",
         "toggle_status",
         "toggle_registration_status",
-        "export_csv"
+        "export_csv",
+        "reprice_registrations",
     ]
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
@@ -200,139 +207,235 @@ class InternalCourseAdmin(TranslatableAdmin):
             kwargs["widget"] = AdminProseEditorWidget
         return super().formfield_for_dbfield(db_field, request, **kwargs)
 
-    def duplicate_selected_courses(self, request, queryset):
-        """Action for duplicating existing courses"""
-        for course in queryset:
-            new_title = f"Copy of {course.title}"
-            counter = 2
-            while InternalCourse.objects.filter(translations__title=new_title).exists():
-                new_title = f"Copy {counter} of {course.title}"
-                counter += 1
-
-            # Create new course with non-translated fields
-            new_course = InternalCourse.objects.create(
-                title=new_title,  # Will use current language
-                registration_status=0,
-                start_date=course.start_date,
-                end_date=course.end_date,
-                registration_start_date=course.registration_start_date,
-                registration_end_date=course.registration_end_date,
-                organizer=course.organizer,
-                teacher=course.teacher,
-                discount_percentage=course.discount_percentage,
-                bank_transfer_until=course.bank_transfer_until,
-                course_type=course.course_type,
-                fee_category=course.fee_category,
+    def get_queryset(self, request):
+        """Counts the registrations of each course in the same query and
+        loads the translated titles
+        """
+        return super().get_queryset(request).annotate(
+            registration_count=Count("courseregistration"),
+            paid_count=Count(
+                "courseregistration",
+                filter=Q(courseregistration__payment_status=1),
+            ),
+            unpaid_count=Count(
+                "courseregistration",
+                filter=Q(courseregistration__payment_status=0),
+            ),
+            exam_count=Count(
+                "courseregistration",
+                filter=Q(courseregistration__exam=True),
+            ),
+        ).prefetch_related(translations_prefetch(InternalCourse))
+
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/registrations/",
+                self.admin_site.admin_view(self.registrations_view),
+                name="courses_internalcourse_registrations",
+            ),
+        ] + super().get_urls()
+
+    def registrations_view(self, request, object_id):
+        """Renders one page of the registrations of a course. The change
+        page loads it on demand instead of rendering every registration
+        in an inline.
+        """
+        course = get_object_or_404(InternalCourse, pk=object_id)
+        if not self.has_view_or_change_permission(request, course):
+            raise PermissionDenied
+
+        fields = list(REGISTRATION_PANEL_FIELDS)
+        if course.course_type not in constants.DEPOSIT_COURSES:
+            # Remove deposit fields for non-deposit courses
+            fields.remove("deposit_paid")
+            fields.remove("remaining_balance")
+
+        session_count = course.sessions.count()
+        registrations = (
+            CourseRegistration.objects.filter(course=course)
+            .select_related("accommodation_option")
+            .prefetch_related(
+                Prefetch(
+                    "selected_sessions",
+                    queryset=CourseSession.objects.prefetch_related(
+                        translations_prefetch(CourseSession)
+                    ),
+                ),
+                translations_prefetch(
+                    AccommodationOption, "accommodation_option__translations"
+                ),
             )
-
-            # Copy all translations
-            from django.utils import translation as django_translation
-            current_lang = django_translation.get_language()
-
-            for trans in course.translations.all():
-                if trans.language_code == current_lang:
-                    # Update the existing translation created by .create(title=...)
-                    existing_trans = new_course.translations.get(language_code=current_lang)
-                    existing_trans.description = trans.description
-                    existing_trans.location = trans.location
-                    existing_trans.additional_info = trans.additional_info
-                    existing_trans.save()
+            .order_by("last_name", "first_name", "pk")
+        )
+        page = Paginator(registrations, self.registrations_per_page).get_page(
+            request.GET.get("page"))
+
+        rows = []
+        for registration in page:
+            registration.course_session_count = session_count
+            cells = []
+            for name in fields:
+                field, _attr, value = lookup_field(name, registration)
+                if field is None:
+                    cells.append(display_for_value(value, "-"))
                 else:
-                    # Create translation for other languages
-                    new_course.translations.create(
-                        language_code=trans.language_code,
-                        title=new_title,  # Use the new title
-                        description=trans.description,
-                        location=trans.location,
-                        additional_info=trans.additional_info,
-                    )
-
-            # Copy sessions with translations
-            for session in course.sessions.all():
-                new_session = CourseSession.objects.create(
-                    course=new_course,
-                    date=session.date,
-                    start_time=session.start_time,
-                    end_time=session.end_time,
-                )
-                # Copy session translations
-                for trans in session.translations.all():
-                    new_session.translations.create(
-                        language_code=trans.language_code,
-                        title=trans.title,
-                    )
+                    cells.append(display_for_field(value, field, "-"))
+            rows.append((
+                reverse(
+                    "admin:course_registrations_courseregistration_change",
+                    args=[registration.pk],
+                ),
+                cells,
+            ))
+
+        return TemplateResponse(
+            request,
+            "admin/courses/internalcourse/registrations.html",
+            {
+                "course": course,
+                "page": page,
+                "headers": [
+                    label_for_field(name, CourseRegistration) for name in fields
+                ],
+                "rows": rows,
+                "changelist_url": reverse(
+                    "admin:course_registrations_courseregistration_changelist"
+                ) + f"?course={course.pk}",
+            },
+        )
+
+    def duplicate_selected_courses(self, request, queryset):
+        """Action for duplicating existing courses"""
+        duplicate_courses(self, request, queryset)
 
     duplicate_selected_courses.short_description = _(
         "Duplicate selected courses")
 
+    def duplicate_for_next_year(self, request, queryset):
+        """Action for duplicating courses with dates moved to next year"""
+        duplicate_courses(self, request, queryset, next_year=True)
+
+    duplicate_for_next_year.short_description = _(
+        "Duplicate selected courses for next year")
+
+    def update_courses(self, request, queryset, **values):
+        update_selected(self, request, queryset, **values)
+        invalidate_page_cache()
+
+    def publish(self, request, queryset):
+        """Action for publishing courses"""
+        self.update_courses(request, queryset, status=1)
+
+    publish.short_description = _("Publish selected courses")
+
+    def unpublish(self, request, queryset):
+        """Action for setting courses to preview"""
+        self.update_courses(request, queryset, status=0)
+
+    unpublish.short_description = _("Set selected courses to preview")
+
+    def open_registration(self, request, queryset):
+        """Action for opening the registration of courses"""
+        # Online registration is not allowed for children's courses
+        self.update_courses(
+            request, queryset.exclude(course_type="children"), registration_status=1)
+
+    open_registration.short_description = _(
+        "Open registration for selected courses")
+
+    def close_registration(self, request, queryset):
+        """Action for closing the registration of courses"""
+        self.update_courses(request, queryset, registration_status=0)
+
+    close_registration.short_description = _(
+        "Close registration for selected courses")
+
     def toggle_registration_status(self, request, queryset):
         """Action for toggling course registration status"""
-        for course in queryset:
-            course.registration_status = not course.registration_status
-            course.save()
+        self.update_courses(
+            request,
+            queryset,
+            registration_status=toggled(InternalCourse, "registration_status"),
+        )
 
     toggle_registration_status.short_description = _(
         "Toggle registration status of selected courses")
 
     def toggle_status(self, request, queryset):
         """Action for toggling course status"""
-        for course in queryset:
-            course.status = not course.status
-            course.save()
+        self.update_courses(
+            request, queryset, status=toggled(InternalCourse, "status"))
 
     toggle_status.short_description = _("Toggle status of selected courses")
 
-    def get_course_registration_count(self, course):
-        """Gets the number of registrations for a course"""
+    def reprice_registrations(self, request, queryset):
+        """Action for recalculating the fees of all registrations"""
+        changes, errors = reprice_registrations(queryset)
 
-        registrations = CourseRegistration.objects.filter(course=course)
+        self.message_user(
+            request,
+            _("Updated the fee of %(count)d registration(s).") % {
+                "count": len(changes)},
+        )
+        for registration, message in errors:
+            self.message_user(
+                request,
+                f"{registration.course} – {registration}: {message}",
+                level=messages.ERROR,
+            )
 
-        return len(registrations)
+    reprice_registrations.short_description = _(
+        "Recalculate fees of registrations for selected courses")
+
+    def get_course_registration_count(self, course):
+        """Gets the number of registrations for a course"""
+        # The changelist annotates the count
+        registration_count = getattr(course, "registration_count", None)
+        if registration_count is None:
+            registration_count = CourseRegistration.objects.filter(
+                course=course).count()
+        return registration_count
 
     # Customize property name: https://stackoverflow.com/a/64352815
     get_course_registration_count.short_description = _("Registrations")
+    get_course_registration_count.admin_order_field = "registration_count"
 
-    def export_csv(self, request, queryset):
-        """Action for exporting course registrations to CSV or zip"""
+    def get_paid_count(self, course):
+        return course.paid_count
 
-        if queryset.count() == 1:
-            course = queryset.first()
-            response = HttpResponse(content_type="text/csv")
-            response["Content-Disposition"] = (
-                f"attachment; filename={slugify(course.title)}_{_('registrations')}.csv"
-            )
-            writer = csv.writer(response)
+    get_paid_count.short_description = _("Paid")
+    get_paid_count.admin_order_field = "paid_count"
 
-            registrations = CourseRegistration.objects.filter(course=course)
+    def get_unpaid_count(self, course):
+        return course.unpaid_count
 
-            utils.write_registrations_csv(writer, registrations)
+    get_unpaid_count.short_description = _("Unpaid")
+    get_unpaid_count.admin_order_field = "unpaid_count"
 
-            return response
+    def get_exam_count(self, course):
+        return course.exam_count
 
-        zip_buffer = tempfile.TemporaryFile()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            for course in queryset:
-                csv_filename = f"{slugify(course.title)}_{_('registrations')}.csv"
+    get_exam_count.short_description = _("Exam")
+    get_exam_count.admin_order_field = "exam_count"
 
-                registrations = CourseRegistration.objects.filter(
-                    course=course)
+    def export_csv(self, request, queryset):
+        """Action for exporting course registrations to CSV or zip"""
 
-                with tempfile.NamedTemporaryFile(
-                    delete=False, mode="w", newline=""
-                ) as csv_file:
-                    writer = csv.writer(csv_file)
-                    utils.write_registrations_csv(
-                        writer, registrations)
-                zip_file.write(csv_file.name, arcname=csv_filename)
-        zip_buffer.seek(0)
+        if queryset.count() == 1:
+            course = queryset.first()
+            registrations = CourseRegistration.objects.filter(course=course)
 
-        response = HttpResponse(
-            zip_buffer.read(), content_type="application/zip")
-        response["Content-Disposition"] = (
-            f"attachment; filename={slugify(_('course_registrations'))}_{slugify(date.today())}.zip"
-        )
+            return utils.stream_registrations_csv(
+                registrations,
+                f"{slugify(course.title)}_{_('registrations')}.csv",
+            )
 
-        return response
+        return utils.stream_registrations_zip(
+            list(queryset.prefetch_related("translations")),
+            CourseRegistration.objects.all(),
+            f"{slugify(_('course_registrations'))}_{slugify(date.today())}.zip",
+        )
 
     export_csv.short_description = _(
         "Export selected course registrations to CSV")
@@ -362,7 +465,7 @@ class ExternalCourseAdmin(TranslatableAdmin):
     readonly_fields = ("slug",)
 
     search_fields = ["translations__title", "translations__description"]
-    actions = ["duplicate_selected_courses"]
+    actions = ["duplicate_selected_courses", "duplicate_for_next_year"]
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
         if db_field.name == "description":
@@ -371,41 +474,14 @@ class ExternalCourseAdmin(TranslatableAdmin):
 
     def duplicate_selected_courses(self, request, queryset):
         """Action for duplicating existing courses"""
-        for course in queryset:
-            new_title = f"Copy of {course.title}"
-            counter = 2
-            while ExternalCourse.objects.filter(translations__title=new_title).exists():
-                new_title = f"Copy {counter} of {course.title}"
-                counter += 1
-
-            # Create new course with non-translated fields
-            new_course = ExternalCourse.objects.create(
-                title=new_title,  # Will use current language
-                url=course.url,
-                start_date=course.start_date,
-                end_date=course.end_date,
-                organizer=course.organizer,
-                teacher=course.teacher,
-            )
+        duplicate_courses(self, request, queryset)
 
-            # Copy all translations
-            from django.utils import translation as django_translation
-            current_lang = django_translation.get_language()
-
-            for trans in course.translations.all():
-                if trans.language_code == current_lang:
-                    # Update the existing translation created by .create(title=...)
-                    existing_trans = new_course.translations.get(language_code=current_lang)
-                    existing_trans.description = trans.description
-                    existing_trans.location = trans.location
-                    existing_trans.additional_info = trans.additional_info
-                    existing_trans.save()
-                else:
-                    # Create translation for other languages
-                    new_course.translations.create(
-                        language_code=trans.language_code,
-                        title=new_title,  # Use the new title
-                        description=trans.description,
-                        location=trans.location,
-                        additional_info=trans.additional_info,
-                    )
+    duplicate_selected_courses.short_description = _(
+        "Duplicate selected courses")
+
+    def duplicate_for_next_year(self, request, queryset):
+        """Action for duplicating courses with dates moved to next year"""
+        duplicate_courses(self, request, queryset, next_year=True)
+
+    duplicate_for_next_year.short_description = _(
+        "Duplicate selected courses for next year")
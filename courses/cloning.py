@@ -0,0 +1,181 @@
+"""Copying courses together with their translations, sessions and
+accommodation options.
+
+The copies of the courses are saved one by one because multi-table
+inheritance rules out `bulk_create()` for them and because the course
+slug is allocated on save. Everything else is inserted with one
+`bulk_create()` per model, so copying a season of courses takes a
+handful of queries per course.
+"""
+import re
+from datetime import timedelta
+
+from django.db import transaction
+
+from danbw_website.page_cache import invalidate_page_cache
+
+from .models import AccommodationOption, CourseSession, InternalCourse
+
+# Dates are moved by whole weeks, so courses stay on the same weekday
+NEXT_YEAR = timedelta(weeks=52)
+
+# Fields that are not copied from the original objects
+SKIPPED_FIELDS = ("slug", "updated_at")
+
+
+def copy_fields(instance, exclude=()):
+    """Returns the concrete field values of `instance` without the
+    primary key and the fields in `exclude` and `SKIPPED_FIELDS`.
+    """
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+        and field.name not in exclude
+        and field.name not in SKIPPED_FIELDS
+    }
+
+
+def copy_translations(instance, master_id):
+    """Returns unsaved copies of the translations of `instance` for the
+    object with the primary key `master_id`.
+    """
+    translation_model = instance._parler_meta.root_model
+    return [
+        translation_model(master_id=master_id, **copy_fields(translation, ["master"]))
+        for translation in instance.translations.all()
+    ]
+
+
+def shift_date(value, delta):
+    return value + delta if value else value
+
+
+def get_copy_number(title, taken_titles):
+    """Returns the lowest number n for which "Copy of <title>" (n = 1) or
+    "Copy <n> of <title>" is not in `taken_titles`.
+    """
+    pattern = re.compile(rf"^Copy(?: ([0-9]+))? of {re.escape(title)}$")
+    taken = {
+        int(match.group(1) or 1)
+        for match in map(pattern.match, taken_titles)
+        if match
+    }
+    number = 1
+    while number in taken:
+        number += 1
+    return number
+
+
+def copy_title(title, number):
+    if number == 1:
+        return f"Copy of {title}"
+    return f"Copy {number} of {title}"
+
+
+@transaction.atomic
+def clone_courses(queryset, next_year=False):
+    """Copies the internal or external courses of `queryset`.
+
+    The copies are titled "Copy of <title>", "Copy 2 of <title>", … in
+    every language. Copies of internal courses are created in preview
+    with closed registration. With `next_year`, all dates are moved by
+    52 weeks. Courses without any translation have no title to copy and
+    are skipped.
+
+    Returns the list of copies.
+    """
+    model = queryset.model
+    internal = issubclass(model, InternalCourse)
+    delta = NEXT_YEAR if next_year else timedelta()
+
+    prefetch = ["translations"]
+    if internal:
+        prefetch += ["sessions__translations", "accommodation_options__translations"]
+    courses = list(queryset.prefetch_related(*prefetch))
+    if not courses:
+        return []
+
+    # All titles that may collide with a copy are loaded at once
+    taken_titles = set(
+        model.objects.filter(translations__title__startswith="Copy ")
+        .values_list("translations__title", flat=True)
+    )
+
+    copies = []
+    translations = []
+    for course in courses:
+        course_translations = list(course.translations.all())
+        if not course_translations:
+            continue
+        # The slug is derived from the German title, so the German
+        # translation is saved with the course and the others in bulk
+        first = min(
+            course_translations,
+            key=lambda translation: translation.language_code != "de",
+        )
+        number = get_copy_number(first.title, taken_titles)
+
+        new_course = model(**copy_fields(course))
+        new_course.start_date = shift_date(course.start_date, delta)
+        new_course.end_date = shift_date(course.end_date, delta)
+        if internal:
+            new_course.status = 0
+            new_course.registration_status = 0
+            new_course.publication_date = (
+                shift_date(course.publication_date, delta) if next_year else None
+            )
+            new_course.registration_start_date = shift_date(
+                course.registration_start_date, delta)
+            new_course.registration_end_date = shift_date(
+                course.registration_end_date, delta)
+            new_course.bank_transfer_until = shift_date(
+                course.bank_transfer_until, delta)
+
+        new_course.set_current_language(first.language_code)
+        for name, value in copy_fields(first, ["master", "language_code"]).items():
+            setattr(new_course, name, value)
+        new_course.title = copy_title(first.title, number)
+        new_course.save()
+
+        for translation in copy_translations(course, new_course.pk):
+            if translation.language_code != first.language_code:
+                translation.title = copy_title(translation.title, number)
+                translations.append(translation)
+        taken_titles.update(
+            copy_title(translation.title, number) for translation in course_translations)
+        copies.append((course, new_course))
+
+    translation_model = model._parler_meta.root_model
+    translation_model.objects.bulk_create(translations)
+
+    if internal:
+        clone_related(CourseSession, "sessions", copies, delta)
+        clone_related(AccommodationOption, "accommodation_options", copies)
+
+    # Sessions and options are created without signals
+    transaction.on_commit(invalidate_page_cache)
+    return [new_course for _, new_course in copies]
+
+
+def clone_related(model, related_name, copies, delta=None):
+    """Copies the objects of `model` with their translations from each
+    original course to its copy. Dates are moved by `delta`.
+    """
+    originals = []
+    objects = []
+    for course, new_course in copies:
+        for instance in getattr(course, related_name).all():
+            new_instance = model(**copy_fields(instance, ["course"]))
+            new_instance.course = new_course
+            if delta is not None:
+                new_instance.date = shift_date(instance.date, delta)
+            originals.append(instance)
+            objects.append(new_instance)
+
+    model.objects.bulk_create(objects)
+    model._parler_meta.root_model.objects.bulk_create(
+        translation
+        for instance, new_instance in zip(originals, objects)
+        for translation in copy_translations(instance, new_instance.pk)
+    )
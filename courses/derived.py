@@ -0,0 +1,55 @@
+"""Course fields that are derived from the course sessions.
+
+Saving or deleting a session only marks its course as changed. The
+derived fields of all marked courses are recomputed once, with a single
+query, when the transaction commits, so saving a course with many
+session inlines does not save the course again for every session.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from danbw_website import constants
+
+from .models import CourseSession, InternalCourse
+
+_pending = threading.local()
+
+
+def get_pending_course_ids():
+    if not hasattr(_pending, "course_ids"):
+        _pending.course_ids = set()
+    return _pending.course_ids
+
+
+def mark_courses_changed(course_ids):
+    """Schedules the recomputation of the derived fields of the given
+    courses for the end of the current transaction.
+    """
+    get_pending_course_ids().update(course_ids)
+    # Every call registers a callback because a rolled back transaction
+    # discards its callbacks. The first one to run does all the work.
+    transaction.on_commit(update_changed_courses)
+
+
+def update_changed_courses():
+    """Recomputes the derived fields of all courses marked as changed."""
+    course_ids = get_pending_course_ids()
+    if not course_ids:
+        return
+    _pending.course_ids = set()
+
+    dan_preparation_sessions = CourseSession.objects.filter(
+        course=OuterRef("pk"), is_dan_preparation=True)
+    courses = (
+        InternalCourse.objects.filter(
+            pk__in=course_ids,
+            course_type__in=constants.DAN_PREPARATION_COURSES,
+        )
+        .annotate(has_dan_preparation_sessions=Exists(dan_preparation_sessions))
+    )
+    for course in courses:
+        if course.has_dan_preparation != course.has_dan_preparation_sessions:
+            course.has_dan_preparation = course.has_dan_preparation_sessions
+            course.save()
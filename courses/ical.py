@@ -0,0 +1,269 @@
+"""iCalendar feeds of the courses and of the sessions a user registered
+for.
+
+The public feed lists the published internal courses with their
+sessions and the external courses. The personal feed lists the sessions
+of the registrations of one user and is addressed by a random token
+stored on the user, so calendar apps can subscribe to it without logging
+in. The token is only created when the user enables the feed, and users
+can replace a leaked token with a new one.
+
+Feeds are rendered with a fixed number of queries and cached per
+language. The public feed follows the page cache version, so it is
+discarded whenever a course or session changes. The key of a personal
+feed also contains the latest `updated_at` and the number of the user's
+registrations, which are read in one query.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Prefetch
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.html import strip_tags
+
+from course_registrations.models import CourseRegistration
+from danbw_website.page_cache import get_page_cache_timeout, get_page_cache_version
+from users.models import User
+
+from .models import CourseSession, ExternalCourse, InternalCourse
+from .queries import published_courses_filter, translations_prefetch
+
+CALENDAR_KEY = "ical:{version}:{language}:{host}"
+USER_CALENDAR_KEY = "ical:user:{version}:{language}:{host}:{pk}:{state}"
+
+PRODUCT_ID = "-//DANBW//Aikido Courses//DE"
+
+# Lines are folded after this many octets (RFC 5545, 3.1)
+MAX_LINE_LENGTH = 75
+
+
+def escape_text(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line):
+    """Splits a content line into lines of at most MAX_LINE_LENGTH octets
+    without breaking multi-byte characters.
+    """
+    parts = []
+    current = ""
+    limit = MAX_LINE_LENGTH
+    for char in line:
+        if len((current + char).encode()) > limit:
+            parts.append(current)
+            current = ""
+            # Continuation lines start with a space
+            limit = MAX_LINE_LENGTH - 1
+        current += char
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def format_date(value):
+    return value.strftime("%Y%m%d")
+
+
+def format_datetime(value, time=None):
+    """Formats a date and local time, or an aware datetime, as UTC"""
+    if time is not None:
+        value = timezone.make_aware(datetime.combine(value, time))
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def enable_calendar_feed(user):
+    """Returns the calendar token of the user, creating it if the user
+    has not enabled the personal feed yet
+    """
+    if not user.calendar_token:
+        token = secrets.token_urlsafe(32)
+        if User.objects.filter(pk=user.pk, calendar_token__isnull=True).update(
+                calendar_token=token):
+            user.calendar_token = token
+        else:
+            # Created by a concurrent request
+            user.calendar_token = (
+                User.objects.filter(pk=user.pk)
+                .values_list("calendar_token", flat=True)
+                .get()
+            )
+    return user.calendar_token
+
+
+def reset_calendar_token(user):
+    """Replaces the calendar token of the user, so the feed is no longer
+    available under the previous one
+    """
+    user.calendar_token = secrets.token_urlsafe(32)
+    user.save(update_fields=["calendar_token"])
+    return user.calendar_token
+
+
+def course_event(course, uid, url, stamp):
+    # The end date of all-day events is exclusive
+    lines = [
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{format_date(course.start_date)}",
+        f"DTEND;VALUE=DATE:{format_date(course.end_date + timedelta(days=1))}",
+        f"SUMMARY:{escape_text(course.title)}",
+    ]
+    if course.location:
+        lines.append(f"LOCATION:{escape_text(course.location)}")
+    if course.description:
+        lines.append(f"DESCRIPTION:{escape_text(strip_tags(course.description))}")
+    lines.append(f"URL:{url}")
+    return lines
+
+
+def session_event(session, course, uid, url, stamp, tentative=False):
+    lines = [
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{format_datetime(session.date, session.start_time)}",
+        f"DTEND:{format_datetime(session.date, session.end_time)}",
+        f"SUMMARY:{escape_text(f'{course.title}: {session.title}')}",
+    ]
+    if course.location:
+        lines.append(f"LOCATION:{escape_text(course.location)}")
+    if tentative:
+        lines.append("STATUS:TENTATIVE")
+    lines.append(f"URL:{url}")
+    return lines
+
+
+def render_calendar(name, events):
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODUCT_ID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+    ]
+    for event in events:
+        lines += ["BEGIN:VEVENT", *event, "END:VEVENT"]
+    lines.append("END:VCALENDAR")
+    return "".join(fold_line(line) + "\r\n" for line in lines)
+
+
+def get_cached_calendar(key, render):
+    """Returns the (etag, content) of a calendar from the cache, rendering
+    it with `render()` on a miss
+    """
+    cached = cache.get(key)
+    if cached is None:
+        content = render()
+        etag = hashlib.md5(content.encode()).hexdigest()
+        cached = (etag, content)
+        cache.set(key, cached, timeout=get_page_cache_timeout())
+    return cached
+
+
+def render_course_calendar(request):
+    host = request.get_host()
+    stamp = format_datetime(timezone.now())
+    sessions = Prefetch(
+        "sessions",
+        queryset=CourseSession.objects.prefetch_related(
+            translations_prefetch(CourseSession)
+        ),
+    )
+    internal_courses = InternalCourse.objects.filter(
+        published_courses_filter()
+    ).prefetch_related(translations_prefetch(InternalCourse), sessions)
+    external_courses = ExternalCourse.objects.filter(
+        end_date__gte=timezone.localdate()
+    ).prefetch_related(translations_prefetch(ExternalCourse))
+
+    events = []
+    for course in internal_courses:
+        url = request.build_absolute_uri(
+            reverse("register_course", kwargs={"slug": course.slug}))
+        events.append(
+            course_event(course, f"course-{course.pk}@{host}", url, stamp))
+        for session in course.sessions.all():
+            events.append(session_event(
+                session, course, f"session-{session.pk}@{host}", url, stamp))
+    for course in external_courses:
+        url = course.url or request.build_absolute_uri(reverse("course_list"))
+        events.append(
+            course_event(course, f"course-{course.pk}@{host}", url, stamp))
+
+    return render_calendar(translation.gettext("Courses"), events)
+
+
+def get_course_calendar(request):
+    """Returns the (etag, content) of the public course calendar"""
+    key = CALENDAR_KEY.format(
+        version=get_page_cache_version(),
+        language=translation.get_language(),
+        host=request.get_host(),
+    )
+    return get_cached_calendar(key, lambda: render_course_calendar(request))
+
+
+def render_user_calendar(request, user_id):
+    host = request.get_host()
+    stamp = format_datetime(timezone.now())
+    url = request.build_absolute_uri(reverse("courseregistration_list"))
+    registrations = (
+        CourseRegistration.objects.filter(user_id=user_id)
+        .select_related("course")
+        .prefetch_related(
+            translations_prefetch(InternalCourse, "course__translations"),
+            Prefetch(
+                "selected_sessions",
+                queryset=CourseSession.objects.prefetch_related(
+                    translations_prefetch(CourseSession)
+                ),
+            ),
+        )
+    )
+
+    events = []
+    for registration in registrations:
+        for session in registration.selected_sessions.all():
+            # UIDs differ from the public feed, so both can be subscribed
+            uid = f"registration-{registration.pk}-session-{session.pk}@{host}"
+            events.append(session_event(
+                session, registration.course, uid, url, stamp,
+                tentative=registration.waitlisted,
+            ))
+
+    return render_calendar(translation.gettext("My courses"), events)
+
+
+def get_user_calendar(request, token):
+    """Returns the (etag, content) of the calendar of the user the token
+    belongs to or None if the token is unknown or the user is inactive.
+    """
+    state = (
+        User.objects.filter(calendar_token=token, is_active=True)
+        .annotate(latest=Max("registrations__updated_at"),
+                  count=Count("registrations"))
+        .values_list("pk", "latest", "count")
+        .first()
+    )
+    if state is None:
+        return None
+
+    user_id, latest, count = state
+    key = USER_CALENDAR_KEY.format(
+        version=get_page_cache_version(),
+        language=translation.get_language(),
+        host=request.get_host(),
+        pk=user_id,
+        state=hashlib.md5(f"{latest}:{count}".encode()).hexdigest(),
+    )
+    return get_cached_calendar(key, lambda: render_user_calendar(request, user_id))
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from danbw_website.benchmark import run_benchmarks, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed benchmark data, request the main views and print the query "
+        "count and the time of each. The data is rolled back afterwards. "
+        "Runs with a private local memory cache and only in development."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--courses", type=int, default=200)
+        parser.add_argument("--sessions-per-course", type=int, default=10)
+        parser.add_argument("--registrations", type=int, default=3000)
+        parser.add_argument("--users", type=int, default=400)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **kwargs):
+        if not settings.DEBUG:
+            raise CommandError(
+                "The benchmark writes to the database and only runs with "
+                "DEVELOPMENT set.")
+
+        # Cached fees and translations refer to the rolled back rows, so
+        # a private cache is used instead of the shared one
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "benchmark",
+                    "OPTIONS": {"MAX_ENTRIES": 10000},
+                }
+            },
+        ):
+            results = self.benchmark(**kwargs)
+
+        self.stdout.write(
+            f"\n{'View':<28} {'Status':>6} {'Queries':>8} {'Time (ms)':>10}")
+        self.stdout.write("-" * 55)
+        for name, status_code, queries, seconds in results:
+            self.stdout.write(
+                f"{name:<28} {status_code:>6} {queries:>8} {seconds * 1000:>10.1f}")
+
+    def benchmark(self, **kwargs):
+        with transaction.atomic():
+            self.stdout.write("Seeding benchmark data...")
+            data = seed_benchmark_data(
+                courses=kwargs["courses"],
+                sessions_per_course=kwargs["sessions_per_course"],
+                registrations=kwargs["registrations"],
+                users=kwargs["users"],
+            )
+            results = run_benchmarks(data, repeat=kwargs["repeat"])
+            transaction.set_rollback(True)
+        return results
@@ -0,0 +1,48 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.models import InternalCourse
+from danbw_website.page_cache import invalidate_page_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the date-driven status and registration status transitions "
+        "to all internal courses. Safe to run repeatedly, e.g. daily after midnight."
+    )
+
+    def handle(self, *args, **kwargs):
+        today = date.today()
+        courses = InternalCourse.objects.only(
+            "pk",
+            "status",
+            "publication_date",
+            "registration_status",
+            "registration_start_date",
+            "registration_end_date",
+            "end_date",
+        )
+
+        changed_courses = [
+            course for course in courses
+            if course.apply_date_transitions(today)
+        ]
+
+        # bulk_update() does not set auto_now fields
+        now = timezone.now()
+        for course in changed_courses:
+            course.updated_at = now
+
+        InternalCourse.objects.bulk_update(
+            changed_courses,
+            ["status", "registration_status", "updated_at"],
+            batch_size=500,
+        )
+        # Nor does it send signals
+        if changed_courses:
+            invalidate_page_cache()
+
+        self.stdout.write(
+            f"Updated status of {len(changed_courses)} course(s).")
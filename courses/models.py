@@ -7,7 +7,8 @@ from django.utils.translation import gettext_lazy as _
 from parler.models import TranslatableModel, TranslatedFields
 
 from danbw_website import constants
-from fees.models import Fee
+from danbw_website.slugs import allocate_slug, save_with_unique_slug
+from fees.cache import get_course_fees
 
 
 class Course(TranslatableModel):
@@ -50,6 +51,10 @@ class Course(TranslatableModel):
         max_length=200,
         blank=True,
     )
+    updated_at = models.DateTimeField(
+        _("Updated at"),
+        auto_now=True,
+    )
 
     class Meta:
         ordering = ["start_date"]
@@ -66,14 +71,7 @@ class Course(TranslatableModel):
         if self.slug and self.slug.startswith(slug):
             return self.slug
 
-        unique_slug = slug
-        num = 1
-
-        while Course.objects.filter(slug=unique_slug).exclude(pk=self.pk).exists():
-            unique_slug = f'{slug}-{num}'
-            num += 1
-
-        return unique_slug
+        return allocate_slug(Course, slug, self)
 
     def __str__(self):
         return self.title
@@ -88,8 +86,9 @@ class Course(TranslatableModel):
                 _("Start date cannot be later than end date."))
 
     def save(self, *args, **kwargs):
+        previous_slug = self.slug
         self.slug = self._generate_unique_slug()
-        super().save(*args, **kwargs)
+        save_with_unique_slug(self, previous_slug, super().save, *args, **kwargs)
 
 
 class InternalCourse(Course):
@@ -176,6 +175,12 @@ class InternalCourse(Course):
         _("Course with Dinner"),
         default=False,
     )
+    capacity = models.PositiveIntegerField(
+        _("Capacity"),
+        blank=True,
+        null=True,
+        help_text=_("Maximum number of participants. Further registrations are put on the waitlist."),
+    )
 
     def clean(self):
         """Custom validation for Internal Course model"""
@@ -185,10 +190,7 @@ class InternalCourse(Course):
                 raise ValidationError(
                     _("Registration start date cannot be later than registration end date."))
 
-        if not Fee.objects.filter(
-            course_type=self.course_type,
-            fee_category=self.fee_category,
-        ).exists():
+        if not get_course_fees(self.course_type, self.fee_category):
             raise ValidationError(
                 _(f"No fee found for course type '{self.course_type}' and fee category '{self.fee_category}' found.")
             )
@@ -206,36 +208,38 @@ class InternalCourse(Course):
                 _("Online Registration for children's courses is not allowed. Please change the registration status to 'closed'.")
             )
 
-    def save(self, *args, **kwargs):
+    def apply_date_transitions(self, today=None):
+        """Sets status and registration status according to the course dates
+        without saving. Returns True if either value changed.
+        """
+        today = today or date.today()
+        old_values = (self.status, self.registration_status)
+
         if self.registration_start_date or self.registration_end_date:
-            start_ok = self.registration_start_date is None or self.registration_start_date <= date.today()
-            end_ok = self.registration_end_date is None or date.today() <= self.registration_end_date
+            start_ok = self.registration_start_date is None or self.registration_start_date <= today
+            end_ok = self.registration_end_date is None or today <= self.registration_end_date
 
             if start_ok and end_ok:
                 self.registration_status = 1
             else:
                 self.registration_status = 0
 
-        if self.publication_date and self.publication_date <= date.today():
+        if self.publication_date and self.publication_date <= today:
             self.status = 1
 
-        if self.end_date < date.today():
+        if self.end_date < today:
             self.status = 0
 
+        return (self.status, self.registration_status) != old_values
+
+    def save(self, *args, **kwargs):
+        self.apply_date_transitions()
+
         if self.has_dan_preparation and self.course_type not in constants.DAN_PREPARATION_COURSES:
             self.has_dan_preparation = False
 
         super().save(*args, **kwargs)
 
-    def update_has_dan_preparation(self):
-        has_dan_preparation = self.sessions.filter(
-            is_dan_preparation=True).exists()
-
-        if self.course_type in constants.DAN_PREPARATION_COURSES:
-            if self.has_dan_preparation != has_dan_preparation:
-                self.has_dan_preparation = has_dan_preparation
-                self.save()
-
     class Meta:
         verbose_name = _("Internal Course")
         verbose_name_plural = _("Internal Courses")
@@ -291,6 +295,16 @@ class CourseSession(TranslatableModel):
         blank=True,
         help_text=_("If set, overrides the standard session fee. Cash and membership surcharges do not apply."),
     )
+    capacity = models.PositiveIntegerField(
+        _("Capacity"),
+        blank=True,
+        null=True,
+        help_text=_("Maximum number of participants of this session."),
+    )
+    updated_at = models.DateTimeField(
+        _("Updated at"),
+        auto_now=True,
+    )
 
     def __str__(self):
         return f"{constants.WEEKDAYS[self.date.weekday()][1]}, {self.date.strftime('%d.%m.%Y')}, {self.start_time.strftime('%H:%M')}-{self.end_time.strftime('%H:%M')}: {self.title}"
@@ -304,10 +318,6 @@ class CourseSession(TranslatableModel):
             raise ValidationError(
                 _("Dan preparation sessions are not allowed on this course."))
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.course.update_has_dan_preparation()
-
     class Meta:
         ordering = ["date", "start_time"]
         verbose_name = _("Course Session")
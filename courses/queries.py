@@ -0,0 +1,115 @@
+from datetime import date, timedelta
+
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from parler.utils import get_active_language_choices
+
+from course_registrations.models import CourseRegistration
+
+from .models import Course, CourseSession, ExternalCourse, InternalCourse
+
+
+def translations_prefetch(model, lookup="translations", language_code=None):
+    """Prefetches only the translations of the active language and its
+    fallbacks. Parler reads translated fields from the prefetched rows
+    instead of querying them per object.
+    """
+    translation_model = model._parler_meta.root_model
+    return Prefetch(
+        lookup,
+        queryset=translation_model.objects.filter(
+            language_code__in=get_active_language_choices(language_code)
+        ),
+    )
+
+
+def published_courses_filter(today=None):
+    """Returns a filter for the internal courses that are published and
+    have not ended yet. It matches the status computed by
+    `InternalCourse.apply_date_transitions()`, so the stored status may
+    lag behind by a day.
+    """
+    today = today or date.today()
+    return Q(end_date__gte=today) & (Q(status=1) | Q(publication_date__lte=today))
+
+
+def get_course_list(user=None):
+    """Loads all internal and external courses for the course list.
+
+    Internal courses come with their translated sessions and the
+    registration of the given user (`user_registration`), so rendering
+    the list takes a fixed number of queries regardless of course count.
+    """
+    internal_courses = list(
+        InternalCourse.objects.prefetch_related(
+            translations_prefetch(InternalCourse),
+            Prefetch(
+                "sessions",
+                queryset=CourseSession.objects.prefetch_related(
+                    translations_prefetch(CourseSession)
+                ),
+            ),
+        )
+    )
+    external_courses = list(
+        ExternalCourse.objects.prefetch_related(
+            translations_prefetch(ExternalCourse)
+        )
+    )
+
+    registrations = {}
+    if user is not None and user.is_authenticated:
+        registrations = {
+            registration.course_id: registration
+            for registration in CourseRegistration.objects.filter(user=user)
+        }
+
+    for course in internal_courses:
+        course.user_registration = registrations.get(course.pk)
+        course.user_registered = course.user_registration is not None
+
+    return internal_courses, external_courses
+
+
+def get_upcoming_courses(user=None, days=120):
+    """Loads upcoming internal and external courses in a single query on
+    the base Course table and returns them as their concrete subclass.
+
+    Courses ending within the next `days` days are included, family
+    reunions regardless of their date. Each course carries
+    `user_registered`, computed in the database.
+    """
+    today = date.today()
+    courses = (
+        Course.objects.filter(end_date__gte=today)
+        .filter(
+            Q(end_date__lte=today + timedelta(days=days))
+            | Q(internalcourse__course_type="family_reunion")
+        )
+        .select_related("internalcourse", "externalcourse")
+        .prefetch_related(translations_prefetch(Course))
+        .order_by("start_date")
+    )
+
+    if user is not None and user.is_authenticated:
+        courses = courses.annotate(
+            user_registered=Exists(
+                CourseRegistration.objects.filter(
+                    user=user, course_id=OuterRef("pk")
+                )
+            )
+        )
+
+    upcoming_courses = []
+    for course in courses:
+        try:
+            subclass_course = course.internalcourse
+            subclass_course.apply_date_transitions(today)
+        except InternalCourse.DoesNotExist:
+            subclass_course = course.externalcourse
+
+        # Share the translations prefetched for the base course
+        subclass_course._prefetched_objects_cache = course._prefetched_objects_cache
+        subclass_course.user_registered = getattr(course, "user_registered", False)
+        upcoming_courses.append(subclass_course)
+
+    return upcoming_courses
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from danbw_website.conditional import touch_translated_object
+from danbw_website.page_cache import invalidate_page_cache
+
+from .derived import mark_courses_changed
+from .models import Course, CourseSession, ExternalCourse, InternalCourse
+
+CourseTranslation = Course._parler_meta.root_model
+CourseSessionTranslation = CourseSession._parler_meta.root_model
+
+
+@receiver(post_save, sender=InternalCourse)
+@receiver(post_delete, sender=InternalCourse)
+@receiver(post_save, sender=ExternalCourse)
+@receiver(post_delete, sender=ExternalCourse)
+@receiver(post_save, sender=CourseTranslation)
+@receiver(post_delete, sender=CourseTranslation)
+@receiver(post_save, sender=CourseSession)
+@receiver(post_delete, sender=CourseSession)
+@receiver(post_save, sender=CourseSessionTranslation)
+@receiver(post_delete, sender=CourseSessionTranslation)
+def course_changed(sender, **kwargs):
+    invalidate_page_cache()
+
+
+@receiver(post_save, sender=CourseTranslation)
+@receiver(post_delete, sender=CourseTranslation)
+@receiver(post_save, sender=CourseSessionTranslation)
+@receiver(post_delete, sender=CourseSessionTranslation)
+def course_translation_changed(sender, instance, **kwargs):
+    touch_translated_object(instance)
+
+
+@receiver(post_save, sender=CourseSession)
+@receiver(post_delete, sender=CourseSession)
+def course_session_changed(sender, instance, **kwargs):
+    mark_courses_changed([instance.course_id])
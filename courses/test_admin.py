@@ -2,11 +2,18 @@ import csv
 import io
 import zipfile
 from datetime import date, timedelta
+from unittest.mock import patch
 
 from django.contrib.admin.sites import AdminSite
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.db import connection
 from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
 from course_registrations.models import CourseRegistration
+from fees.models import Fee
 from users.models import User, UserProfile
 
 from .admin import ExternalCourseAdmin, InternalCourseAdmin
@@ -19,10 +26,21 @@ request_factory = RequestFactory()
 request = request_factory.get("/admin")
 
 
+def get_action_request(user):
+    """Returns a request for admin actions that log and report changes"""
+    action_request = request_factory.post("/admin")
+    action_request.user = user
+    action_request.session = {}
+    action_request._messages = FallbackStorage(action_request)
+    return action_request
+
+
 class TestCourseAdmin(TestCase):
     """Tests for the InternalCourseAdmin model"""
 
     def setUp(self):
+        # Parler caches translations by primary key
+        cache.clear()
         site = AdminSite()
         self.admin = InternalCourseAdmin(InternalCourse, site)
         self.course = InternalCourse.objects.create(
@@ -65,6 +83,19 @@ class TestCourseAdmin(TestCase):
         self.assertEqual(first_copy.slug, "copy-of-test-course")
         self.assertEqual(second_copy.slug, "copy-2-of-test-course")
 
+    def test_duplicate_skips_courses_without_translation(self):
+        print("\ntest_duplicate_skips_courses_without_translation")
+        self.course.translations.all().delete()
+        queryset = InternalCourse.objects.filter(pk=self.course.pk)
+        action_request = get_action_request(self.user)
+
+        self.admin.duplicate_selected_courses(action_request, queryset)
+
+        self.assertEqual(InternalCourse.objects.count(), 1)
+        messages = [str(message) for message in action_request._messages]
+        self.assertEqual(
+            messages, ["Lehrgänge ohne Übersetzung wurden nicht dupliziert: 1"])
+
     def test_get_course_registration_count(self):
         print("\ntest_get_course_registration_count")
         registrations = CourseRegistration.objects.filter(course=self.course)
@@ -73,9 +104,17 @@ class TestCourseAdmin(TestCase):
         )
         self.assertEqual(len(registrations), registration_count)
 
+        # The changelist queryset annotates the counts
+        course = self.admin.get_queryset(request).get(pk=self.course.pk)
+        self.assertEqual(self.admin.get_course_registration_count(course), 1)
+        self.assertEqual(self.admin.get_paid_count(course), 0)
+        self.assertEqual(self.admin.get_unpaid_count(course), 1)
+        self.assertEqual(self.admin.get_exam_count(course), 0)
+
     def test_toggle_registration_status_action(self):
         print("\ntest_toggle_registration_status_action")
         queryset = InternalCourse.objects.all()
+        request = get_action_request(self.user)
         self.admin.toggle_registration_status(request, queryset)
         self.course.refresh_from_db()
         self.assertEqual(self.course.registration_status, 1)
@@ -202,6 +241,7 @@ class TestCourseAdmin(TestCase):
 
         # Toggle status to False (draft)
         queryset = InternalCourse.objects.filter(id=published_course.id)
+        request = get_action_request(self.user)
         self.admin.toggle_status(request, queryset)
         published_course.refresh_from_db()
         self.assertEqual(published_course.status, False)
@@ -211,6 +251,61 @@ class TestCourseAdmin(TestCase):
         published_course.refresh_from_db()
         self.assertEqual(published_course.status, True)
 
+    def test_set_based_actions(self):
+        print("\ntest_set_based_actions")
+        children_course = InternalCourse.objects.create(
+            title="Children course",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="children",
+            fee_category="children",
+        )
+        queryset = InternalCourse.objects.all()
+        request = get_action_request(self.user)
+
+        # The selected ids, one UPDATE per table of the course model, the
+        # content type and the log entry
+        with self.assertNumQueries(5):
+            self.admin.publish(request, queryset)
+        self.assertEqual(queryset.filter(status=1).count(), 2)
+
+        self.admin.open_registration(request, queryset)
+        self.course.refresh_from_db()
+        children_course.refresh_from_db()
+        self.assertEqual(self.course.registration_status, 1)
+        self.assertEqual(children_course.registration_status, 0)
+
+        self.admin.unpublish(request, queryset)
+        self.admin.close_registration(request, queryset)
+        self.assertFalse(queryset.filter(status=1).exists())
+        self.assertFalse(queryset.filter(registration_status=1).exists())
+
+        messages = [str(message) for message in request._messages]
+        self.assertEqual(len(messages), 4)
+        self.assertIn("1", messages[1])
+
+    def test_reprice_registrations_action(self):
+        print("\ntest_reprice_registrations_action")
+        Fee.objects.create(
+            course_type="dan_bw_teacher",
+            fee_category="dan_member",
+            fee_type="single_session",
+            amount=10,
+        )
+        session = CourseSession.objects.create(
+            title="Test session", course=self.course, date=date.today())
+        self.registration.selected_sessions.add(session)
+        self.registration.dan_member = True
+        self.registration.save()
+
+        queryset = InternalCourse.objects.filter(id=self.course.id)
+        with patch.object(self.admin, "message_user") as message_user:
+            self.admin.reprice_registrations(request, queryset)
+
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.final_fee, 10)
+        message_user.assert_called_once()
+
     def test_export_csv_single_course(self):
         print("\ntest_export_csv_single_course")
         # Export single course (self.course from setUp already has a registration)
@@ -223,7 +318,7 @@ class TestCourseAdmin(TestCase):
         self.assertIn("test-course", response["Content-Disposition"])
 
         # Verify CSV contains registration data
-        content = response.content.decode("utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
         csv_reader = csv.reader(io.StringIO(content))
         rows = list(csv_reader)
 
@@ -271,7 +366,7 @@ class TestCourseAdmin(TestCase):
         self.assertIn("attachment", response["Content-Disposition"])
 
         # Verify ZIP contains CSV files
-        zip_content = io.BytesIO(response.content)
+        zip_content = io.BytesIO(b"".join(response.streaming_content))
         with zipfile.ZipFile(zip_content, "r") as zip_file:
             filenames = zip_file.namelist()
             self.assertEqual(len(filenames), 2)
@@ -280,6 +375,42 @@ class TestCourseAdmin(TestCase):
             self.assertTrue(any("test-course" in f for f in filenames))
             self.assertTrue(any("test-course-2" in f for f in filenames))
 
+    def test_export_csv_multiple_courses_query_count(self):
+        print("\ntest_export_csv_multiple_courses_query_count")
+        empty_course = InternalCourse.objects.create(
+            title="Empty course",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="dan_bw_teacher",
+            fee_category="dan_member",
+        )
+        def export():
+            queryset = InternalCourse.objects.filter(
+                id__in=[self.course.id, empty_course.id])
+            response = self.admin.export_csv(request, queryset)
+            return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+        with CaptureQueriesContext(connection) as queries:
+            export()
+        query_count = len(queries)
+
+        for i in range(10):
+            CourseRegistration.objects.create(
+                email=f"guest-{i}@example.com",
+                first_name="Guest",
+                last_name=str(i),
+                course=self.course,
+                accept_terms=True,
+            )
+
+        with self.assertNumQueries(query_count):
+            zip_file = export()
+
+        self.assertEqual(
+            zip_file.read("empty-course_registrations.csv").decode().count("\n"), 1)
+        self.assertEqual(
+            zip_file.read("test-course_registrations.csv").decode().count("\n"), 12)
+
     def test_duplicate_with_sessions(self):
         print("\ntest_duplicate_with_sessions")
         # Create sessions for the course
@@ -313,6 +444,127 @@ class TestCourseAdmin(TestCase):
         self.assertEqual(duplicated_sessions[1].title, "Session 2")
 
 
+class TestInternalCourseAdminViews(TestCase):
+    """Tests for the InternalCourseAdmin changelist and registration panel"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", password="testpassword", email="admin@example.com")
+        self.client.force_login(self.admin_user)
+        self.course = InternalCourse.objects.create(
+            title="Family reunion",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="family_reunion",
+            fee_category="family_reunion",
+        )
+        self.session = CourseSession.objects.create(
+            title="Session", course=self.course, date=date.today())
+
+    def create_registrations(self, course, count):
+        offset = CourseRegistration.objects.count()
+        registrations = CourseRegistration.objects.bulk_create(
+            CourseRegistration(
+                course=course,
+                email=f"guest-{i}@example.com",
+                first_name="Guest",
+                last_name=f"{i:04}",
+                accept_terms=True,
+                payment_status=i % 2,
+                exam=i % 3 == 0,
+                final_fee=100,
+            )
+            for i in range(offset, offset + count)
+        )
+        through = CourseRegistration.selected_sessions.through
+        through.objects.bulk_create(
+            through(courseregistration_id=registration.pk,
+                    coursesession_id=self.session.pk)
+            for registration in registrations
+            if registration.course_id == self.course.pk
+        )
+
+    def test_changelist_counts(self):
+        print("\ntest_changelist_counts")
+        self.create_registrations(self.course, 6)
+        url = reverse("admin:courses_internalcourse_changelist")
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        query_count = len(queries)
+
+        for i in range(5):
+            course = InternalCourse.objects.create(
+                title=f"Course {i}",
+                start_date=date.today(),
+                end_date=date.today(),
+                course_type="dan_bw_teacher",
+                fee_category="regular",
+            )
+            self.create_registrations(course, 3)
+
+        with self.assertNumQueries(query_count):
+            response = self.client.get(url)
+
+        course = next(
+            course for course in response.context["cl"].result_list
+            if course.pk == self.course.pk
+        )
+        self.assertEqual(course.registration_count, 6)
+        self.assertEqual(course.paid_count, 3)
+        self.assertEqual(course.unpaid_count, 3)
+        self.assertEqual(course.exam_count, 2)
+
+    def test_change_page_does_not_render_registrations(self):
+        print("\ntest_change_page_does_not_render_registrations")
+        self.create_registrations(self.course, 3)
+        response = self.client.get(
+            reverse("admin:courses_internalcourse_change", args=[self.course.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "guest-0@example.com")
+        self.assertContains(
+            response,
+            reverse("admin:courses_internalcourse_registrations",
+                    args=[self.course.pk]),
+        )
+
+    def test_registration_panel_is_paginated(self):
+        print("\ntest_registration_panel_is_paginated")
+        self.create_registrations(self.course, 60)
+        url = reverse("admin:courses_internalcourse_registrations",
+                      args=[self.course.pk])
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        query_count = len(queries)
+
+        self.assertEqual(len(response.context["rows"]), 50)
+        self.assertContains(response, "guest-0@example.com")
+        self.assertNotContains(response, "guest-59@example.com")
+        self.assertContains(response, 'data-page="2"')
+
+        response = self.client.get(url, {"page": 2})
+        self.assertEqual(len(response.context["rows"]), 10)
+        self.assertContains(response, "guest-59@example.com")
+
+        # Rendering a page does not depend on the number of registrations
+        self.create_registrations(self.course, 100)
+        with self.assertNumQueries(query_count):
+            self.client.get(url)
+
+    def test_registration_panel_requires_permission(self):
+        print("\ntest_registration_panel_requires_permission")
+        staff_user = User.objects.create_user(
+            username="staff", password="testpassword", is_staff=True)
+        self.client.force_login(staff_user)
+        response = self.client.get(reverse(
+            "admin:courses_internalcourse_registrations", args=[self.course.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
 class TestExternalCourseAdmin(TestCase):
     """Tests for the ExternalCourseAdmin model"""
 
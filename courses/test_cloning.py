@@ -0,0 +1,146 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .cloning import NEXT_YEAR, clone_courses
+from .models import AccommodationOption, CourseSession, ExternalCourse, InternalCourse
+
+
+class CourseCloningTest(TestCase):
+    """Tests for copying courses with their sessions and options"""
+
+    def setUp(self):
+        # Parler caches translations by primary key
+        cache.clear()
+        self.course = InternalCourse.objects.create(
+            title="Sommerlehrgang",
+            description="Beschreibung",
+            start_date=date(2025, 7, 5),
+            end_date=date(2025, 7, 6),
+            registration_start_date=date(2025, 5, 1),
+            registration_end_date=date(2025, 6, 30),
+            publication_date=date(2025, 4, 1),
+            course_type="family_reunion",
+            fee_category="family_reunion",
+            has_dinner=True,
+            discount_percentage=30,
+        )
+        self.course.set_current_language("en")
+        self.course.title = "Summer course"
+        self.course.save()
+        self.session = CourseSession.objects.create(
+            title="Training",
+            course=self.course,
+            date=date(2025, 7, 5),
+            start_time="10:00",
+            end_time="12:00",
+            is_dan_preparation=True,
+            price_override=Decimal("15.00"),
+        )
+        self.option = AccommodationOption.objects.create(
+            name="Zwei Nächte", course=self.course, fee=Decimal("80.00"), order=2)
+
+    def add_sessions(self, course, count):
+        for i in range(count):
+            CourseSession.objects.create(
+                title=f"Session {i}", course=course, date=course.start_date)
+
+    def test_clone_course(self):
+        print("\ntest_clone_course")
+        copy, = clone_courses(InternalCourse.objects.filter(pk=self.course.pk))
+        copy = InternalCourse.objects.get(pk=copy.pk)
+
+        self.assertEqual(copy.slug, "copy-of-sommerlehrgang")
+        self.assertEqual(copy.safe_translation_getter("title", language_code="de"),
+                         "Copy of Sommerlehrgang")
+        self.assertEqual(copy.safe_translation_getter("title", language_code="en"),
+                         "Copy of Summer course")
+        self.assertEqual(copy.safe_translation_getter("description", language_code="de"),
+                         "Beschreibung")
+        self.assertTrue(copy.has_dinner)
+        self.assertEqual(copy.discount_percentage, 30)
+        self.assertEqual(copy.start_date, self.course.start_date)
+        self.assertEqual(copy.status, 0)
+        self.assertIsNone(copy.publication_date)
+
+        session = copy.sessions.get()
+        self.assertEqual(session.title, "Training")
+        self.assertTrue(session.is_dan_preparation)
+        self.assertEqual(session.price_override, Decimal("15.00"))
+
+        option = copy.accommodation_options.get()
+        self.assertEqual(option.name, "Zwei Nächte")
+        self.assertEqual(option.fee, Decimal("80.00"))
+        self.assertEqual(option.order, 2)
+
+    def test_clone_for_next_year(self):
+        print("\ntest_clone_for_next_year")
+        copy, = clone_courses(
+            InternalCourse.objects.filter(pk=self.course.pk), next_year=True)
+
+        self.assertEqual(copy.start_date, date(2025, 7, 5) + NEXT_YEAR)
+        self.assertEqual(copy.start_date.weekday(), self.course.start_date.weekday())
+        self.assertEqual(copy.registration_end_date, date(2025, 6, 30) + NEXT_YEAR)
+        self.assertEqual(copy.publication_date, date(2025, 4, 1) + NEXT_YEAR)
+        self.assertEqual(copy.sessions.get().date, self.session.date + NEXT_YEAR)
+
+    def test_copy_numbers(self):
+        print("\ntest_copy_numbers")
+        other = InternalCourse.objects.create(
+            title="Sommerlehrgang",
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        copies = clone_courses(InternalCourse.objects.filter(pk__in=[self.course.pk, other.pk]))
+
+        self.assertEqual(
+            sorted(copy.safe_translation_getter("title", language_code="de") for copy in copies),
+            ["Copy 2 of Sommerlehrgang", "Copy of Sommerlehrgang"],
+        )
+
+    def test_query_count_does_not_grow_with_sessions(self):
+        print("\ntest_query_count_does_not_grow_with_sessions")
+        queryset = InternalCourse.objects.filter(pk=self.course.pk)
+        with CaptureQueriesContext(connection) as queries:
+            clone_courses(queryset)
+        query_count = len(queries)
+
+        self.add_sessions(self.course, 10)
+        with CaptureQueriesContext(connection) as queries:
+            clone_courses(queryset)
+
+        self.assertEqual(len(queries), query_count)
+        self.assertEqual(CourseSession.objects.count(), 1 + 1 + 10 + 11)
+
+    def test_courses_without_translation_are_skipped(self):
+        print("\ntest_courses_without_translation_are_skipped")
+        self.course.translations.all().delete()
+        other = InternalCourse.objects.create(
+            title="Winterlehrgang",
+            start_date=date(2025, 12, 6),
+            end_date=date(2025, 12, 7),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+
+        copy, = clone_courses(
+            InternalCourse.objects.filter(pk__in=[self.course.pk, other.pk]))
+
+        self.assertEqual(copy.title, "Copy of Winterlehrgang")
+        self.assertFalse(copy.sessions.exists())
+
+    def test_clone_external_course(self):
+        print("\ntest_clone_external_course")
+        course = ExternalCourse.objects.create(
+            title="Lehrgang in Paris", url="https://example.com", organizer="FFAAA")
+
+        copy, = clone_courses(ExternalCourse.objects.filter(pk=course.pk), next_year=True)
+
+        self.assertEqual(copy.title, "Copy of Lehrgang in Paris")
+        self.assertEqual(copy.url, "https://example.com")
+        self.assertEqual(copy.organizer, "FFAAA")
+        self.assertEqual(copy.start_date, course.start_date + NEXT_YEAR)
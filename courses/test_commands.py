@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .models import InternalCourse
+
+
+class UpdateCourseStatusCommandTest(TestCase):
+    """Tests for the update_course_status management command"""
+
+    def setUp(self):
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=31),
+            course_type="dan_bw_teacher",
+            fee_category="dan_member",
+        )
+        # Simulate a registration window that opened after the last save
+        InternalCourse.objects.filter(pk=self.course.pk).update(
+            registration_start_date=date.today(),
+            registration_end_date=date.today() + timedelta(days=10),
+            publication_date=date.today(),
+        )
+
+    def test_update_course_status(self):
+        print("\ntest_update_course_status")
+        out = StringIO()
+        call_command("update_course_status", stdout=out)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.registration_status, 1)
+        self.assertEqual(self.course.status, 1)
+        self.assertIn("Updated status of 1 course(s).", out.getvalue())
+
+    def test_update_course_status_is_idempotent(self):
+        print("\ntest_update_course_status_is_idempotent")
+        call_command("update_course_status", stdout=StringIO())
+
+        out = StringIO()
+        call_command("update_course_status", stdout=out)
+        self.assertIn("Updated status of 0 course(s).", out.getvalue())
@@ -0,0 +1,230 @@
+from datetime import date, time, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import translation
+
+from course_registrations.models import CourseRegistration
+from users.models import User, UserProfile
+
+from .ical import enable_calendar_feed, escape_text, fold_line
+from .models import CourseSession, ExternalCourse, InternalCourse
+
+
+class ICalendarTest(TestCase):
+    """Tests for the iCalendar feeds"""
+
+    def setUp(self):
+        # Parler caches translations by primary key
+        cache.clear()
+        self.course = self.create_course("Sommerlehrgang", days=10)
+        self.session = CourseSession.objects.create(
+            title="Training",
+            course=self.course,
+            date=self.course.start_date,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+        )
+        self.user = self.create_user("testuser")
+        self.url = reverse("course_calendar")
+
+    def create_course(self, title, days, **kwargs):
+        values = {
+            "title": title,
+            "start_date": date.today() + timedelta(days=days),
+            "end_date": date.today() + timedelta(days=days + 1),
+            "course_type": "dan_bw_teacher",
+            "fee_category": "regular",
+            "status": 1,
+            **kwargs,
+        }
+        return InternalCourse.objects.create(**values)
+
+    def create_user(self, username):
+        user = User.objects.create_user(
+            username=username, email=f"{username}@example.com", password="testpassword")
+        UserProfile.objects.create(user=user)
+        return user
+
+    def register(self, user, course, sessions, **kwargs):
+        registration = CourseRegistration.objects.create(
+            user=user, course=course, accept_terms=True, **kwargs)
+        registration.selected_sessions.set(sessions)
+        return registration
+
+    def user_url(self, user):
+        return reverse("user_calendar", kwargs={"token": enable_calendar_feed(user)})
+
+    def test_escape_and_fold(self):
+        print("\ntest_escape_and_fold")
+        self.assertEqual(escape_text("a,b;c\\d\ne"), "a\\,b\\;c\\\\d\\ne")
+        folded = fold_line("SUMMARY:" + "ä" * 60)
+        lines = folded.split("\r\n")
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual("".join(line[1:] if i else line for i, line in enumerate(lines)),
+                         "SUMMARY:" + "ä" * 60)
+
+    def test_course_calendar(self):
+        print("\ntest_course_calendar")
+        self.create_course("Vorschau", days=20, status=0)
+        ExternalCourse.objects.create(
+            title="Lehrgang in Paris",
+            start_date=date.today() + timedelta(days=5),
+            end_date=date.today() + timedelta(days=6),
+            organizer="FFAAA",
+            url="https://example.com",
+        )
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        content = response.content.decode()
+        self.assertTrue(content.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertEqual(content.count("BEGIN:VEVENT"), 3)
+        self.assertIn("SUMMARY:Sommerlehrgang\r\n", content)
+        self.assertIn("SUMMARY:Sommerlehrgang: Training\r\n", content)
+        self.assertIn("SUMMARY:Lehrgang in Paris\r\n", content)
+        self.assertNotIn("Vorschau", content)
+        self.assertIn(
+            f"DTSTART;VALUE=DATE:{self.course.start_date:%Y%m%d}", content)
+
+    def test_course_calendar_is_cached(self):
+        print("\ntest_course_calendar_is_cached")
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        self.session.title = "Iaido"
+        self.session.save()
+        response = self.client.get(self.url)
+        self.assertIn("SUMMARY:Sommerlehrgang: Iaido", response.content.decode())
+
+    def test_course_calendar_per_language(self):
+        print("\ntest_course_calendar_per_language")
+        self.course.set_current_language("en")
+        self.course.title = "Summer course"
+        self.course.save()
+
+        self.client.get(self.url)
+        with translation.override("en"):
+            response = self.client.get(reverse("course_calendar"))
+        self.assertIn("SUMMARY:Summer course", response.content.decode())
+
+    def test_conditional_get(self):
+        print("\ntest_conditional_get")
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.course.location = "Stuttgart"
+        self.course.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_courses(self):
+        print("\ntest_query_count_does_not_grow_with_courses")
+        for days in range(11, 16):
+            course = self.create_course(f"Lehrgang {days}", days=days)
+            CourseSession.objects.create(title="Training", course=course)
+            ExternalCourse.objects.create(
+                title=f"Extern {days}",
+                start_date=course.start_date,
+                end_date=course.end_date,
+            )
+        cache.clear()
+
+        # Internal courses, sessions, external courses and their translations
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content.decode().count("BEGIN:VEVENT"), 17)
+
+    def test_user_calendar(self):
+        print("\ntest_user_calendar")
+        other_session = CourseSession.objects.create(
+            title="Kinder", course=self.course, date=self.course.start_date)
+        self.register(self.user, self.course, [self.session])
+        waitlisted_course = self.create_course("Winterlehrgang", days=30)
+        waitlisted_session = CourseSession.objects.create(
+            title="Training", course=waitlisted_course,
+            date=waitlisted_course.start_date)
+        self.register(self.user, waitlisted_course, [waitlisted_session],
+                      waitlisted=True)
+        other_user = self.create_user("other")
+        self.register(other_user, self.course, [other_session])
+
+        response = self.client.get(self.user_url(self.user))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        content = response.content.decode()
+        self.assertEqual(content.count("BEGIN:VEVENT"), 2)
+        self.assertIn("SUMMARY:Sommerlehrgang: Training", content)
+        self.assertIn("SUMMARY:Winterlehrgang: Training", content)
+        self.assertNotIn("Kinder", content)
+        self.assertEqual(content.count("STATUS:TENTATIVE"), 1)
+
+    def test_user_calendar_invalid_token(self):
+        print("\ntest_user_calendar_invalid_token")
+        url = reverse("user_calendar", kwargs={"token": "invalid"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.user_url(self.user)).status_code, 404)
+
+    def test_user_calendar_is_cached(self):
+        print("\ntest_user_calendar_is_cached")
+        registration = self.register(self.user, self.course, [self.session])
+        url = self.user_url(self.user)
+        etag = self.client.get(url)["ETag"]
+
+        # Only the registration state of the user is read
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        registration.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("BEGIN:VEVENT", response.content.decode())
+
+    def test_reset_calendar_token(self):
+        print("\ntest_reset_calendar_token")
+        self.register(self.user, self.course, [self.session])
+        url = self.user_url(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("reset_calendar_token"))
+
+        self.assertRedirects(response, reverse("courseregistration_list"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.user.refresh_from_db()
+        self.assertEqual(self.client.get(self.user_url(self.user)).status_code, 200)
+
+    def test_registration_list_links_calendar(self):
+        print("\ntest_registration_list_links_calendar")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("courseregistration_list"))
+
+        # Viewing the list does not create a token
+        self.assertContains(response, reverse("enable_calendar_feed"))
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.calendar_token)
+
+        response = self.client.post(reverse("enable_calendar_feed"), follow=True)
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.calendar_token)
+        self.assertContains(response, self.user_url(self.user))
+        self.assertNotContains(response, reverse("enable_calendar_feed"))
+
+        # Enabling the feed again keeps the link
+        token = self.user.calendar_token
+        self.client.post(reverse("enable_calendar_feed"))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.calendar_token, token)
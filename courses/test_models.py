@@ -1,7 +1,9 @@
 from datetime import date, datetime, time, timedelta
 
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from fees.models import Fee
 from .models import AccommodationOption, Course, CourseSession, InternalCourse
@@ -212,19 +214,66 @@ class TestCourseBusinessLogic(TestCase):
         )
 
         # Add a DAN preparation session
-        session = CourseSession.objects.create(
-            title="DAN Prep Session",
-            course=course,
-            date=date.today(),
-            start_time=time(10, 0),
-            end_time=time(12, 0),
-            is_dan_preparation=True,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            session = CourseSession.objects.create(
+                title="DAN Prep Session",
+                course=course,
+                date=date.today(),
+                start_time=time(10, 0),
+                end_time=time(12, 0),
+                is_dan_preparation=True,
+            )
 
         # Refresh course from DB
         course.refresh_from_db()
         self.assertEqual(course.has_dan_preparation, True)  # Should be updated
 
+    def test_has_dan_preparation_is_updated_once_per_transaction(self):
+        print("\ntest_has_dan_preparation_is_updated_once_per_transaction")
+        course = InternalCourse.objects.create(
+            title="DAN prep course",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="family_reunion",
+            fee_category="dan_member",
+        )
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(5):
+                CourseSession.objects.create(
+                    title=f"Session {i}",
+                    course=course,
+                    date=date.today(),
+                    is_dan_preparation=True,
+                )
+        course.refresh_from_db()
+        self.assertFalse(course.has_dan_preparation)
+
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        course_updates = [
+            query for query in queries
+            if query["sql"].startswith('UPDATE "courses_internalcourse"')
+        ]
+        self.assertEqual(len(course_updates), 1)
+        course.refresh_from_db()
+        self.assertTrue(course.has_dan_preparation)
+
+        # Deleting the sessions resets the flag
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseSession.objects.filter(course=course).delete()
+        course.refresh_from_db()
+        self.assertFalse(course.has_dan_preparation)
+
+        # Unchanged flags cause no writes
+        with self.captureOnCommitCallbacks() as callbacks:
+            CourseSession.objects.create(
+                title="Session", course=course, date=date.today())
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+
 
 class TestCourseSessionModel(TestCase):
     """Tests for the CourseSession model"""
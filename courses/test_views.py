@@ -2,7 +2,9 @@ from datetime import date, datetime, timedelta
 
 from django.contrib.messages import get_messages
 from django.core import mail
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from course_registrations.models import CourseRegistration
@@ -67,3 +69,88 @@ class CourseListTest(TestCase):
         self.assertTemplateUsed(response, "course_list.html")
         # Verify the view executes the authenticated user code path
 
+
+    def test_course_list_does_not_write(self):
+        print("\ntest_course_list_does_not_write")
+        # Course whose stored registration status is outdated
+        InternalCourse.objects.filter(pk=self.course.pk).update(
+            registration_start_date=date.today() - timedelta(days=1),
+            registration_end_date=date.today() + timedelta(days=1),
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("course_list"))
+
+        self.assertEqual(response.status_code, 200)
+        writes = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith(("UPDATE", "INSERT", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+
+        # The registration status is computed on read without being saved
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.registration_status, 0)
+        self.assertContains(response, reverse("register_course", args=[self.course.slug]))
+
+    def test_course_list_query_count_is_constant(self):
+        print("\ntest_course_list_query_count_is_constant")
+        CourseSession.objects.create(
+            title="Session", course=self.course, date=date.today())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("course_list"))
+        query_count = len(queries)
+
+        for i in range(self.number_of_courses, self.number_of_courses + 10):
+            course = InternalCourse.objects.create(
+                title=f"Course {i}",
+                start_date=date.today(),
+                end_date=date.today() + timedelta(days=1),
+                course_type="dan_bw_teacher",
+                fee_category="dan_member",
+            )
+            CourseSession.objects.create(
+                title=f"Session {i}",
+                course=course,
+                date=date.today(),
+            )
+
+        with self.assertNumQueries(query_count):
+            self.client.get(reverse("course_list"))
+
+    def test_course_list_query_count_authenticated_user(self):
+        print("\ntest_course_list_query_count_authenticated_user")
+        user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        UserProfile.objects.create(user=user)
+        self.client.force_login(user)
+
+        def add_course_with_registration(i):
+            course = InternalCourse.objects.create(
+                title=f"Registered course {i}",
+                start_date=date.today() + timedelta(days=7),
+                end_date=date.today() + timedelta(days=8),
+                course_type="dan_bw_teacher",
+                fee_category="dan_member",
+            )
+            session = CourseSession.objects.create(
+                title=f"Session {i}", course=course, date=course.start_date)
+            registration = CourseRegistration.objects.create(
+                user=user, course=course, accept_terms=True)
+            registration.selected_sessions.add(session)
+
+        add_course_with_registration(0)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("course_list"))
+        query_count = len(queries)
+        self.assertContains(response, "Angemeldet")
+
+        for i in range(1, 10):
+            add_course_with_registration(i)
+
+        with self.assertNumQueries(query_count):
+            response = self.client.get(reverse("course_list"))
+        self.assertEqual(
+            response.content.decode().count("Deine Anmeldung anzeigen"), 10)
@@ -5,4 +5,14 @@ from . import views
 
 urlpatterns = [
     path(_("courses/"), views.CourseList.as_view(), name="course_list"),
+    path(
+        _("courses/calendar.ics"),
+        views.CourseCalendar.as_view(),
+        name="course_calendar",
+    ),
+    path(
+        _("courses/calendar/<str:token>.ics"),
+        views.UserCalendar.as_view(),
+        name="user_calendar",
+    ),
 ]
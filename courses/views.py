@@ -1,36 +1,47 @@
 from datetime import date
 
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
 from django.views import View
 
-from course_registrations.models import CourseRegistration
+from danbw_website.conditional import content_condition
+from danbw_website.page_cache import (
+    cache_anonymous_page,
+    get_page_cache_timeout,
+    get_page_cache_version,
+)
 
-from .models import ExternalCourse, InternalCourse
+from pages.models import Category, Page
 
+from .ical import get_course_calendar, get_user_calendar
+from .models import Course, CourseSession
+from .queries import get_course_list
 
+
+@method_decorator(
+    content_condition(Course, CourseSession, Category, Page), name="dispatch")
+@method_decorator(cache_anonymous_page, name="dispatch")
 class CourseList(View):
     """Displays a list of all internal and external courses"""
 
     def get(self, request):
-        internal_courses = InternalCourse.objects.all()
-        external_courses = ExternalCourse.objects.all()
+        internal_courses, external_courses = get_course_list(request.user)
 
-        # Update the registration status for each course and set users registration status
+        # Compute the current status on read. Stored values are kept up to
+        # date by the update_course_status management command.
+        today = date.today()
         for course in internal_courses:
-            course.save()
-
-            if request.user.is_authenticated:
-                course.user_registered = CourseRegistration.objects.filter(
-                    user=request.user, course=course
-                )
+            course.apply_date_transitions(today)
 
-        all_courses = list(internal_courses) + list(external_courses)
+        all_courses = internal_courses + external_courses
         all_courses = sorted(
             all_courses, key=lambda course: course.start_date, reverse=True)
         past_courses = filter(
-            lambda course: course.end_date < date.today(), all_courses)
+            lambda course: course.end_date < today, all_courses)
         current_courses = filter(
-            lambda course: course.end_date >= date.today(), all_courses)
+            lambda course: course.end_date >= today, all_courses)
 
         show_linked_modal = request.session.pop("show_linked_modal", False)
 
@@ -41,5 +52,42 @@ class CourseList(View):
                 "past_courses": past_courses,
                 "current_courses": current_courses,
                 "show_linked_modal": show_linked_modal,
+                # Course details are cached as template fragments
+                "page_cache_version": get_page_cache_version(),
+                "page_cache_timeout": get_page_cache_timeout(),
             },
         )
+
+
+def calendar_response(request, calendar, private=False):
+    """Returns the calendar or 304 Not Modified if the client has the
+    current version
+    """
+    etag, content = calendar
+    etag = f'"{etag}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type="text/calendar; charset=utf-8")
+        response["Content-Disposition"] = 'inline; filename="calendar.ics"'
+    response["ETag"] = etag
+    patch_cache_control(response, private=private, public=not private, max_age=300)
+    return response
+
+
+class CourseCalendar(View):
+    """iCalendar feed of the published courses and their sessions"""
+
+    def get(self, request):
+        return calendar_response(request, get_course_calendar(request))
+
+
+class UserCalendar(View):
+    """iCalendar feed of the sessions a user registered for. The feed is
+    addressed by a signed token instead of a login.
+    """
+
+    def get(self, request, token):
+        calendar = get_user_calendar(request, token)
+        if calendar is None:
+            raise Http404
+        return calendar_response(request, calendar, private=True)
@@ -0,0 +1,60 @@
+"""Admin actions that change all selected objects with a single UPDATE.
+
+`update()` sends no signals and skips `save()`, so callers invalidate
+caches themselves. `auto_now` fields are set explicitly.
+"""
+import json
+
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.admin.utils import model_ngettext
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, Value, When
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+
+def toggled(model, field_name):
+    """Returns an expression that flips a boolean or 0/1 field."""
+    field = model._meta.get_field(field_name)
+    return Case(
+        When(**{field_name: True}, then=Value(False)),
+        default=Value(True),
+        output_field=field,
+    )
+
+
+def update_selected(modeladmin, request, queryset, **values):
+    """Sets `values` on all objects of `queryset` in one UPDATE, records
+    a single log entry for the change and reports the number of updated
+    objects. Returns that number.
+    """
+    model = queryset.model
+    now = timezone.now()
+    for field in model._meta.concrete_fields:
+        if getattr(field, "auto_now", False):
+            values.setdefault(field.name, now)
+
+    count = queryset.update(**values)
+    items = model_ngettext(model._meta, count)
+
+    if count:
+        changed_fields = [
+            str(model._meta.get_field(name).verbose_name)
+            for name in values
+            if not getattr(model._meta.get_field(name), "auto_now", False)
+        ]
+        LogEntry.objects.create(
+            user_id=request.user.pk,
+            content_type=ContentType.objects.get_for_model(
+                model, for_concrete_model=False),
+            object_repr=f"{count} {items}"[:200],
+            action_flag=CHANGE,
+            change_message=json.dumps([{"changed": {"fields": changed_fields}}]),
+        )
+
+    modeladmin.message_user(
+        request,
+        _("Successfully updated %(count)d %(items)s.") % {
+            "count": count, "items": items},
+    )
+    return count
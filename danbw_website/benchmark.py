@@ -0,0 +1,304 @@
+"""Benchmark data and scenarios for the main views.
+
+`seed_benchmark_data()` fills the database with a realistic volume of
+courses, sessions, users and registrations in both languages, and
+`run_benchmarks()` requests each scenario and measures the number of
+queries and the wall-clock time. Both are used by the performance tests
+and the benchmark management command.
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import translation
+
+from course_registrations.models import CourseRegistration
+from courses.models import Course, CourseSession, ExternalCourse, InternalCourse
+from fees.models import Fee
+from users.models import User, UserProfile
+
+LANGUAGES = ("de", "en")
+
+# Course types with fees for the "regular" fee category in fees.json
+COURSE_TYPES = ("dan_bw_teacher", "external_teacher", "sensei_emmerson", "hombu_dojo")
+
+
+def seed_benchmark_data(
+    courses=200,
+    sessions_per_course=10,
+    registrations=3000,
+    users=400,
+    seed=0,
+):
+    """Creates benchmark data and returns a dict with the objects the
+    scenarios use: `user`, `admin` and `course` (open for registration).
+    """
+    rng = random.Random(seed)
+    today = date.today()
+
+    if not Fee.objects.exists():
+        call_command("loaddata", "fees.json", verbosity=0)
+
+    admin = User.objects.create_superuser(
+        username="benchmark-admin",
+        password="benchmark",
+        email="benchmark-admin@example.com",
+        first_name="Benchmark",
+        last_name="Admin",
+    )
+    user_objects = User.objects.bulk_create(
+        User(
+            username=f"benchmark-user-{i}",
+            email=f"benchmark-user-{i}@example.com",
+            first_name="Benchmark",
+            last_name=f"User {i}",
+            password="!",
+        )
+        for i in range(users)
+    )
+    UserProfile.objects.bulk_create(
+        UserProfile(
+            user=user,
+            slug=f"benchmark-{user.username}",
+            dojo="AAR",
+            grade=rng.randint(0, 8),
+        )
+        for user in user_objects + [admin]
+    )
+
+    # Multi-table inheritance rules out bulk_create for the courses
+    course_objects = []
+    for i in range(courses):
+        start_date = today + timedelta(days=rng.randint(-720, 240))
+        course_objects.append(InternalCourse.objects.create(
+            title=f"Benchmark-Lehrgang {i}",
+            start_date=start_date,
+            end_date=start_date + timedelta(days=1),
+            status=1,
+            registration_start_date=today - timedelta(days=30),
+            registration_end_date=start_date,
+            course_type=rng.choice(COURSE_TYPES),
+            fee_category="regular",
+            discount_percentage=50,
+        ))
+    for i in range(courses // 4):
+        start_date = today + timedelta(days=rng.randint(-720, 240))
+        course_objects.append(ExternalCourse.objects.create(
+            title=f"Externer Benchmark-Lehrgang {i}",
+            start_date=start_date,
+            end_date=start_date + timedelta(days=2),
+        ))
+
+    course_translation = Course._parler_meta.root_model
+    course_translation.objects.bulk_create(
+        course_translation(
+            master_id=course.pk,
+            language_code="en",
+            title=f"Benchmark course {course.pk}",
+            description="Benchmark description",
+        )
+        for course in course_objects
+    )
+
+    internal_courses = [
+        course for course in course_objects if isinstance(course, InternalCourse)
+    ]
+    sessions = CourseSession.objects.bulk_create(
+        CourseSession(
+            course=course,
+            date=course.start_date + timedelta(days=i % 2),
+            start_time=f"{10 + i % 8}:00",
+            end_time=f"{11 + i % 8}:00",
+        )
+        for course in internal_courses
+        for i in range(sessions_per_course)
+    )
+    session_translation = CourseSession._parler_meta.root_model
+    session_translation.objects.bulk_create(
+        session_translation(
+            master_id=session.pk,
+            language_code=language_code,
+            title=f"Training {session.pk} ({language_code})",
+        )
+        for session in sessions
+        for language_code in LANGUAGES
+    )
+
+    sessions_by_course = {}
+    for session in sessions:
+        sessions_by_course.setdefault(session.course_id, []).append(session)
+
+    # Spread the registrations over the courses, one per user and course
+    registration_objects = []
+    pairs = set()
+    while len(registration_objects) < registrations:
+        course = rng.choice(internal_courses)
+        user = rng.choice(user_objects)
+        if (course.pk, user.pk) in pairs:
+            continue
+        pairs.add((course.pk, user.pk))
+        registration_objects.append(CourseRegistration(
+            user=user,
+            course=course,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            dojo="AAR",
+            accept_terms=True,
+            final_fee=rng.randint(10, 200),
+            payment_status=rng.randint(0, 1),
+        ))
+    registration_objects = CourseRegistration.objects.bulk_create(
+        registration_objects, batch_size=500)
+
+    through = CourseRegistration.selected_sessions.through
+    through.objects.bulk_create(
+        (
+            through(courseregistration_id=registration.pk, coursesession_id=session.pk)
+            for registration in registration_objects
+            for session in rng.sample(
+                sessions_by_course[registration.course_id],
+                rng.randint(1, sessions_per_course),
+            )
+        ),
+        batch_size=1000,
+    )
+
+    # The benchmark user registers for the first upcoming course in the POST
+    # scenario and has registrations of its own for the list
+    user = user_objects[0]
+    registered = {course_id for course_id, user_id in pairs if user_id == user.pk}
+    course = next(
+        course for course in sorted(internal_courses, key=lambda c: c.start_date)
+        if course.start_date > today + timedelta(days=7) and course.pk not in registered
+    )
+
+    return {"user": user, "admin": admin, "course": course}
+
+
+def get_scenarios(data):
+    """Returns the benchmark scenarios as (name, client user, method, url,
+    post data) tuples.
+    """
+    course = data["course"]
+    session_ids = list(course.sessions.values_list("pk", flat=True))
+    return [
+        ("CourseList", None, "get", reverse("course_list"), None),
+        ("CourseList (user)", "user", "get", reverse("course_list"), None),
+        ("HomePage", None, "get", reverse("home"), None),
+        ("HomePage (user)", "user", "get", reverse("home"), None),
+        (
+            "RegisterCourse GET",
+            "user",
+            "get",
+            reverse("register_course", kwargs={"slug": course.slug}),
+            None,
+        ),
+        (
+            "RegisterCourse POST",
+            "user",
+            "post",
+            reverse("register_course", kwargs={"slug": course.slug}),
+            {
+                "selected_sessions": session_ids,
+                "accept_terms": True,
+                "payment_method": 0,
+            },
+        ),
+        (
+            "CourseRegistrationList",
+            "user",
+            "get",
+            reverse("courseregistration_list"),
+            None,
+        ),
+        (
+            "Admin registrations",
+            "admin",
+            "get",
+            reverse("admin:course_registrations_courseregistration_changelist"),
+            None,
+        ),
+        (
+            "Admin internal courses",
+            "admin",
+            "get",
+            reverse("admin:courses_internalcourse_changelist"),
+            None,
+        ),
+        (
+            "Admin course registrations",
+            "admin",
+            "get",
+            reverse(
+                "admin:courses_internalcourse_registrations", args=[course.pk]),
+            None,
+        ),
+        (
+            "Admin registration CSV",
+            "admin",
+            "post",
+            reverse("admin:course_registrations_courseregistration_changelist"),
+            {
+                "action": "export_csv",
+                "select_across": 1,
+                "index": 0,
+                "_selected_action": CourseRegistration.objects.values_list(
+                    "pk", flat=True).first(),
+            },
+        ),
+        (
+            "Admin course zip",
+            "admin",
+            "post",
+            reverse("admin:courses_internalcourse_changelist"),
+            {
+                "action": "export_csv",
+                "select_across": 1,
+                "index": 0,
+                "_selected_action": course.pk,
+            },
+        ),
+    ]
+
+
+def run_scenario(client, method, url, post_data):
+    """Requests a scenario and returns (status code, queries, seconds).
+    Changes made by the request are rolled back.
+    """
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, post_data or {})
+            if response.streaming:
+                b"".join(response.streaming_content)
+            seconds = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return response.status_code, len(queries), seconds
+
+
+def run_benchmarks(data, repeat=3):
+    """Runs every scenario `repeat` times and returns a list of
+    (name, status code, queries, fastest time in seconds).
+    """
+    clients = {None: Client()}
+    for name in ("user", "admin"):
+        clients[name] = Client()
+        clients[name].force_login(data[name])
+
+    results = []
+    with translation.override("de"):
+        for name, client_user, method, url, post_data in get_scenarios(data):
+            runs = [
+                run_scenario(clients[client_user], method, url, post_data)
+                for _ in range(repeat)
+            ]
+            status_code, queries, _ = runs[-1]
+            results.append(
+                (name, status_code, queries, min(run[2] for run in runs)))
+    return results
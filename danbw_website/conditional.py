@@ -0,0 +1,82 @@
+"""Conditional GET for pages that are built from courses and CMS pages.
+
+The validators are derived from the latest `updated_at` and the number of
+rows of the models a page shows, which are read in a single query. The
+row counts catch deletions, and the date catches the date-driven course
+status changes. Only anonymous requests get validators because pages of
+logged-in users contain personal data.
+"""
+import hashlib
+from datetime import datetime, time
+
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils import timezone, translation
+from django.views.decorators.http import condition
+
+from .page_cache import is_cacheable_request
+
+
+def touch_translated_object(translation_object):
+    """Sets `updated_at` of the object a parler translation belongs to."""
+    master_model = translation_object._meta.get_field("master").related_model
+    master_model.objects.filter(pk=translation_object.master_id).update(
+        updated_at=timezone.now())
+
+
+def get_content_state(models):
+    """Returns a tuple of the latest `updated_at` of the given models and
+    their row counts.
+    """
+    querysets = [
+        model.objects.order_by()
+        .annotate(group=Value(index, output_field=IntegerField()))
+        .values("group")
+        .annotate(latest=Max("updated_at"), count=Count("pk"))
+        .values_list("group", "latest", "count")
+        for index, model in enumerate(models)
+    ]
+    rows = querysets[0].union(*querysets[1:], all=True)
+
+    counts = [0] * len(models)
+    latest = None
+    for index, updated_at, count in rows:
+        counts[index] = count
+        if updated_at and (latest is None or updated_at > latest):
+            latest = updated_at
+    return latest, tuple(counts)
+
+
+def content_condition(*models):
+    """Decorator that answers conditional GET requests of anonymous
+    visitors with 304 Not Modified while none of the models has changed.
+    """
+
+    def get_state(request):
+        # The ETag and the last-modified date are computed from one query
+        state = getattr(request, "_content_state", None)
+        if state is None:
+            state = request._content_state = get_content_state(models)
+        return state
+
+    def etag_func(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return None
+        latest, counts = get_state(request)
+        value = ":".join([
+            latest.isoformat() if latest else "",
+            ",".join(str(count) for count in counts),
+            timezone.localdate().isoformat(),
+            translation.get_language() or "",
+        ])
+        return hashlib.md5(value.encode()).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return None
+        latest, _ = get_state(request)
+        # Pages change at midnight when course status is date-driven
+        midnight = timezone.make_aware(
+            datetime.combine(timezone.localdate(), time.min))
+        return max(latest, midnight) if latest else midnight
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
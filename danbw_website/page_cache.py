@@ -0,0 +1,114 @@
+"""Full-response cache for pages that look the same to every anonymous
+visitor.
+
+Responses are cached per language and path until midnight, when the
+date-driven course status changes, or until a course, session, page or
+category changes and `invalidate_page_cache()` is called. The version
+key lives in the shared cache, so an invalidation reaches every process
+at once. `MAX_TIMEOUT` only bounds how long a page can be stale after a
+change that bypasses the signals, such as `QuerySet.update()`.
+"""
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from uuid import uuid4
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils import timezone, translation
+
+VERSION_KEY = "page_cache:version"
+PAGE_KEY = "page_cache:{version}:{language}:{path}"
+
+# Upper limit for the time a page is cached, in seconds
+MAX_TIMEOUT = 10 * 60
+
+# Session flags that make a view render a one-time notice
+SESSION_FLAGS = ("show_linked_modal",)
+
+
+def get_page_cache_version():
+    """Returns the current page cache version shared by all processes."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_page_cache():
+    """Discards all cached pages."""
+    cache.set(VERSION_KEY, uuid4().hex, timeout=None)
+
+
+def seconds_until_midnight():
+    """Returns the number of seconds until the next local midnight."""
+    now = timezone.localtime()
+    midnight = (now + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def get_page_cache_timeout():
+    """Returns the cache timeout for a page rendered now. Pages never
+    outlive the day they were rendered on.
+    """
+    return min(seconds_until_midnight(), MAX_TIMEOUT)
+
+
+def is_cacheable_request(request):
+    """Anonymous GET and HEAD requests without pending messages or
+    session flags can be served from the cache.
+    """
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+        and not any(flag in request.session for flag in SESSION_FLAGS)
+    )
+
+
+def get_page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(
+        version=get_page_cache_version(),
+        language=translation.get_language(),
+        path=path,
+    )
+
+
+def cache_anonymous_page(view):
+    """Caches the response of a view for anonymous visitors."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = get_page_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+        if isinstance(response, SimpleTemplateResponse):
+            response.render()
+        # Pages that contain a CSRF token or set cookies are not shared
+        if (
+            request.method == "GET"
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        ):
+            cache.set(
+                key,
+                (response.content, response["Content-Type"]),
+                timeout=get_page_cache_timeout(),
+            )
+        return response
+
+    return wrapper
@@ -0,0 +1,170 @@
+"""Rate limiting of form submissions with counters in the cache.
+
+Every endpoint has one counter per client IP address and, if the form
+has an email field, one per email address. Each counter allows up to
+`count` submissions per fixed window of `period` seconds. Requests beyond
+the limit are answered with 429 Too Many Requests before the view runs,
+so they cost neither form validation nor database queries.
+
+A submission is counted after the view has answered it. Endpoints with
+`failures_only` only count submissions that were rejected, i.e. not
+answered with a redirect, or that filled in the honeypot field. Several
+members of a family can so register from one address, while guessing
+captchas or posting invalid forms is still limited.
+
+The counters are created with `cache.add()` and increased with
+`cache.incr()`, which Redis and the local memory cache perform
+atomically, so concurrent requests are each counted. The counters live
+in the shared cache and apply across all processes. The database cache
+reads and writes the counter in two steps, so two concurrent requests
+may occasionally be counted as one there.
+
+The limits are configured per endpoint in the RATE_LIMITS setting.
+"""
+import hashlib
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEY = "ratelimit:{scope}:{kind}:{value}:{window}"
+
+# Hidden form field that only bots fill in
+HONEYPOT_FIELD = "website"
+
+
+def get_client_ip(request):
+    """Returns the IP address of the client. The trusted header set by
+    the proxy takes precedence over the address of the connection.
+    """
+    header = getattr(settings, "ALLAUTH_TRUSTED_CLIENT_IP_HEADER", None)
+    if header:
+        value = request.META.get("HTTP_" + header.upper().replace("-", "_"))
+        if value:
+            return value.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def get_counter_key(scope, kind, value, period, now):
+    """Returns the cache key of the counter of `value` in the window of
+    `now` and the number of the window
+    """
+    window = int(now // period)
+    digest = hashlib.md5(value.encode()).hexdigest()
+    key = COUNTER_KEY.format(scope=scope, kind=kind, value=digest, window=window)
+    return key, window
+
+
+def get_window_wait(window, period, now):
+    """Returns the number of seconds until the window ends"""
+    return max(math.ceil((window + 1) * period - now), 1)
+
+
+def count_request(scope, kind, value, count, period):
+    """Counts a request in the current window of `value`. Returns 0 if
+    the request is within the limit, otherwise the number of seconds
+    until the window ends.
+    """
+    now = time.time()
+    key, window = get_counter_key(scope, kind, value, period, now)
+
+    # The counter outlives its window, so it cannot expire before incr()
+    if cache.add(key, 1, timeout=period + 60):
+        requests = 1
+    else:
+        try:
+            requests = cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=period + 60)
+            requests = 1
+
+    if requests > count:
+        return get_window_wait(window, period, now)
+    return 0
+
+
+def get_limited_values(request, scope, email_field=None):
+    """Returns (kind, value, count, period) of the counters that apply
+    to the request
+    """
+    limits = settings.RATE_LIMITS.get(scope, {})
+    values = {"ip": get_client_ip(request)}
+    if email_field:
+        values["email"] = request.POST.get(email_field, "").strip().lower()
+    return [
+        (kind, value, *limits[kind])
+        for kind, value in values.items()
+        if kind in limits and value
+    ]
+
+
+def get_wait_time(request, scope, email_field=None):
+    """Returns 0 if the request is within the limits of its IP address
+    and email address, otherwise the number of seconds to wait. The
+    request is not counted.
+    """
+    now = time.time()
+    for kind, value, count, period in get_limited_values(
+            request, scope, email_field):
+        key, window = get_counter_key(scope, kind, value, period, now)
+        if cache.get(key, 0) >= count:
+            logger.warning(
+                "Rate limit %s:%s exceeded by %s",
+                scope, kind, get_client_ip(request))
+            return get_window_wait(window, period, now)
+    return 0
+
+
+def count_submission(request, scope, email_field=None):
+    """Counts the request for its IP address and email address"""
+    for kind, value, count, period in get_limited_values(
+            request, scope, email_field):
+        count_request(scope, kind, value, count, period)
+
+
+def is_failed_submission(request, response):
+    """Returns whether the form was rejected or the honeypot filled in.
+    Accepted submissions are answered with a redirect.
+    """
+    return response.status_code != 302 or bool(request.POST.get(HONEYPOT_FIELD))
+
+
+def rate_limit(scope, email_field=None, guests_only=False, failures_only=False):
+    """View decorator that limits the requests to the endpoint `scope`.
+    With `email_field`, requests are also limited per email address
+    submitted in that field. With `guests_only`, requests of logged in
+    users are not limited. With `failures_only`, only rejected and
+    suspicious submissions are counted.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if guests_only and request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            wait = get_wait_time(request, scope, email_field)
+            if wait:
+                response = HttpResponse(
+                    _("Too many requests. Please try again later."),
+                    status=429,
+                    content_type="text/plain; charset=utf-8",
+                )
+                response["Retry-After"] = str(wait)
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if not failures_only or is_failed_submission(request, response):
+                count_submission(request, scope, email_field)
+            return response
+
+        return wrapper
+
+    return decorator
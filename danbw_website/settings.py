@@ -15,6 +15,7 @@ from pathlib import Path
 
 import dj_database_url
 from django.contrib.messages import constants as messages
+from django.core.exceptions import ImproperlyConfigured
 
 if os.path.isfile("env.py"):
     import env
@@ -64,6 +65,10 @@ INSTALLED_APPS = [
     "course_registrations",
     "pages",
     "memberships",
+    "outbox",
+    "rest_framework",
+    "rest_framework.authtoken",
+    "api",
 ]
 
 SITE_ID = 1
@@ -162,6 +167,53 @@ else:
         "default": dj_database_url.parse(os.environ["DATABASE_URL"])
     }
 
+# Cache for translations, fees, the navigation, anonymous pages,
+# calendars and rate limits. All web processes must share it, otherwise
+# invalidations and rate limits only apply to the process that made them.
+# Production requires Redis (REDIS_URL). The development server runs in
+# one process and uses a local memory cache, which costs no queries
+# either, so the query counts of the tests match production.
+# The default limit of 300 entries is too small for the translation cache
+# and would evict the cached pages.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+elif development:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+else:
+    raise ImproperlyConfigured("REDIS_URL must be set in production.")
+
+# The public API is read-only and needs no authentication. The
+# registration change feed sets its own token authentication.
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+}
+
+# Fixed windows for form submissions per client IP address and per email
+# address: (max requests, window in seconds). Course registrations only
+# count rejected and suspicious submissions, see danbw_website/ratelimit.py.
+RATE_LIMITS = {
+    "register_course": {
+        "ip": (10, 60 * 60),
+        "email": (5, 60 * 60),
+    },
+    "contact": {
+        "ip": (5, 60 * 60),
+        "email": (3, 60 * 60),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
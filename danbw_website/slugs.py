@@ -0,0 +1,64 @@
+"""Unique slugs for models with a `slug` field.
+
+`allocate_slug()` finds a free slug with a single query by loading all
+slugs starting with `<base>` at once and keeping those of the form
+`<base>` and `<base>-<number>`. The prefix match can use the `_like`
+index Django creates for slug fields on PostgreSQL, unlike a regular
+expression.
+`save_with_unique_slug()` saves an object in a savepoint and allocates a
+new slug if a concurrent insert took the one it was given.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+
+# Attempts to save an object before the IntegrityError is raised
+SAVE_ATTEMPTS = 5
+
+
+def allocate_slug(model, base, instance=None):
+    """Returns `base` or, if it is taken by another object of `model`,
+    the first free `base-1`, `base-2`, …
+    """
+    slugs = model._default_manager.filter(slug__startswith=base)
+    if instance is not None and instance.pk is not None:
+        slugs = slugs.exclude(pk=instance.pk)
+    pattern = re.compile(rf"{re.escape(base)}(-[0-9]+)?")
+    taken = {
+        slug for slug in slugs.values_list("slug", flat=True)
+        if pattern.fullmatch(slug)
+    }
+
+    unique_slug = base
+    num = 1
+    while unique_slug in taken:
+        unique_slug = f"{base}-{num}"
+        num += 1
+    return unique_slug
+
+
+def save_with_unique_slug(instance, previous_slug, save, *args, **kwargs):
+    """Calls `save(*args, **kwargs)` in a savepoint. If the slug of
+    `instance` has been taken in the meantime, a new one is generated
+    with `instance._generate_unique_slug()` and the save is retried.
+    Objects that keep their `previous_slug` are saved directly.
+    """
+    if not instance._state.adding and instance.slug == previous_slug:
+        return save(*args, **kwargs)
+
+    # The model that declares the slug, e.g. Course for InternalCourse
+    model = instance._meta.get_field("slug").model
+    for attempt in range(SAVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            slug_taken = (
+                model._default_manager.filter(slug=instance.slug)
+                .exclude(pk=instance.pk)
+                .exists()
+            )
+            if not slug_taken or attempt == SAVE_ATTEMPTS - 1:
+                raise
+            instance.slug = ""
+            instance.slug = instance._generate_unique_slug()
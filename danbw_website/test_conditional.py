@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from courses.models import Course, CourseSession, InternalCourse
+from pages.models import Category, Page
+from users.models import User
+
+from .conditional import get_content_state
+
+
+class ConditionalGetTest(TestCase):
+    """Tests for ETag and Last-Modified handling of content pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today() + timedelta(days=10),
+            end_date=date.today() + timedelta(days=11),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.session = CourseSession.objects.create(
+            title="Session", course=self.course, date=self.course.start_date)
+        self.category = Category.objects.create(title="Verein", slug="verein")
+        self.page = Page.objects.create(
+            title="Geschichte", category=self.category, status=1, content="Inhalt")
+        self.url = reverse("course_list")
+
+    def revalidate(self, url, response):
+        return self.client.get(url, headers={"if-none-match": response["ETag"]})
+
+    def test_content_state(self):
+        print("\ntest_content_state")
+        with self.assertNumQueries(1):
+            latest, counts = get_content_state(
+                [Course, CourseSession, Category, Page])
+
+        self.assertEqual(counts, (1, 1, 1, 1))
+        self.page.refresh_from_db()
+        self.assertEqual(latest, self.page.updated_at)
+
+    def test_not_modified(self):
+        print("\ntest_not_modified")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(self.url, response).status_code, 304)
+
+        response = self.client.get(
+            self.url,
+            headers={"if-modified-since": response["Last-Modified"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified(self):
+        print("\ntest_modified")
+        response = self.client.get(self.url)
+
+        self.session.set_current_language("en")
+        self.session.title = "Session"
+        self.session.save()
+        response = self.revalidate(self.url, response)
+        self.assertEqual(response.status_code, 200)
+
+        # Deleting a page changes the row count
+        Page.objects.create(
+            title="Entwurf", category=self.category, status=0, content="Inhalt")
+        response = self.client.get(self.url)
+        Page.objects.filter(status=0).delete()
+        self.assertEqual(self.revalidate(self.url, response).status_code, 200)
+
+    def test_last_modified_not_before_midnight(self):
+        print("\ntest_last_modified_not_before_midnight")
+        response = self.client.get(
+            self.url,
+            headers={"if-modified-since": http_date(0)},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_views(self):
+        print("\ntest_page_views")
+        for url in (
+            reverse("page_detail", kwargs={"slug": self.page.slug}),
+            reverse("page_list", kwargs={"category_slug": self.category.slug}),
+        ):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+                self.page.save()
+                self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_no_validators_for_authenticated_users(self):
+        print("\ntest_no_validators_for_authenticated_users")
+        user = User.objects.create_user(
+            username="testuser", password="testpassword")
+        self.client.force_login(user)
+
+        response = self.client.get(self.url)
+
+        self.assertFalse(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Last-Modified"))
@@ -0,0 +1,134 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import translation
+
+from course_registrations.models import CourseRegistration
+from courses.models import CourseSession, InternalCourse
+from pages.models import Category, Page
+from users.models import User, UserProfile
+
+from .page_cache import MAX_TIMEOUT, seconds_until_midnight
+
+
+class PageCacheTest(TestCase):
+    """Tests for the anonymous page cache"""
+
+    def setUp(self):
+        # Cached pages of other tests may be stale
+        cache.clear()
+        self.course = InternalCourse.objects.create(
+            title="Cached course",
+            start_date=date.today() + timedelta(days=10),
+            end_date=date.today() + timedelta(days=11),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+            status=1,
+        )
+        self.url = reverse("course_list")
+
+    def test_anonymous_response_is_cached(self):
+        print("\ntest_anonymous_response_is_cached")
+        response = self.client.get(self.url)
+        self.assertContains(response, "Cached course")
+
+        # Only the conditional GET validators are queried
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Cached course")
+        self.assertNotContains(response, "csrfmiddlewaretoken")
+
+    def test_cache_is_per_language(self):
+        print("\ntest_cache_is_per_language")
+        self.course.set_current_language("en")
+        self.course.title = "English course"
+        self.course.save()
+
+        self.client.get(self.url)
+        with translation.override("en"):
+            response = self.client.get(reverse("course_list"))
+
+        self.assertContains(response, "English course")
+        self.assertNotContains(response, "Cached course")
+
+    def test_cache_is_invalidated(self):
+        print("\ntest_cache_is_invalidated")
+        self.client.get(self.url)
+
+        CourseSession.objects.create(
+            title="New session", course=self.course, date=self.course.start_date)
+        self.assertContains(self.client.get(self.url), "New session")
+
+        self.course.title = "Renamed course"
+        self.course.save()
+        self.assertContains(self.client.get(self.url), "Renamed course")
+
+        category = Category.objects.create(title="Verein", slug="verein")
+        Page.objects.create(
+            title="Neue Seite", category=category, status=1, content="Inhalt")
+        self.assertContains(self.client.get(self.url), "Neue Seite")
+
+    def test_cache_expires_at_midnight(self):
+        print("\ntest_cache_expires_at_midnight")
+        with patch("danbw_website.page_cache.cache.set") as cache_set:
+            self.client.get(self.url)
+
+        timeout = cache_set.call_args.kwargs["timeout"]
+        self.assertLessEqual(timeout, MAX_TIMEOUT)
+        self.assertLessEqual(timeout, seconds_until_midnight())
+
+    def test_authenticated_users_are_not_cached(self):
+        print("\ntest_authenticated_users_are_not_cached")
+        user = User.objects.create_user(
+            username="testuser", password="testpassword")
+        UserProfile.objects.create(user=user)
+        CourseRegistration.objects.create(
+            user=user, course=self.course, accept_terms=True)
+        self.client.get(self.url)
+
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+
+        self.assertContains(response, "csrfmiddlewaretoken")
+        self.assertIsNotNone(response.context["current_courses"])
+        self.assertContains(response, reverse("courseregistration_list"))
+
+    def test_pending_messages_bypass_cache(self):
+        print("\ntest_pending_messages_bypass_cache")
+        self.client.get(self.url)
+
+        session = self.client.session
+        session["show_linked_modal"] = True
+        session.save()
+        response = self.client.get(self.url)
+        self.assertTrue(response.context["show_linked_modal"])
+
+        # The logout message is shown on the next page
+        user = User.objects.create_user(
+            username="testuser", password="testpassword")
+        self.client.get(reverse("home"))
+        self.client.force_login(user)
+        self.client.post(reverse("account_logout"))
+        response = self.client.get(reverse("home"))
+        self.assertIsNotNone(response.context)
+        self.assertEqual(len(response.context["messages"]), 1)
+
+    def test_page_detail_is_cached(self):
+        print("\ntest_page_detail_is_cached")
+        category = Category.objects.create(title="Verein", slug="verein")
+        page = Page.objects.create(
+            title="Geschichte", category=category, status=1, content="Inhalt")
+        url = reverse("page_detail", kwargs={"slug": page.slug})
+        self.client.get(url)
+
+        # Only the conditional GET validators are queried
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, "Geschichte")
+
+        response = self.client.get(
+            reverse("page_detail", kwargs={"slug": "missing"}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,84 @@
+import os
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from .benchmark import run_benchmarks, seed_benchmark_data
+
+# Query ceilings and wall-clock budgets in seconds per scenario, measured
+# on the second (warm cache) request. The query ceilings do not depend on
+# the data volume, except where noted.
+BUDGETS = {
+    # Served from the page cache
+    "CourseList": (1, 1),
+    "CourseList (user)": (10, 2),
+    # Served from the page cache
+    "HomePage": (1, 1),
+    "HomePage (user)": (6, 1),
+    "RegisterCourse GET": (8, 1),
+    "RegisterCourse POST": (16, 1),
+    "CourseRegistrationList": (7, 1),
+    "Admin registrations": (10, 3),
+    "Admin internal courses": (8, 3),
+    "Admin course registrations": (9, 1),
+    # Grow with the number of chunks and courses
+    "Admin registration CSV": (30, 10),
+    "Admin course zip": (40, 10),
+}
+
+# Response times depend on the machine and its load, so the time budgets
+# are only checked when PERFORMANCE_TIME_FACTOR is set. Its value scales
+# the budgets, e.g. 1 on an idle machine or 3 on a busy CI runner. The
+# `benchmark` command prints the timings.
+PERFORMANCE_TIME_FACTOR = os.environ.get("PERFORMANCE_TIME_FACTOR")
+
+
+class PerformanceBudgetTest(TestCase):
+    """Checks query counts and response times of the main views on a
+    realistic data volume
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Cached fees and translations of other tests may be stale
+        cache.clear()
+        cls.data = seed_benchmark_data(
+            courses=200,
+            sessions_per_course=10,
+            registrations=2000,
+            users=300,
+        )
+        cls.results = {
+            name: (status_code, queries, seconds)
+            for name, status_code, queries, seconds in run_benchmarks(cls.data, repeat=2)
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cache.clear()
+
+    def test_all_scenarios_have_budgets(self):
+        print("\ntest_all_scenarios_have_budgets")
+        self.assertEqual(set(self.results), set(BUDGETS))
+
+    def test_status_codes(self):
+        print("\ntest_status_codes")
+        for name, (status_code, _, _) in self.results.items():
+            with self.subTest(name):
+                self.assertIn(status_code, (200, 302))
+
+    def test_query_budgets(self):
+        print("\ntest_query_budgets")
+        for name, (_, queries, _) in self.results.items():
+            with self.subTest(name):
+                self.assertLessEqual(queries, BUDGETS[name][0])
+
+    @skipUnless(PERFORMANCE_TIME_FACTOR, "PERFORMANCE_TIME_FACTOR is not set")
+    def test_time_budgets(self):
+        print("\ntest_time_budgets")
+        factor = float(PERFORMANCE_TIME_FACTOR)
+        for name, (_, _, seconds) in self.results.items():
+            with self.subTest(name):
+                self.assertLessEqual(seconds, BUDGETS[name][1] * factor)
@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from courses.models import CourseSession, InternalCourse
+from users.models import User, UserProfile
+
+from .ratelimit import count_request
+
+RATE_LIMITS = {
+    "register_course": {"ip": (3, 60), "email": (2, 60)},
+    "contact": {"ip": (2, 60)},
+}
+
+
+@override_settings(RATE_LIMITS=RATE_LIMITS)
+class RateLimitTest(TestCase):
+    """Tests for the rate limiting of form submissions"""
+    fixtures = ["fees.json"]
+
+    def setUp(self):
+        # Counters of other tests may be exhausted
+        cache.clear()
+        self.course = InternalCourse.objects.create(
+            title="Test course",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            registration_status=1,
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.register_url = reverse("register_course", kwargs={"slug": self.course.slug})
+
+    def post_contact(self, ip="10.0.0.1"):
+        return self.client.post(reverse("contact"), HTTP_X_REAL_IP=ip)
+
+    def post_registration(self, email="guest@example.com", ip="10.0.0.1"):
+        return self.client.post(
+            self.register_url, {"email": email}, HTTP_X_REAL_IP=ip)
+
+    @patch("danbw_website.ratelimit.time.time", return_value=1000)
+    def test_requests_beyond_limit_are_rejected(self, mock_time):
+        print("\ntest_requests_beyond_limit_are_rejected")
+        self.assertEqual(self.post_contact().status_code, 200)
+        self.assertEqual(self.post_contact().status_code, 200)
+
+        # Rejected requests don't touch the database
+        with self.assertNumQueries(0):
+            response = self.post_contact()
+
+        self.assertEqual(response.status_code, 429)
+        # The window of 60 seconds ends at 1020
+        self.assertEqual(response["Retry-After"], "20")
+
+    def test_clients_are_told_apart_by_trusted_header(self):
+        print("\ntest_clients_are_told_apart_by_trusted_header")
+        self.post_contact()
+        self.post_contact()
+
+        self.assertEqual(self.post_contact(ip="10.0.0.2").status_code, 200)
+        self.assertEqual(self.post_contact().status_code, 429)
+
+    def test_limit_is_reset_after_window(self):
+        print("\ntest_limit_is_reset_after_window")
+        with patch("danbw_website.ratelimit.time.time", return_value=1000):
+            self.post_contact()
+            self.post_contact()
+            self.assertEqual(self.post_contact().status_code, 429)
+
+        with patch("danbw_website.ratelimit.time.time", return_value=1030):
+            self.assertEqual(self.post_contact().status_code, 200)
+            self.assertEqual(self.post_contact().status_code, 200)
+            self.assertEqual(self.post_contact().status_code, 429)
+
+    @patch("danbw_website.ratelimit.time.time", return_value=1000)
+    def test_concurrent_requests_are_counted(self, mock_time):
+        print("\ntest_concurrent_requests_are_counted")
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            waits = list(executor.map(
+                lambda _: count_request("contact", "ip", "10.0.0.1", 10, 60),
+                range(40),
+            ))
+
+        self.assertEqual(waits.count(0), 10)
+
+    def test_registrations_are_limited_per_email(self):
+        print("\ntest_registrations_are_limited_per_email")
+        self.assertNotEqual(self.post_registration(ip="10.0.0.1").status_code, 429)
+        self.assertNotEqual(self.post_registration(ip="10.0.0.2").status_code, 429)
+
+        response = self.post_registration(email="Guest@example.com ", ip="10.0.0.3")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertNotEqual(
+            self.post_registration(email="other@example.com").status_code, 429)
+
+    def post_valid_registration(self, first_name, **data):
+        session = self.client.session
+        session["captcha_target"] = "1"
+        session.save()
+        return self.client.post(
+            self.register_url,
+            {
+                "first_name": first_name,
+                "last_name": "Guest",
+                "email": "guest@example.com",
+                "grade": 3,
+                "dojo": "AAR",
+                "selected_sessions": [self.session.pk],
+                "accept_terms": True,
+                "exam": False,
+                "payment_method": 0,
+                "captcha_response": "1",
+                **data,
+            },
+            HTTP_X_REAL_IP="10.0.0.1",
+        )
+
+    def test_accepted_registrations_are_not_counted(self):
+        print("\ntest_accepted_registrations_are_not_counted")
+        self.session = CourseSession.objects.create(
+            title="Training", course=self.course, date=date.today())
+
+        # A family registers from one address with one email address
+        for first_name in ("Anna", "Ben", "Carla", "David"):
+            self.assertRedirects(
+                self.post_valid_registration(first_name),
+                reverse("course_list"), fetch_redirect_response=False)
+
+        # Filling in the honeypot counts although it is redirected
+        self.post_valid_registration("Bot", website="spam")
+        self.post_valid_registration("Bot", website="spam")
+        self.assertEqual(self.post_valid_registration("Eva").status_code, 429)
+
+    def test_registrations_of_users_are_not_limited(self):
+        print("\ntest_registrations_of_users_are_not_limited")
+        user = User.objects.create_user(
+            username="test-user", password="testpassword", email="test@example.com")
+        UserProfile.objects.create(user=user)
+        self.client.force_login(user)
+
+        for _ in range(4):
+            self.assertNotEqual(self.post_registration().status_code, 429)
@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from courses.models import Course, ExternalCourse, InternalCourse
+from pages.models import Category, Page
+
+from .slugs import allocate_slug
+
+
+class SlugAllocationTest(TestCase):
+    """Tests for the shared unique slug allocator"""
+
+    def create_course(self, title):
+        return InternalCourse.objects.create(
+            title=title,
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+
+    def test_single_query(self):
+        print("\ntest_single_query")
+        for _ in range(5):
+            self.create_course("Sommerlehrgang")
+
+        with self.assertNumQueries(1) as queries:
+            slug = allocate_slug(Course, "sommerlehrgang")
+        self.assertEqual(slug, "sommerlehrgang-5")
+        # A prefix match, which the slug index supports
+        self.assertIn("LIKE", queries.captured_queries[0]["sql"])
+        self.assertNotIn("REGEXP", queries.captured_queries[0]["sql"])
+
+    def test_similar_slugs_are_ignored(self):
+        print("\ntest_similar_slugs_are_ignored")
+        self.create_course("Sommerlehrgang Kinder")
+        self.create_course("Sommerlehrgang")
+        Course.objects.filter(slug="sommerlehrgang").update(
+            slug="sommerlehrgang-2")
+
+        self.assertEqual(allocate_slug(Course, "sommerlehrgang"), "sommerlehrgang")
+        self.assertEqual(
+            self.create_course("Sommerlehrgang").slug, "sommerlehrgang")
+        self.assertEqual(
+            self.create_course("Sommerlehrgang").slug, "sommerlehrgang-1")
+
+    def test_unchanged_title_keeps_slug(self):
+        print("\ntest_unchanged_title_keeps_slug")
+        course = self.create_course("Sommerlehrgang")
+
+        with patch("courses.models.allocate_slug") as allocate:
+            course.save()
+        allocate.assert_not_called()
+        self.assertEqual(course.slug, "sommerlehrgang")
+
+    def test_slugs_are_shared_across_course_types(self):
+        print("\ntest_slugs_are_shared_across_course_types")
+        self.create_course("Sommerlehrgang")
+        course = ExternalCourse.objects.create(
+            title="Sommerlehrgang",
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=1),
+        )
+
+        self.assertEqual(course.slug, "sommerlehrgang-1")
+
+    def test_retry_on_concurrent_insert(self):
+        print("\ntest_retry_on_concurrent_insert")
+        self.create_course("Sommerlehrgang")
+
+        # A concurrent request allocated the same slug
+        with patch(
+            "courses.models.allocate_slug",
+            side_effect=["sommerlehrgang", "sommerlehrgang-1"],
+        ):
+            course = self.create_course("Sommerlehrgang")
+
+        self.assertEqual(course.slug, "sommerlehrgang-1")
+        self.assertEqual(Course.objects.filter(slug__startswith="sommer").count(), 2)
+
+    def test_retry_for_pages(self):
+        print("\ntest_retry_for_pages")
+        category = Category.objects.create(title="Verein")
+        Page.objects.create(title="Geschichte", category=category, content="Inhalt")
+
+        with patch(
+            "pages.models.allocate_slug",
+            side_effect=["geschichte", "geschichte-1"],
+        ):
+            page = Page.objects.create(
+                title="Geschichte", category=category, content="Inhalt")
+
+        self.assertEqual(page.slug, "geschichte-1")
@@ -23,6 +23,7 @@ urlpatterns = [
     path("accounts/", include("allauth.urls")),
     path('captcha/', include('captcha.urls')),
     path('i18n/', include('django.conf.urls.i18n')),
+    path("api/v1/", include("api.urls")),
 ]
 
 urlpatterns += i18n_patterns(
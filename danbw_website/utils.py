@@ -1,16 +1,25 @@
+import csv
 import os
+import zipfile
+from itertools import chain, groupby
+from operator import attrgetter
 from smtplib import SMTPException
 
 from django.conf import settings
 from django.contrib import messages
 from django.core.mail import EmailMessage, send_mail
+from django.http import StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.utils import translation
 from django.utils.formats import date_format, time_format
+from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
 from danbw_website import constants
+from outbox.mail import queue_email_message, queue_mail
 
+# Number of registrations fetched per query when streaming exports
+EXPORT_CHUNK_SIZE = 500
 
 def send_email_confirmation(user, request):
     subject = _("[Dynamic Aikido Nocquet BW] Email confirmation successful")
@@ -36,52 +45,46 @@ def send_registration_confirmation(request, registration):
 
     # Use override to temporarily switch language and automatically restore previous language
     with translation.override(request.LANGUAGE_CODE):
-        try:
-            # Build sessions list in user's language
-            sessions = [
-                f"{date_format(session.date)}, "
-                f"{time_format(session.start_time)} to "
-                f"{time_format(session.end_time)}: "
-                f"{session.title}"
-                for session in registration.selected_sessions.all()
-            ]
-
-            # Build subject in user's language (course title will be translated)
-            subject = _("[Dynamic Aikido Nocquet BW] Your Registration for ") + \
-                registration.course.title
-
-            context = {
-                'request': request,
-                'registration': registration,
-                'sessions': sessions,
-                'subject': subject,
-                'bank_account': os.environ.get('BANK_ACCOUNT'),
-            }
-
-            # Use different template for family reunion courses
-            template_name = 'email/registration_confirmation_family_reunion.html' \
-                if registration.course.course_type == 'family_reunion' \
-                else 'email/registration_confirmation.html'
-
-            # Render template in user's language (all translatable fields will be in user's language)
-            message = render_to_string(template_name, context)
-
-            sender = os.environ.get("COURSE_TEAM_EMAIL")
-            recipient = registration.user.email if request.user.is_authenticated else registration.email
-
-            email = EmailMessage(
-                subject=subject,
-                body=message,
-                from_email=sender,
-                to=[recipient],
-            )
-            email.content_subtype = 'html'
-            email.send()
+        # Build sessions list in user's language
+        sessions = [
+            f"{date_format(session.date)}, "
+            f"{time_format(session.start_time)} to "
+            f"{time_format(session.end_time)}: "
+            f"{session.title}"
+            for session in registration.selected_sessions.all()
+        ]
 
-        except SMTPException as e:
-            raise SMTPException(
-                _("Invalid email address. Please try again with a valid email address.")
-            ) from e
+        # Build subject in user's language (course title will be translated)
+        subject = _("[Dynamic Aikido Nocquet BW] Your Registration for ") + \
+            registration.course.title
+
+        context = {
+            'request': request,
+            'registration': registration,
+            'sessions': sessions,
+            'subject': subject,
+            'bank_account': os.environ.get('BANK_ACCOUNT'),
+        }
+
+        # Use different template for family reunion courses
+        template_name = 'email/registration_confirmation_family_reunion.html' \
+            if registration.course.course_type == 'family_reunion' \
+            else 'email/registration_confirmation.html'
+
+        # Render template in user's language (all translatable fields will be in user's language)
+        message = render_to_string(template_name, context)
+
+        sender = os.environ.get("COURSE_TEAM_EMAIL")
+        recipient = registration.user.email if request.user.is_authenticated else registration.email
+
+        email = EmailMessage(
+            subject=subject,
+            body=message,
+            from_email=sender,
+            to=[recipient],
+        )
+        email.content_subtype = 'html'
+        queue_email_message(email)
 
 
 def send_cancellation_notification(request, registration):
@@ -89,32 +92,47 @@ def send_cancellation_notification(request, registration):
 
     # Always send staff emails in German
     with translation.override('de'):
-        try:
-            user = registration.user if request.user.is_authenticated else registration
-            course = registration.course.title
-            first_name = user.first_name
-            last_name = user.last_name
-            email = user.email
-            subject = _("[Dynamic Aikido Nocquet BW] A registration for {course} has been cancelled").format(course=course)
-            message_parts = [
-                _("Hi,\n\n"),
-                _("A registration for {course} has been cancelled.\n\n").format(course=course),
-                _("Name: {first_name} {last_name}\n").format(
-                    first_name=first_name, last_name=last_name),
-                _("Email: {email}\n").format(email=email),
-                _("Course: {course}\n\n").format(course=course),
-                _("Please check the admin panel at {site_url}/admin for more details.\n\n").format(
-                    site_url=os.environ.get("SITE_URL")),
-            ]
-            sender = settings.EMAIL_HOST_USER
-            recipient = os.environ.get("COURSE_TEAM_EMAIL")
-            message = "".join(message_parts)
-
-            send_mail(subject, message, sender, [recipient])
-
-        except SMTPException as e:
-            raise SMTPException(
-                _("Failed to send cancellation notification email. Please contact the course team.")) from e
+        user = registration.user if request.user.is_authenticated else registration
+        course = registration.course.title
+        first_name = user.first_name
+        last_name = user.last_name
+        email = user.email
+        subject = _("[Dynamic Aikido Nocquet BW] A registration for {course} has been cancelled").format(course=course)
+        message_parts = [
+            _("Hi,\n\n"),
+            _("A registration for {course} has been cancelled.\n\n").format(course=course),
+            _("Name: {first_name} {last_name}\n").format(
+                first_name=first_name, last_name=last_name),
+            _("Email: {email}\n").format(email=email),
+            _("Course: {course}\n\n").format(course=course),
+            _("Please check the admin panel at {site_url}/admin for more details.\n\n").format(
+                site_url=os.environ.get("SITE_URL")),
+        ]
+        sender = settings.EMAIL_HOST_USER
+        recipient = os.environ.get("COURSE_TEAM_EMAIL")
+        message = "".join(message_parts)
+
+        queue_mail(subject, message, sender, [recipient])
+
+
+def send_waitlist_promotion(registration):
+    """Notifies a participant that their registration has been moved off
+    the waitlist
+    """
+    course = registration.course.title
+    user = registration.user or registration
+    subject = _("[Dynamic Aikido Nocquet BW] A place for {course} has become available").format(course=course)
+    message_parts = [
+        _("Hi {first_name},\n\n").format(first_name=user.first_name),
+        _("A place for {course} has become available and your registration has been moved off the waitlist.\n\n").format(
+            course=course),
+        _("You can find the details of your registration in your account at {site_url}.\n\n").format(
+            site_url=os.environ.get("SITE_URL")),
+    ]
+    sender = os.environ.get("COURSE_TEAM_EMAIL")
+    message = "".join(message_parts)
+
+    queue_mail(subject, message, sender, [user.email])
 
 
 def send_registration_notification(request, registration):
@@ -122,42 +140,41 @@ def send_registration_notification(request, registration):
 
     # Always send staff emails in German
     with translation.override('de'):
-        try:
-            subject = _("[Dynamic Aikido Nocquet BW] New registration for ") + \
-                registration.course.title
-            first_name = registration.user.first_name if request.user.is_authenticated else registration.first_name
-            last_name = registration.user.last_name if request.user.is_authenticated else registration.last_name
-            email = registration.user.email if request.user.is_authenticated else registration.email
-            message_parts = [
-                _("Hi,\n\n"),
-                _("A new registration for {course} has been received.\n\n").format(
-                    course=registration.course.title),
-                _("Name: {first_name} {last_name}\n").format(
-                    first_name=first_name, last_name=last_name),
-                _("Email: {email}\n").format(email=email),
-                _("Course: {course}\n").format(course=registration.course.title),
-            ]
-
-            if registration.accommodation_option:
-                message_parts.append(
-                    _("Accommodation: {accommodation}\n").format(
-                        accommodation=registration.accommodation_option.name)
-                )
+        subject = _("[Dynamic Aikido Nocquet BW] New registration for ") + \
+            registration.course.title
+        first_name = registration.user.first_name if request.user.is_authenticated else registration.first_name
+        last_name = registration.user.last_name if request.user.is_authenticated else registration.last_name
+        email = registration.user.email if request.user.is_authenticated else registration.email
+        message_parts = [
+            _("Hi,\n\n"),
+            _("A new registration for {course} has been received.\n\n").format(
+                course=registration.course.title),
+            _("Name: {first_name} {last_name}\n").format(
+                first_name=first_name, last_name=last_name),
+            _("Email: {email}\n").format(email=email),
+            _("Course: {course}\n").format(course=registration.course.title),
+        ]
 
+        if registration.accommodation_option:
             message_parts.append(
-                _("\nPlease check the admin panel at {site_url}/admin for more details.\n\n").format(
-                    site_url=os.environ.get("SITE_URL"))
+                _("Accommodation: {accommodation}\n").format(
+                    accommodation=registration.accommodation_option.name)
             )
 
-            sender = settings.EMAIL_HOST_USER
-            recipient = os.environ.get("COURSE_TEAM_EMAIL")
-            message = "".join(message_parts)
+        if registration.waitlisted:
+            message_parts.append(
+                _("The course is fully booked. The registration has been put on the waitlist.\n"))
 
-            send_mail(subject, message, sender, [recipient])
+        message_parts.append(
+            _("\nPlease check the admin panel at {site_url}/admin for more details.\n\n").format(
+                site_url=os.environ.get("SITE_URL"))
+        )
 
-        except SMTPException as e:
-            raise SMTPException(
-                _("Failed to send registration notification email. Please contact the course team.")) from e
+        sender = settings.EMAIL_HOST_USER
+        recipient = os.environ.get("COURSE_TEAM_EMAIL")
+        message = "".join(message_parts)
+
+        queue_mail(subject, message, sender, [recipient])
 
 
 def send_membership_confirmation(first_name, email, membership_type):
@@ -200,11 +217,7 @@ def send_membership_confirmation(first_name, email, membership_type):
     recipient = email
     message = "".join(message_parts)
 
-    try:
-        send_mail(subject, message, sender, [recipient])
-    except SMTPException as e:
-        raise SMTPException(
-            _("Invalid email address. Please try again with a valid email address.")) from e
+    queue_mail(subject, message, sender, [recipient])
 
 
 def send_membership_notification(first_name, last_name, email, dojo, membership_type):
@@ -226,15 +239,14 @@ def send_membership_notification(first_name, last_name, email, dojo, membership_
     sender = settings.EMAIL_HOST_USER
     recipient = os.environ.get("TREASURER_EMAIL")
     message = "".join(message_parts)
-    try:
-        send_mail(subject, message, sender, [recipient])
-    except SMTPException as e:
-        raise SMTPException(
-            _("Failed to send membership notification email. Please contact the course team.")) from e
+    queue_mail(subject, message, sender, [recipient])
 
 
-def write_registrations_csv(writer, registrations):
-    """Write registration data to CSV"""
+def registration_csv_rows(registrations):
+    """Yields the header and one row per registration for the CSV export"""
+
+    registrations = iter(registrations)
+    first_registration = next(registrations, None)
 
     header_row = [
         _("Course"),
@@ -254,14 +266,17 @@ def write_registrations_csv(writer, registrations):
         _("Accept Terms"),
         _("Registration Date"),
     ]
-    if registrations and registrations[0].course.has_dinner:
+    if first_registration and first_registration.course.has_dinner:
         header_row.append(_("Dinner"))
         header_row.append(_("Overnight Stay"))
-    if registrations and registrations[0].course.course_type == "family_reunion":
+    if first_registration and first_registration.course.course_type == "family_reunion":
         header_row.append(_("Accommodation"))
-    writer.writerow(header_row)
+    yield header_row
+
+    if first_registration is None:
+        return
 
-    for registration in registrations:
+    for registration in chain([first_registration], registrations):
         selected_sessions = ", ".join(
             f"{session.date.strftime('%d.%m.%Y')}, {session.start_time.strftime('%H:%M')}"
             f"-{session.end_time.strftime('%H:%M')}: {session.title}"
@@ -298,7 +313,127 @@ def write_registrations_csv(writer, registrations):
         if registration.course.course_type == "family_reunion":
             data_row.append(
                 registration.accommodation_option.name if registration.accommodation_option else "")
-        writer.writerow(data_row)
+        yield data_row
+
+
+def write_registrations_csv(writer, registrations):
+    """Write registration data to CSV"""
+    writer.writerows(registration_csv_rows(registrations))
+
+
+def registrations_for_export(registrations):
+    """Adds everything the CSV export reads to a registration queryset"""
+    return registrations.select_related(
+        "course", "user__profile", "accommodation_option"
+    ).prefetch_related("course__translations", "selected_sessions__translations")
+
+
+class Echo:
+    """Pseudo buffer that returns the written value instead of storing it.
+    https://docs.djangoproject.com/en/5.2/howto/outputting-csv/#streaming-large-csv-files
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_registrations_csv(registrations, language, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields the CSV export of a registration queryset line by line in
+    the given language. Registrations are fetched in chunks, so memory
+    use does not grow with the number of registrations.
+    """
+    writer = csv.writer(Echo())
+    registrations = registrations_for_export(registrations).iterator(
+        chunk_size=chunk_size)
+
+    with translation.override(language):
+        for row in registration_csv_rows(registrations):
+            yield writer.writerow(row)
+
+
+def stream_registrations_csv(registrations, filename):
+    """Returns a streaming CSV download of a registration queryset"""
+    # The response is consumed after the view has returned, so the
+    # language of the request is passed on
+    response = StreamingHttpResponse(
+        iter_registrations_csv(registrations, translation.get_language()),
+        content_type="text/csv",
+    )
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+class ZipStreamBuffer:
+    """Write-only, unseekable file object for ZipFile. The archive data
+    written so far is taken out with drain().
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_registrations_zip(courses, registrations, language,
+                           chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields a zip archive with one registration CSV per course in the
+    given language.
+
+    The registrations of all courses are read with one chunked queryset
+    ordered by course, and the archive is yielded piece by piece while
+    the CSV members are written, so nothing is buffered on disk.
+    """
+    buffer = ZipStreamBuffer()
+    writer = csv.writer(Echo())
+    registrations = registrations_for_export(
+        registrations.filter(course__in=courses).order_by("course_id", "pk")
+    ).iterator(chunk_size=chunk_size)
+    groups = groupby(registrations, key=attrgetter("course_id"))
+
+    with translation.override(language):
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            course_id, course_registrations = next(groups, (None, []))
+            for course in sorted(courses, key=attrgetter("pk")):
+                filename = f"{slugify(course.title)}_{_('registrations')}.csv"
+                has_registrations = course.pk == course_id
+
+                with zip_file.open(filename, "w") as member:
+                    for row in registration_csv_rows(
+                        course_registrations if has_registrations else []
+                    ):
+                        member.write(writer.writerow(row).encode("utf-8"))
+                        data = buffer.drain()
+                        if data:
+                            yield data
+
+                # Advance only after the group has been consumed
+                if has_registrations:
+                    course_id, course_registrations = next(groups, (None, []))
+        yield buffer.drain()
+
+
+def stream_registrations_zip(courses, registrations, filename):
+    """Returns a streaming zip download with one registration CSV per
+    course.
+    """
+    # The response is consumed after the view has returned, so the
+    # language of the request is passed on
+    response = StreamingHttpResponse(
+        iter_registrations_zip(courses, registrations, translation.get_language()),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
 
 
 def write_membership_csv(writer, memberships):
@@ -0,0 +1,84 @@
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Fee
+
+VERSION_KEY = "fees:matrix:version"
+MATRIX_KEY = "fees:matrix:{version}"
+
+# Upper limit for the time the fee matrix is used without reloading it,
+# in seconds, in case an invalidation does not reach a process
+MATRIX_TIMEOUT = 10 * 60
+
+# Process-local copy of the fee matrix, the version it was built from and
+# the time it was loaded
+_local = {"version": None, "matrix": None, "loaded_at": None}
+
+
+def get_fee_matrix_version():
+    """Returns the current fee matrix version shared by all processes."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_fee_matrix():
+    """Returns all fees as a dict keyed by
+    (course_type, fee_category, fee_type).
+
+    The matrix is kept in the process and in Django's cache and is
+    loaded from the database after the fees have changed or at the latest
+    after MATRIX_TIMEOUT.
+    """
+    version = get_fee_matrix_version()
+    if (
+        _local["version"] == version
+        and _local["matrix"] is not None
+        and time.monotonic() - _local["loaded_at"] < MATRIX_TIMEOUT
+    ):
+        return _local["matrix"]
+
+    key = MATRIX_KEY.format(version=version)
+    fees = cache.get(key)
+    if fees is None:
+        fees = list(Fee.objects.order_by("pk"))
+        cache.set(key, fees, timeout=MATRIX_TIMEOUT)
+
+    matrix = {
+        (fee.course_type, fee.fee_category, fee.fee_type): fee
+        for fee in fees
+    }
+    _local["version"] = version
+    _local["matrix"] = matrix
+    _local["loaded_at"] = time.monotonic()
+    return matrix
+
+
+def invalidate_fee_matrix():
+    """Discards the cached fee matrix in all processes that share the
+    cache.
+    """
+    cache.set(VERSION_KEY, uuid4().hex, timeout=None)
+    _local["version"] = None
+    _local["matrix"] = None
+
+
+def lookup_fee(course_type, fee_category, fee_type):
+    """Returns the Fee for the given combination or None."""
+    return get_fee_matrix().get((course_type, fee_category, fee_type))
+
+
+def get_course_fees(course_type, fee_category=None, any_category=False):
+    """Returns the fees for a course type and fee category.
+    With `any_category`, fees of all fee categories are returned.
+    """
+    return [
+        fee for (fee_course_type, fee_fee_category, _), fee
+        in get_fee_matrix().items()
+        if fee_course_type == course_type
+        and (any_category or fee_fee_category == fee_category)
+    ]
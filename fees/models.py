@@ -72,16 +72,13 @@ class Fee(models.Model):
         """
         Calculate the total fee based on the provided parameters.
         """
-        try:
-            fee = cls.objects.get(
-                course_type=course_type,
-                fee_category=fee_category,
-                fee_type=fee_type,
-            )
-            return (
-                fee.amount
-                + (fee.extra_fee_cash if payment_method == 1 else 0)
-                + (fee.extra_fee_external if not dan_member else 0)
-            )
-        except cls.DoesNotExist:
+        from .cache import lookup_fee
+
+        fee = lookup_fee(course_type, fee_category, fee_type)
+        if fee is None:
             return default
+        return (
+            fee.amount
+            + (fee.extra_fee_cash if payment_method == 1 else 0)
+            + (fee.extra_fee_external if not dan_member else 0)
+        )
@@ -0,0 +1,209 @@
+"""Fee calculation for course registrations.
+
+The functions in this module work on plain values only: sessions are
+described by `SessionInfo` tuples and fees are looked up in a fee matrix
+dict keyed by (course_type, fee_category, fee_type), as returned by
+`fees.cache.get_fee_matrix()`. No database queries are made, so a whole
+course can be priced in one go once its sessions and the fee matrix are
+loaded.
+"""
+from collections import defaultdict, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from danbw_website import constants
+
+CENT = Decimal("0.01")
+
+SessionInfo = namedtuple(
+    "SessionInfo", ["date", "is_dan_preparation", "price_override"])
+
+CourseInfo = namedtuple(
+    "CourseInfo",
+    [
+        "course_type",
+        "fee_category",
+        "has_dan_preparation",
+        "discount_percentage",
+        "sessions",
+    ],
+)
+
+PriceItem = namedtuple("PriceItem", ["fee_type", "date", "amount"])
+
+PriceResult = namedtuple("PriceResult", ["fee_type", "items", "total"])
+
+
+def session_info(session):
+    """Returns the SessionInfo of a CourseSession."""
+    return SessionInfo(
+        session.date, session.is_dan_preparation, session.price_override)
+
+
+def course_info(course, sessions=None):
+    """Returns the CourseInfo of an InternalCourse. `sessions` defaults to
+    all sessions of the course.
+    """
+    if sessions is None:
+        sessions = course.sessions.all()
+    return CourseInfo(
+        course.course_type,
+        course.fee_category,
+        course.has_dan_preparation,
+        course.discount_percentage,
+        tuple(session_info(session) for session in sessions),
+    )
+
+
+def get_fee_type(course, selected_sessions):
+    """Determines the fee type from the course type and the selected
+    sessions.
+    """
+    entire_course_selected = len(selected_sessions) == len(course.sessions)
+    entire_course_without_dan_prep_selected = course.has_dan_preparation and not any(
+        session.is_dan_preparation for session in selected_sessions)
+    single_day = len({session.date for session in selected_sessions}) == 1
+
+    fee_type = ""
+
+    if course.course_type == "sensei_emmerson":
+        if course.fee_category == "dan_seminar":
+            fee_type = "single_day" if single_day else "entire_course_dan_preparation" if course.has_dan_preparation else "entire_course"
+        elif entire_course_selected:
+            fee_type = "entire_course_dan_preparation" if course.has_dan_preparation else "entire_course"
+        elif entire_course_without_dan_prep_selected:
+            fee_type = "entire_course"
+        else:
+            fee_type = "single_session"
+
+    elif course.course_type == "hombu_dojo":
+        if entire_course_selected:
+            fee_type = "entire_course"
+        else:
+            fee_type = "single_day" if single_day else "entire_course"
+
+    elif course.course_type == "external_teacher":
+        if course.fee_category == "dan_seminar":
+            fee_type = "single_session"
+        elif entire_course_selected:
+            fee_type = "entire_course_dan_preparation" if course.has_dan_preparation else "entire_course"
+        elif entire_course_without_dan_prep_selected:
+            fee_type = "entire_course"
+        else:
+            fee_type = "single_session"
+
+    elif course.course_type == "dan_bw_teacher":
+        fee_type = "single_session"
+
+    elif course.course_type == "children":
+        fee_type = "entire_course"
+
+    elif course.course_type == "family_reunion":
+        # For family reunion: entire course = at least one session selected on each unique day
+        all_course_days = {session.date for session in course.sessions}
+        selected_days = {session.date for session in selected_sessions}
+        has_dan_sessions = any(
+            session.is_dan_preparation for session in selected_sessions)
+        if all_course_days == selected_days:
+            fee_type = "entire_course_with_dan_seminar" if has_dan_sessions else "entire_course"
+        else:
+            fee_type = "single_day_with_dan_seminar" if has_dan_sessions else "single_day"
+
+    elif course.course_type == "other":
+        fee_type = "entire_course" if entire_course_selected else "single_session"
+
+    return fee_type
+
+
+def _fee_amount(fee, payment_method, dan_member):
+    """Returns the fee amount including cash and non-member surcharges."""
+    return (
+        fee.amount
+        + (fee.extra_fee_cash if payment_method == constants.CASH else 0)
+        + (fee.extra_fee_external if not dan_member else 0)
+    )
+
+
+def _lookup(fee_matrix, course, fee_type, payment_method, dan_member):
+    fee = fee_matrix.get((course.course_type, course.fee_category, fee_type))
+    if fee is None:
+        raise ValueError(
+            f"No fee found for {course.course_type}, {course.fee_category}, {fee_type}, payment method: {payment_method}, dan member: {dan_member}")
+    return _fee_amount(fee, payment_method, dan_member)
+
+
+def price_registration(
+    course,
+    selected_sessions,
+    fee_matrix,
+    payment_method=constants.BANK,
+    dan_member=False,
+    discount=False,
+    accommodation_fee=None,
+):
+    """Calculates the final fee of a registration for the selected sessions
+    of a course. Returns a PriceResult with the fee type, the individual
+    items and the total as a Decimal rounded to cents.
+
+    Raises ValueError if a required fee is missing from the fee matrix.
+    """
+    fee_type = get_fee_type(course, selected_sessions)
+    items = []
+
+    if "single_session" in fee_type:
+        # Charge per session (e.g., for sensei_emmerson, external_teacher, dan_bw_teacher)
+        for session in selected_sessions:
+            session_fee_type = "single_session_dan_preparation" if session.is_dan_preparation else "single_session"
+            if session.price_override is not None:
+                # Surcharges apply only if a fee exists for the session
+                amount = Decimal(session.price_override)
+                fee = fee_matrix.get(
+                    (course.course_type, course.fee_category, session_fee_type))
+                if fee is not None:
+                    if payment_method == constants.CASH:
+                        amount += fee.extra_fee_cash
+                    if not dan_member:
+                        amount += fee.extra_fee_external
+            else:
+                amount = _lookup(
+                    fee_matrix, course, session_fee_type, payment_method, dan_member)
+            items.append(PriceItem(session_fee_type, session.date, amount))
+
+    elif course.course_type == "family_reunion" and "single_day" in fee_type:
+        # Charge per unique day for family_reunion
+        sessions_by_date = defaultdict(list)
+        for session in selected_sessions:
+            sessions_by_date[session.date].append(session)
+
+        for day, day_sessions in sessions_by_date.items():
+            has_dan_session = any(s.is_dan_preparation for s in day_sessions)
+            day_fee_type = "single_day_with_dan_seminar" if has_dan_session else "single_day"
+            amount = _lookup(
+                fee_matrix, course, day_fee_type, payment_method, dan_member)
+            items.append(PriceItem(day_fee_type, day, amount))
+
+    else:
+        # Charge once for entire course or other fixed fee types
+        amount = _lookup(fee_matrix, course, fee_type, payment_method, dan_member)
+        items.append(PriceItem(fee_type, None, amount))
+
+    total = sum((item.amount for item in items), Decimal(0))
+
+    # Apply discount to course fee
+    if discount:
+        discount_amount = (
+            -total * Decimal(course.discount_percentage) / 100
+        ).quantize(CENT, rounding=ROUND_HALF_UP)
+        items.append(PriceItem("discount", None, discount_amount))
+        total += discount_amount
+
+    # Add accommodation fee (not subject to discount)
+    if accommodation_fee is not None:
+        items.append(PriceItem(
+            "accommodation", None, Decimal(accommodation_fee)))
+        total += Decimal(accommodation_fee)
+
+    return PriceResult(
+        fee_type,
+        items,
+        total.quantize(CENT, rounding=ROUND_HALF_UP),
+    )
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_fee_matrix
+from .models import Fee
+
+
+@receiver(post_save, sender=Fee)
+@receiver(post_delete, sender=Fee)
+def fee_changed(sender, **kwargs):
+    invalidate_fee_matrix()
+    # Requests that read the fees before the commit may have cached the
+    # old fees under the new version
+    transaction.on_commit(invalidate_fee_matrix)
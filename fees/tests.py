@@ -1,3 +1,234 @@
-from django.test import TestCase
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from danbw_website import constants
+
+from .cache import (
+    MATRIX_KEY,
+    MATRIX_TIMEOUT,
+    get_course_fees,
+    get_fee_matrix_version,
+    invalidate_fee_matrix,
+    lookup_fee,
+)
+from .models import Fee
+from .pricing import CourseInfo, SessionInfo, price_registration
+
+
+class FeeMatrixCacheTest(TestCase):
+    """Tests for the fee matrix cache"""
+
+    def setUp(self):
+        invalidate_fee_matrix()
+        self.fee = Fee.objects.create(
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+            fee_type="single_session",
+            amount=Decimal("10.00"),
+            extra_fee_cash=Decimal("2.00"),
+            extra_fee_external=Decimal("5.00"),
+        )
+
+    def test_get_fee_without_queries_on_warm_cache(self):
+        print("\ntest_get_fee_without_queries_on_warm_cache")
+        lookup_fee("dan_bw_teacher", "regular", "single_session")
+
+        with self.assertNumQueries(0):
+            fee = Fee.get_fee(
+                "dan_bw_teacher", "regular", "single_session", 1, False)
+            missing_fee = Fee.get_fee(
+                "dan_bw_teacher", "regular", "entire_course", 1, False,
+                default=None,
+            )
+            course_fees = get_course_fees("dan_bw_teacher", "regular")
+
+        self.assertEqual(fee, Decimal("17.00"))
+        self.assertIsNone(missing_fee)
+        self.assertEqual(course_fees, [self.fee])
+
+    def test_cache_invalidated_on_save(self):
+        print("\ntest_cache_invalidated_on_save")
+        lookup_fee("dan_bw_teacher", "regular", "single_session")
+
+        self.fee.amount = Decimal("12.00")
+        self.fee.save()
+
+        self.assertEqual(
+            Fee.get_fee("dan_bw_teacher", "regular", "single_session", 0, True),
+            Decimal("12.00"),
+        )
+
+    def test_cache_invalidated_on_delete(self):
+        print("\ntest_cache_invalidated_on_delete")
+        lookup_fee("dan_bw_teacher", "regular", "single_session")
+
+        self.fee.delete()
+
+        self.assertIsNone(
+            lookup_fee("dan_bw_teacher", "regular", "single_session"))
+
+
+    def test_cache_invalidated_after_commit(self):
+        print("\ntest_cache_invalidated_after_commit")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fee.amount = Decimal("12.00")
+            self.fee.save()
+            # Another request read the fees before the commit
+            stale_fee = Fee.objects.get(pk=self.fee.pk)
+            stale_fee.amount = Decimal("10.00")
+            cache.set(MATRIX_KEY.format(version=get_fee_matrix_version()), [stale_fee])
+
+        self.assertEqual(
+            lookup_fee("dan_bw_teacher", "regular", "single_session").amount,
+            Decimal("12.00"),
+        )
+
+    def test_cache_expires(self):
+        print("\ntest_cache_expires")
+        lookup_fee("dan_bw_teacher", "regular", "single_session")
+        # A change that did not invalidate the cache
+        Fee.objects.filter(pk=self.fee.pk).update(amount=Decimal("12.00"))
+        cache.delete(MATRIX_KEY.format(version=get_fee_matrix_version()))
+
+        self.assertEqual(
+            lookup_fee("dan_bw_teacher", "regular", "single_session").amount,
+            Decimal("10.00"),
+        )
+        with patch("fees.cache.time.monotonic", return_value=time.monotonic() + MATRIX_TIMEOUT):
+            self.assertEqual(
+                lookup_fee("dan_bw_teacher", "regular", "single_session").amount,
+                Decimal("12.00"),
+            )
+
+
+class PricingPropertyTest(SimpleTestCase):
+    """Property tests for the pricing engine on randomly generated courses.
+    The generator is seeded, so failures are reproducible.
+    """
+
+    runs = 500
+
+    def setUp(self):
+        self.random = random.Random(20240601)
+
+    def random_amount(self, maximum=100):
+        return Decimal(self.random.randint(0, maximum * 100)) / 100
+
+    def random_fee_matrix(self, course_type, fee_category):
+        return {
+            (course_type, fee_category, fee_type): Fee(
+                course_type=course_type,
+                fee_category=fee_category,
+                fee_type=fee_type,
+                amount=self.random_amount(),
+                extra_fee_cash=self.random_amount(10),
+                extra_fee_external=self.random_amount(10),
+            )
+            for fee_type, _ in Fee.FEE_TYPES
+        }
+
+    def random_case(self):
+        """Returns a random course, selected sessions and fee matrix."""
+        course_type = self.random.choice(constants.COURSE_TYPES)[0]
+        fee_category = self.random.choice(constants.FEE_CATEGORIES)[0]
+        start = date(2024, 6, 1)
+        sessions = tuple(
+            SessionInfo(
+                start + timedelta(days=self.random.randint(0, 3)),
+                self.random.random() < 0.3,
+                self.random_amount() if self.random.random() < 0.2 else None,
+            )
+            for _ in range(self.random.randint(1, 8))
+        )
+        course = CourseInfo(
+            course_type,
+            fee_category,
+            any(session.is_dan_preparation for session in sessions),
+            self.random.choice([0, 10, 25, 50, 100]),
+            sessions,
+        )
+        selected_sessions = self.random.sample(
+            sessions, self.random.randint(1, len(sessions)))
+        return course, selected_sessions, self.random_fee_matrix(
+            course_type, fee_category)
+
+    def test_total_is_sum_of_items_in_cents(self):
+        print("\ntest_total_is_sum_of_items_in_cents")
+        for _ in range(self.runs):
+            course, selected_sessions, fee_matrix = self.random_case()
+            result = price_registration(
+                course,
+                selected_sessions,
+                fee_matrix,
+                payment_method=self.random.choice([constants.BANK, constants.CASH]),
+                dan_member=self.random.random() < 0.5,
+                discount=self.random.random() < 0.5,
+                accommodation_fee=self.random.choice([None, self.random_amount()]),
+            )
+            self.assertIsInstance(result.total, Decimal)
+            self.assertEqual(result.total, result.total.quantize(Decimal("0.01")))
+            self.assertEqual(
+                result.total, sum(item.amount for item in result.items))
+            self.assertGreaterEqual(result.total, 0)
+
+    def test_surcharges_and_discount_are_monotonic(self):
+        print("\ntest_surcharges_and_discount_are_monotonic")
+        for _ in range(self.runs):
+            course, selected_sessions, fee_matrix = self.random_case()
+
+            def total(**kwargs):
+                return price_registration(
+                    course, selected_sessions, fee_matrix, **kwargs).total
+
+            base = total(payment_method=constants.BANK, dan_member=True)
+            self.assertGreaterEqual(
+                total(payment_method=constants.CASH, dan_member=True), base)
+            self.assertGreaterEqual(
+                total(payment_method=constants.BANK, dan_member=False), base)
+            self.assertLessEqual(
+                total(payment_method=constants.BANK, dan_member=True, discount=True),
+                base,
+            )
+
+    def test_accommodation_fee_is_not_discounted(self):
+        print("\ntest_accommodation_fee_is_not_discounted")
+        for _ in range(self.runs):
+            course, selected_sessions, fee_matrix = self.random_case()
+            accommodation_fee = self.random_amount()
+            without = price_registration(
+                course, selected_sessions, fee_matrix, discount=True)
+            with_accommodation = price_registration(
+                course,
+                selected_sessions,
+                fee_matrix,
+                discount=True,
+                accommodation_fee=accommodation_fee,
+            )
+            self.assertEqual(
+                with_accommodation.total, without.total + accommodation_fee)
+
+    def test_fee_type_does_not_depend_on_session_order(self):
+        print("\ntest_fee_type_does_not_depend_on_session_order")
+        for _ in range(self.runs):
+            course, selected_sessions, fee_matrix = self.random_case()
+            result = price_registration(course, selected_sessions, fee_matrix)
+            shuffled = list(selected_sessions)
+            self.random.shuffle(shuffled)
+            shuffled_result = price_registration(course, shuffled, fee_matrix)
+            self.assertEqual(result.fee_type, shuffled_result.fee_type)
+            self.assertEqual(result.total, shuffled_result.total)
+
+    def test_missing_fee_raises_value_error(self):
+        print("\ntest_missing_fee_raises_value_error")
+        for _ in range(self.runs):
+            course, selected_sessions, fee_matrix = self.random_case()
+            if all(session.price_override is not None for session in selected_sessions):
+                continue
+            with self.assertRaises(ValueError):
+                price_registration(course, selected_sessions, {})
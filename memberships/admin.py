@@ -7,14 +7,25 @@ from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
 from danbw_website import utils
+from danbw_website.admin_actions import toggled, update_selected
 
 from .models import ChildrensPassport, DanBwMembership, DanIntMembership
 
 
+def mark_passport_issued(modeladmin, request, queryset):
+    update_selected(modeladmin, request, queryset, passport_issued=True)
+
+
+mark_passport_issued.short_description = _("Mark passports as issued")
+
+
 def toggle_passport_issued(modeladmin, request, queryset):
-    for obj in queryset:
-        obj.passport_issued = not obj.passport_issued
-        obj.save()
+    update_selected(
+        modeladmin,
+        request,
+        queryset,
+        passport_issued=toggled(queryset.model, "passport_issued"),
+    )
 
 
 toggle_passport_issued.short_description = _("Toggle Passport Status")
@@ -56,7 +67,7 @@ class BaseMembershipAdmin(admin.ModelAdmin):
         "accept_terms",
         "comment"
     ]
-    actions = [toggle_passport_issued, export_csv]
+    actions = [mark_passport_issued, toggle_passport_issued, export_csv]
 
     def has_add_permission(self, request):
         return "add" in request.path or "change" in request.path
@@ -85,3 +96,5 @@ class ChildrensPassportAdmin(BaseMembershipAdmin):
 @admin.register(DanBwMembership)
 class DanBwMembershipAdmin(BaseMembershipAdmin):
     list_display = BaseMembershipAdmin.list_display
+    # D.A.N. BW memberships come without a passport
+    actions = [export_csv]
@@ -1,5 +1,4 @@
 import os
-from smtplib import SMTPException
 
 from django.contrib import messages
 from django.urls import reverse_lazy
@@ -34,14 +33,10 @@ class BaseMembershipCreateView(generic.CreateView):
         email = form.cleaned_data["email"]
         dojo = form.cleaned_data["dojo"]
 
-        try:
-            utils.send_membership_confirmation(
-                first_name, email, self.membership_type)
-            utils.send_membership_notification(
-                first_name, last_name, email, dojo, self.membership_type)
-        except SMTPException as e:
-            form.add_error("email", e)
-            return self.form_invalid(form)
+        utils.send_membership_confirmation(
+            first_name, email, self.membership_type)
+        utils.send_membership_notification(
+            first_name, last_name, email, dojo, self.membership_type)
 
         message = (
             _("We have received your membership application.") +
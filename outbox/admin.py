@@ -0,0 +1,38 @@
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .models import QueuedEmail
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ["subject", "to", "status", "attempts", "created_at", "sent_at"]
+    list_filter = ["status"]
+    search_fields = ["subject", "to"]
+    readonly_fields = [
+        "subject",
+        "body",
+        "html",
+        "from_email",
+        "to",
+        "cc",
+        "bcc",
+        "reply_to",
+        "headers",
+        "attempts",
+        "last_error",
+        "created_at",
+        "sent_at",
+    ]
+    actions = ["requeue"]
+
+    def requeue(self, request, queryset):
+        """Action for sending failed emails again"""
+        queryset.exclude(status=QueuedEmail.SENT).update(
+            status=QueuedEmail.QUEUED,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+
+    requeue.short_description = _("Send selected emails again")
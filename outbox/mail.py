@@ -0,0 +1,144 @@
+import logging
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+# Emails are given up after this many failed attempts
+MAX_ATTEMPTS = 6
+
+# Delay before the first retry, doubled after every further failure
+RETRY_DELAY = timedelta(minutes=1)
+MAX_RETRY_DELAY = timedelta(hours=2)
+
+# Time after which emails claimed by a worker that did not finish are
+# sent again
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_mail(subject, message, from_email, recipient_list, html=False,
+               cc=None, bcc=None, reply_to=None, headers=None):
+    """Queues an email for the outbox worker. Takes the same arguments
+    as django.core.mail.send_mail.
+    """
+    return QueuedEmail.objects.create(
+        subject=subject,
+        body=message,
+        html=html,
+        from_email=from_email or "",
+        to=list(recipient_list),
+        cc=list(cc or []),
+        bcc=list(bcc or []),
+        reply_to=list(reply_to or []),
+        headers=dict(headers or {}),
+    )
+
+
+def queue_email_message(email):
+    """Queues an EmailMessage for the outbox worker. Attachments and
+    alternative parts are not stored, so messages with them are refused.
+    """
+    if email.attachments or getattr(email, "alternatives", None):
+        raise ValueError(
+            "Emails with attachments or alternatives cannot be queued.")
+    return queue_mail(
+        email.subject,
+        email.body,
+        email.from_email,
+        email.to,
+        html=email.content_subtype == "html",
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+        headers=email.extra_headers,
+    )
+
+
+def retry_delay(attempts):
+    """Returns the delay before the next attempt after `attempts` failures"""
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim_due_emails(batch_size):
+    """Marks a batch of due emails as being sent and returns them. The
+    rows are only locked while they are claimed. Emails of a worker that
+    dies while sending are due again after CLAIM_TIMEOUT.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=(QueuedEmail.QUEUED, QueuedEmail.SENDING),
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "pk")[:batch_size]
+        )
+        QueuedEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            status=QueuedEmail.SENDING,
+            next_attempt_at=now + CLAIM_TIMEOUT,
+        )
+    return emails
+
+
+def close_connection(connection):
+    try:
+        connection.close()
+    except Exception as error:
+        logger.warning("Failed to close the email connection: %s", error)
+
+
+def send_queued_emails(batch_size=50, connection=None):
+    """Sends the queued emails that are due over one reused connection.
+
+    The result of every email is saved as soon as it is known, so emails
+    that were delivered are never sent again. Failed emails, including
+    those that could not be sent because the connection failed, are
+    retried with exponential backoff and marked as failed after
+    MAX_ATTEMPTS. Returns the number of emails sent and the number of
+    failed attempts.
+    """
+    sent = failed = 0
+
+    emails = claim_due_emails(batch_size)
+    if not emails:
+        return sent, failed
+
+    connection = connection or get_connection()
+    is_open = False
+    try:
+        for email in emails:
+            email.attempts += 1
+            try:
+                if not is_open:
+                    connection.open()
+                    is_open = True
+                connection.send_messages([email.to_message(connection)])
+            except Exception as error:
+                logger.warning("Failed to send email %s: %s", email.pk, error)
+                failed += 1
+                email.last_error = str(error)
+                if email.attempts >= MAX_ATTEMPTS:
+                    email.status = QueuedEmail.FAILED
+                else:
+                    email.status = QueuedEmail.QUEUED
+                    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                # The connection may be broken, start with a fresh one
+                close_connection(connection)
+                is_open = False
+            else:
+                sent += 1
+                email.status = QueuedEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ""
+            email.save(update_fields=[
+                "status", "attempts", "next_attempt_at", "last_error", "sent_at"])
+    finally:
+        close_connection(connection)
+
+    return sent, failed
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.mail import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails. Runs as a worker polling the outbox unless "
+        "--once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the emails that are due and exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait when the outbox is empty (default: 5)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Number of emails sent over one connection (default: 50)",
+        )
+
+    def handle(self, *args, **kwargs):
+        while True:
+            sent, failed = send_queued_emails(batch_size=kwargs["batch_size"])
+            if sent or failed or kwargs["once"]:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+
+            if kwargs["once"]:
+                return
+
+            # Go on right away while there is a backlog
+            if sent + failed < kwargs["batch_size"]:
+                time.sleep(kwargs["interval"])
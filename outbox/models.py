@@ -0,0 +1,113 @@
+from django.core.mail import EmailMessage
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class QueuedEmail(models.Model):
+    """Represents an email waiting to be sent by the outbox worker"""
+
+    QUEUED = 0
+    SENT = 1
+    FAILED = 2
+    SENDING = 3
+
+    STATUS_CHOICES = (
+        (QUEUED, _("Queued")),
+        (SENT, _("Sent")),
+        (FAILED, _("Failed")),
+        (SENDING, _("Sending")),
+    )
+
+    subject = models.CharField(
+        _("Subject"),
+        max_length=255,
+    )
+    body = models.TextField(
+        _("Body"),
+    )
+    html = models.BooleanField(
+        _("HTML"),
+        default=False,
+    )
+    from_email = models.CharField(
+        _("From"),
+        max_length=255,
+        blank=True,
+    )
+    to = models.JSONField(
+        _("To"),
+        default=list,
+    )
+    cc = models.JSONField(
+        _("Cc"),
+        default=list,
+        blank=True,
+    )
+    bcc = models.JSONField(
+        _("Bcc"),
+        default=list,
+        blank=True,
+    )
+    reply_to = models.JSONField(
+        _("Reply to"),
+        default=list,
+        blank=True,
+    )
+    headers = models.JSONField(
+        _("Headers"),
+        default=dict,
+        blank=True,
+    )
+    status = models.IntegerField(
+        _("Status"),
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    attempts = models.IntegerField(
+        _("Attempts"),
+        default=0,
+    )
+    next_attempt_at = models.DateTimeField(
+        _("Next Attempt"),
+        default=timezone.now,
+    )
+    last_error = models.TextField(
+        _("Last Error"),
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        _("Created"),
+        auto_now_add=True,
+    )
+    sent_at = models.DateTimeField(
+        _("Sent"),
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+        verbose_name = _("Queued Email")
+        verbose_name_plural = _("Queued Emails")
+
+    def __str__(self):
+        return self.subject
+
+    def to_message(self, connection=None):
+        """Returns the EmailMessage to send"""
+        message = EmailMessage(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email or None,
+            to=self.to,
+            cc=self.cc,
+            bcc=self.bcc,
+            reply_to=self.reply_to,
+            headers=self.headers,
+            connection=connection,
+        )
+        if self.html:
+            message.content_subtype = "html"
+        return message
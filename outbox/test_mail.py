@@ -0,0 +1,182 @@
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPServerDisconnected
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .mail import CLAIM_TIMEOUT, MAX_ATTEMPTS, queue_email_message, queue_mail, send_queued_emails
+from .models import QueuedEmail
+
+
+class OutboxTest(TestCase):
+    """Tests for queueing and sending emails through the outbox"""
+
+    def test_queue_mail(self):
+        print("\ntest_queue_mail")
+        queue_mail("Subject", "Message", "from@example.com", ["to@example.com"])
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.status, QueuedEmail.QUEUED)
+        self.assertEqual(email.to, ["to@example.com"])
+
+    def test_send_queued_emails_command(self):
+        print("\ntest_send_queued_emails_command")
+        queue_mail("Subject", "Message", "from@example.com", ["to@example.com"])
+        message = EmailMessage(
+            "HTML", "<p>Message</p>", "from@example.com", ["to@example.com"])
+        message.content_subtype = "html"
+        queue_email_message(message)
+
+        out = StringIO()
+        call_command("send_queued_emails", "--once", stdout=out)
+
+        self.assertIn("Sent 2 email(s), 0 failed.", out.getvalue())
+        self.assertEqual(
+            [email.subject for email in mail.outbox], ["Subject", "HTML"])
+        self.assertEqual(mail.outbox[1].content_subtype, "html")
+        self.assertEqual(
+            QueuedEmail.objects.filter(status=QueuedEmail.SENT).count(), 2)
+
+        # Sent emails are not sent again
+        call_command("send_queued_emails", "--once", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_queue_email_message_keeps_recipients_and_headers(self):
+        print("\ntest_queue_email_message_keeps_recipients_and_headers")
+        message = EmailMessage(
+            "Subject", "Message", "from@example.com", ["to@example.com"],
+            cc=["cc@example.com"], bcc=["bcc@example.com"],
+            reply_to=["reply@example.com"], headers={"X-Course": "1"},
+        )
+        queue_email_message(message)
+
+        send_queued_emails()
+
+        sent = mail.outbox[0]
+        self.assertEqual(sent.cc, ["cc@example.com"])
+        self.assertEqual(sent.bcc, ["bcc@example.com"])
+        self.assertEqual(sent.reply_to, ["reply@example.com"])
+        self.assertEqual(sent.extra_headers, {"X-Course": "1"})
+        self.assertEqual(
+            sent.recipients(),
+            ["to@example.com", "cc@example.com", "bcc@example.com"])
+
+    def test_queue_email_message_refuses_attachments(self):
+        print("\ntest_queue_email_message_refuses_attachments")
+        message = EmailMessage(
+            "Subject", "Message", "from@example.com", ["to@example.com"])
+        message.attach("list.csv", "a,b", "text/csv")
+        with self.assertRaises(ValueError):
+            queue_email_message(message)
+
+        message = EmailMultiAlternatives(
+            "Subject", "Message", "from@example.com", ["to@example.com"])
+        message.attach_alternative("<p>Message</p>", "text/html")
+        with self.assertRaises(ValueError):
+            queue_email_message(message)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_send_queued_emails_reuses_connection(self):
+        print("\ntest_send_queued_emails_reuses_connection")
+        for i in range(5):
+            queue_mail(f"Subject {i}", "Message", "from@example.com", ["to@example.com"])
+
+        with patch("django.core.mail.backends.locmem.EmailBackend.open") as open_connection:
+            sent, failed = send_queued_emails()
+
+        self.assertEqual((sent, failed), (5, 0))
+        open_connection.assert_called_once()
+
+    def test_send_queued_emails_retries_with_backoff(self):
+        print("\ntest_send_queued_emails_retries_with_backoff")
+        queue_mail("Subject", "Message", "from@example.com", ["to@example.com"])
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=SMTPServerDisconnected("Connection lost"),
+        ):
+            sent, failed = send_queued_emails()
+
+        self.assertEqual((sent, failed), (0, 1))
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.status, QueuedEmail.QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, "Connection lost")
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        QueuedEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_send_queued_emails_gives_up(self):
+        print("\ntest_send_queued_emails_gives_up")
+        email = queue_mail("Subject", "Message", "from@example.com", ["to@example.com"])
+        QueuedEmail.objects.filter(pk=email.pk).update(attempts=MAX_ATTEMPTS - 1)
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=SMTPServerDisconnected("Connection lost"),
+        ):
+            send_queued_emails()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.FAILED)
+        self.assertEqual(email.attempts, MAX_ATTEMPTS)
+
+    def test_send_queued_emails_saves_each_result(self):
+        print("\ntest_send_queued_emails_saves_each_result")
+        for subject in ("a", "b", "c"):
+            queue_mail(subject, "Message", "from@example.com", ["to@example.com"])
+
+        class FailingBackend(EmailBackend):
+            """Sends "a", fails on "b" and cannot reconnect afterwards"""
+
+            opened = 0
+
+            def open(self):
+                self.opened += 1
+                if self.opened > 1:
+                    raise SMTPServerDisconnected("Connection refused")
+
+            def send_messages(self, messages):
+                if messages[0].subject == "b":
+                    raise SMTPServerDisconnected("Connection lost")
+                return super().send_messages(messages)
+
+        sent, failed = send_queued_emails(connection=FailingBackend())
+
+        self.assertEqual((sent, failed), (1, 2))
+        self.assertEqual([email.subject for email in mail.outbox], ["a"])
+        self.assertEqual(
+            list(QueuedEmail.objects.order_by("subject").values_list(
+                "subject", "status", "attempts", "last_error")),
+            [
+                ("a", QueuedEmail.SENT, 1, ""),
+                ("b", QueuedEmail.QUEUED, 1, "Connection lost"),
+                ("c", QueuedEmail.QUEUED, 1, "Connection refused"),
+            ],
+        )
+        self.assertFalse(QueuedEmail.objects.filter(
+            status=QueuedEmail.QUEUED, next_attempt_at__lte=timezone.now()).exists())
+
+    def test_send_queued_emails_releases_abandoned_claims(self):
+        print("\ntest_send_queued_emails_releases_abandoned_claims")
+        email = queue_mail("Subject", "Message", "from@example.com", ["to@example.com"])
+        # Claimed by a worker that died while sending
+        QueuedEmail.objects.filter(pk=email.pk).update(
+            status=QueuedEmail.SENDING, next_attempt_at=timezone.now() + CLAIM_TIMEOUT)
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        QueuedEmail.objects.filter(pk=email.pk).update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(send_queued_emails(), (1, 0))
@@ -3,7 +3,11 @@ from django.utils.translation import gettext_lazy as _
 from django_prose_editor.widgets import AdminProseEditorWidget
 from parler.admin import TranslatableAdmin, TranslatableStackedInline
 
+from danbw_website.admin_actions import toggled, update_selected
+from danbw_website.page_cache import invalidate_page_cache
+
 from .models import Category, Page
+from .navigation import invalidate_navigation
 
 
 @admin.register(Page)
@@ -13,18 +17,33 @@ class PageAdmin(TranslatableAdmin):
     list_display = ("title", "slug", "status", "category")
     search_fields = ["translations__title", "translations__content"]
     list_filter = ("status", "category")
-    actions = ["toggle_status"]
+    actions = ["publish", "unpublish", "toggle_status"]
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
         if db_field.name == "content":
             kwargs["widget"] = AdminProseEditorWidget
         return super().formfield_for_dbfield(db_field, request, **kwargs)
 
+    def update_pages(self, request, queryset, **values):
+        update_selected(self, request, queryset, **values)
+        invalidate_navigation()
+        invalidate_page_cache()
+
+    def publish(self, request, queryset):
+        """Action for publishing pages"""
+        self.update_pages(request, queryset, status=1)
+
+    publish.short_description = _("Publish selected pages")
+
+    def unpublish(self, request, queryset):
+        """Action for setting pages to draft"""
+        self.update_pages(request, queryset, status=0)
+
+    unpublish.short_description = _("Set selected pages to draft")
+
     def toggle_status(self, request, queryset):
         """Action for toggling page status"""
-        for page in queryset:
-            page.status = not page.status
-            page.save()
+        self.update_pages(request, queryset, status=toggled(Page, "status"))
 
     toggle_status.short_description = _("Toggle page status")
 
@@ -1,7 +1,7 @@
-from django.urls import Resolver404, resolve
+from django.utils.functional import SimpleLazyObject
 from django.utils.translation import gettext as _
 
-from .models import Category
+from .navigation import get_navigation
 
 
 def add_categories_to_context(request):
@@ -10,22 +10,23 @@ def add_categories_to_context(request):
     Django documentation for context processors:
     https://docs.djangoproject.com/en/4.2/ref/templates/api/#writing-
     your-own-context-processors
-    """
-    categories = Category.objects.exclude(slug="footer-links")
-
-    try:
-        footer_links = Category.objects.get(slug="footer-links")
-    except Category.DoesNotExist:
-        footer_links = None
 
-    return {"categories": categories, "footer_links": footer_links, "category_slug": None, "page_slug": None}
+    The navigation tree is cached and only loaded when a template uses it.
+    """
+    return {
+        "categories": SimpleLazyObject(
+            lambda: get_navigation()["categories"]),
+        "footer_links": SimpleLazyObject(
+            lambda: get_navigation()["footer_links"]),
+        "category_slug": None,
+        "page_slug": None,
+    }
 
 
 def breadcrumb_context(request):
-    try:
-        url_name = resolve(request.path_info).url_name
-    except Resolver404:
-        url_name = None
+    # The URL has already been resolved for the view
+    resolver_match = getattr(request, "resolver_match", None)
+    url_name = resolver_match.url_name if resolver_match else None
 
     page_name = ""
 
@@ -4,6 +4,8 @@ from django.utils.translation import gettext_lazy as _
 from easy_thumbnails.fields import ThumbnailerImageField
 from parler.models import TranslatableModel, TranslatedFields
 
+from danbw_website.slugs import allocate_slug, save_with_unique_slug
+
 
 class Category(TranslatableModel, models.Model):
     """Represents a category to be used for displaying pages on the website"""
@@ -13,6 +15,7 @@ class Category(TranslatableModel, models.Model):
     )
     slug = models.SlugField(max_length=200, unique=True)
     menu_position = models.IntegerField(_("menu position"), default=0)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
 
     class Meta:
         # https://djangoandy.com/2021/09/01/adjusting-the-plural-of-a-
@@ -39,20 +42,14 @@ class Category(TranslatableModel, models.Model):
         if self.slug and self.slug.startswith(slug):
             return self.slug
 
-        unique_slug = slug
-        num = 1
-
-        while Category.objects.filter(slug=unique_slug).exclude(pk=self.pk).exists():
-            unique_slug = f'{slug}-{num}'
-            num += 1
-
-        return unique_slug
+        return allocate_slug(Category, slug, self)
 
     def save(self, *args, **kwargs):
+        previous_slug = self.slug
         # Only generate slug if we have a title
         if hasattr(self, 'title') and self.title:
             self.slug = self._generate_unique_slug()
-        super().save(*args, **kwargs)
+        save_with_unique_slug(self, previous_slug, super().save, *args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -95,6 +92,10 @@ class Page(TranslatableModel, models.Model):
         _("menu position"),
         default=0,
     )
+    updated_at = models.DateTimeField(
+        _("updated at"),
+        auto_now=True,
+    )
 
     def _generate_unique_slug(self):
         from parler.utils.context import switch_language
@@ -114,20 +115,14 @@ class Page(TranslatableModel, models.Model):
         if self.slug and self.slug.startswith(slug):
             return self.slug
 
-        unique_slug = slug
-        num = 1
-
-        while Page.objects.filter(slug=unique_slug).exclude(pk=self.pk).exists():
-            unique_slug = f'{slug}-{num}'
-            num += 1
-
-        return unique_slug
+        return allocate_slug(Page, slug, self)
 
     def save(self, *args, **kwargs):
+        previous_slug = self.slug
         # Only generate slug if we have a title
         if hasattr(self, 'title') and self.title:
             self.slug = self._generate_unique_slug()
-        super().save(*args, **kwargs)
+        save_with_unique_slug(self, previous_slug, super().save, *args, **kwargs)
 
     def __str__(self):
         return self.title
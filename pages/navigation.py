@@ -0,0 +1,92 @@
+from collections import namedtuple
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import translation
+
+from courses.queries import translations_prefetch
+
+from .models import Category, Page
+
+FOOTER_LINKS_SLUG = "footer-links"
+
+VERSION_KEY = "pages:navigation:version"
+TREE_KEY = "pages:navigation:{version}:{language}"
+
+# Upper limit for the time a navigation tree is cached, in seconds, in
+# case an invalidation does not reach a process
+TREE_TIMEOUT = 10 * 60
+
+NavigationPage = namedtuple("NavigationPage", ["slug", "title"])
+
+NavigationCategory = namedtuple("NavigationCategory", ["slug", "title", "pages"])
+
+
+def _get_version():
+    """Returns the current navigation version shared by all processes."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def build_navigation(language_code):
+    """Loads the categories and their published pages with the titles in
+    the given language. Returns a dict with the menu `categories` and the
+    `footer_links` category (or None).
+    """
+    with translation.override(language_code):
+        categories = Category.objects.prefetch_related(
+            translations_prefetch(Category),
+            Prefetch(
+                "pages",
+                queryset=Page.objects.filter(status=1).prefetch_related(
+                    translations_prefetch(Page)
+                ),
+            ),
+        )
+        nodes = [
+            NavigationCategory(
+                category.slug,
+                category.safe_translation_getter("title", any_language=True),
+                [
+                    NavigationPage(
+                        page.slug,
+                        page.safe_translation_getter("title", any_language=True),
+                    )
+                    for page in category.pages.all()
+                ],
+            )
+            for category in categories
+        ]
+
+    return {
+        "categories": [
+            node for node in nodes if node.slug != FOOTER_LINKS_SLUG],
+        "footer_links": next(
+            (node for node in nodes if node.slug == FOOTER_LINKS_SLUG), None),
+    }
+
+
+def get_navigation(language_code=None):
+    """Returns the navigation tree of the given or active language.
+
+    The tree is kept in Django's cache and rebuilt after a category or
+    page has changed or at the latest after TREE_TIMEOUT.
+    """
+    language_code = language_code or translation.get_language()
+    key = TREE_KEY.format(version=_get_version(), language=language_code)
+    navigation = cache.get(key)
+    if navigation is None:
+        navigation = build_navigation(language_code)
+        cache.set(key, navigation, timeout=TREE_TIMEOUT)
+    return navigation
+
+
+def invalidate_navigation():
+    """Discards the cached navigation trees of all languages in all
+    processes that share the cache.
+    """
+    cache.set(VERSION_KEY, uuid4().hex, timeout=None)
@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from danbw_website.conditional import touch_translated_object
+from danbw_website.page_cache import invalidate_page_cache
+
+from .models import Category, Page
+from .navigation import invalidate_navigation
+
+CategoryTranslation = Category._parler_meta.root_model
+PageTranslation = Page._parler_meta.root_model
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryTranslation)
+@receiver(post_delete, sender=CategoryTranslation)
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=PageTranslation)
+@receiver(post_delete, sender=PageTranslation)
+def navigation_changed(sender, **kwargs):
+    invalidate_navigation()
+    invalidate_page_cache()
+    # Requests that read the pages before the commit may have cached the
+    # old navigation under the new version
+    transaction.on_commit(invalidate_navigation)
+    transaction.on_commit(invalidate_page_cache)
+
+
+@receiver(post_save, sender=CategoryTranslation)
+@receiver(post_delete, sender=CategoryTranslation)
+@receiver(post_save, sender=PageTranslation)
+@receiver(post_delete, sender=PageTranslation)
+def page_translation_changed(sender, instance, **kwargs):
+    touch_translated_object(instance)
@@ -16,6 +16,15 @@ class TestCategoryModel(TestCase):
         category = Category.objects.get(translations__title="Test Category")
         self.assertEqual(str(category), "Test Category")
 
+    def test_category_save_without_title(self):
+        print("\ntest_category_save_without_title")
+        category = Category.objects.create(title="")
+        self.assertEqual(category.slug, "")
+
+        category = Category(slug="foo")
+        category.save()
+        self.assertEqual(Category.objects.get(pk=category.pk).slug, "foo")
+
 
 class TestPageModel(TestCase):
     """Tests for the Page model"""
@@ -35,3 +44,9 @@ class TestPageModel(TestCase):
         print("\ntest_page_str_method_returns_title")
         page = Page.objects.get(translations__title="Test Page")
         self.assertEqual(str(page), "Test Page")
+
+    def test_page_save_without_title(self):
+        print("\ntest_page_save_without_title")
+        page = Page(slug="foo", category=self.category)
+        page.save()
+        self.assertEqual(Page.objects.get(pk=page.pk).slug, "foo")
@@ -0,0 +1,146 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from users.models import User
+
+from .context_processors import add_categories_to_context
+from .models import Category, Page
+from .navigation import TREE_KEY, _get_version, get_navigation
+
+
+class NavigationTest(TestCase):
+    """Tests for the cached navigation tree"""
+
+    def setUp(self):
+        # Cached navigation trees of other tests may be stale
+        cache.clear()
+        self.category = Category.objects.create(title="Verein", slug="verein")
+        self.category.set_current_language("en")
+        self.category.title = "Club"
+        self.category.save()
+        self.page = Page.objects.create(
+            title="Geschichte",
+            category=self.category,
+            status=1,
+            content="Inhalt",
+        )
+        self.page.set_current_language("en")
+        self.page.title = "History"
+        self.page.content = "Content"
+        self.page.save()
+        self.draft = Page.objects.create(
+            title="Entwurf",
+            category=self.category,
+            status=0,
+            content="Inhalt",
+        )
+        self.footer_links = Category.objects.create(
+            title="Footer Links", slug="footer-links")
+        self.imprint = Page.objects.create(
+            title="Impressum",
+            category=self.footer_links,
+            status=1,
+            content="Inhalt",
+        )
+
+    def test_navigation_tree(self):
+        print("\ntest_navigation_tree")
+        navigation = get_navigation("de")
+
+        self.assertEqual(len(navigation["categories"]), 1)
+        category = navigation["categories"][0]
+        self.assertEqual(category.slug, self.category.slug)
+        self.assertEqual(category.title, "Verein")
+        self.assertEqual(
+            [page.title for page in category.pages], ["Geschichte"])
+        self.assertEqual(
+            [page.slug for page in navigation["footer_links"].pages],
+            [self.imprint.slug],
+        )
+
+        navigation = get_navigation("en")
+        self.assertEqual(navigation["categories"][0].title, "Club")
+        self.assertEqual(
+            navigation["categories"][0].pages[0].title, "History")
+        # Falls back to German
+        self.assertEqual(
+            navigation["footer_links"].pages[0].title, "Impressum")
+
+    def test_navigation_is_cached(self):
+        print("\ntest_navigation_is_cached")
+        get_navigation("de")
+        with self.assertNumQueries(0):
+            get_navigation("de")
+
+    def test_navigation_is_invalidated(self):
+        print("\ntest_navigation_is_invalidated")
+        get_navigation("de")
+
+        self.draft.status = 1
+        self.draft.save()
+        self.assertEqual(
+            [page.title for page in get_navigation("de")["categories"][0].pages],
+            ["Geschichte", "Entwurf"],
+        )
+
+        self.page.set_current_language("de")
+        self.page.title = "Chronik"
+        self.page.save()
+        self.assertEqual(
+            get_navigation("de")["categories"][0].pages[0].title, "Chronik")
+
+        self.draft.delete()
+        self.category.delete()
+        self.assertEqual(get_navigation("de")["categories"], [])
+
+    def test_navigation_is_invalidated_after_commit(self):
+        print("\ntest_navigation_is_invalidated_after_commit")
+        stale_navigation = get_navigation("de")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.status = 1
+            self.draft.save()
+            # Another request built the tree before the commit
+            cache.set(
+                TREE_KEY.format(version=_get_version(), language="de"),
+                stale_navigation,
+            )
+
+        self.assertEqual(
+            [page.title for page in get_navigation("de")["categories"][0].pages],
+            ["Geschichte", "Entwurf"],
+        )
+
+    def test_status_actions_invalidate_navigation(self):
+        print("\ntest_status_actions_invalidate_navigation")
+        admin_user = User.objects.create_superuser(
+            username="admin", password="testpassword", email="admin@example.com")
+        self.client.force_login(admin_user)
+        url = reverse("admin:pages_page_changelist")
+        get_navigation("de")
+
+        self.client.post(url, {"action": "publish", "_selected_action": [self.draft.pk]})
+        titles = [page.title for page in get_navigation("de")["categories"][0].pages]
+        self.assertIn("Entwurf", titles)
+
+        self.client.post(url, {"action": "unpublish", "_selected_action": [self.draft.pk]})
+        titles = [page.title for page in get_navigation("de")["categories"][0].pages]
+        self.assertNotIn("Entwurf", titles)
+
+    def test_context_processor_is_lazy(self):
+        print("\ntest_context_processor_is_lazy")
+        request = RequestFactory().get("/")
+        with self.assertNumQueries(0):
+            context = add_categories_to_context(request)
+
+        self.assertEqual(len(context["categories"]), 1)
+        self.assertTrue(context["footer_links"])
+
+    def test_navigation_in_page(self):
+        print("\ntest_navigation_in_page")
+        response = self.client.get(reverse("home"))
+
+        self.assertContains(response, "Geschichte")
+        self.assertContains(
+            response, reverse("page_detail", kwargs={"slug": self.imprint.slug}))
+        self.assertNotContains(response, "Entwurf")
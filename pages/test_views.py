@@ -1,9 +1,17 @@
+from datetime import date, timedelta
+
 from captcha.models import CaptchaStore
 from django.contrib.messages import get_messages
 from django.core import mail
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from course_registrations.models import CourseRegistration
+from courses.models import ExternalCourse, InternalCourse
+from users.models import User, UserProfile
+
 from .models import Category, Page
 
 
@@ -88,3 +96,101 @@ class PageTest(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
+
+
+class HomePageTest(TestCase):
+    """Tests for HomePage view"""
+
+    def setUp(self):
+        self.upcoming_course = InternalCourse.objects.create(
+            title="Upcoming course",
+            start_date=date.today() + timedelta(days=10),
+            end_date=date.today() + timedelta(days=11),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.distant_course = InternalCourse.objects.create(
+            title="Distant course",
+            start_date=date.today() + timedelta(days=200),
+            end_date=date.today() + timedelta(days=201),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.family_reunion = InternalCourse.objects.create(
+            title="Family reunion",
+            start_date=date.today() + timedelta(days=300),
+            end_date=date.today() + timedelta(days=307),
+            course_type="family_reunion",
+            fee_category="family_reunion",
+        )
+        self.past_course = InternalCourse.objects.create(
+            title="Past course",
+            start_date=date.today() - timedelta(days=10),
+            end_date=date.today() - timedelta(days=9),
+            course_type="dan_bw_teacher",
+            fee_category="regular",
+        )
+        self.external_course = ExternalCourse.objects.create(
+            title="External course",
+            start_date=date.today() + timedelta(days=20),
+            end_date=date.today() + timedelta(days=21),
+        )
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        UserProfile.objects.create(user=self.user)
+
+    def test_upcoming_courses(self):
+        print("\ntest_upcoming_courses")
+        response = self.client.get(reverse("home"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context["upcoming_courses"],
+            [self.upcoming_course, self.external_course, self.family_reunion],
+        )
+        self.assertIsInstance(
+            response.context["upcoming_courses"][1], ExternalCourse)
+        self.assertContains(response, "External course")
+
+    def test_upcoming_courses_user_registered(self):
+        print("\ntest_upcoming_courses_user_registered")
+        registration = CourseRegistration.objects.create(
+            user=self.user, course=self.upcoming_course, accept_terms=True)
+        CourseRegistration.objects.create(
+            user=self.user, course=self.past_course, accept_terms=True)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("home"))
+
+        upcoming_courses = response.context["upcoming_courses"]
+        self.assertTrue(upcoming_courses[0].user_registered)
+        self.assertFalse(upcoming_courses[2].user_registered)
+        self.assertEqual(
+            list(response.context["upcoming_registrations"]), [registration])
+
+    def test_home_page_query_count_is_constant(self):
+        print("\ntest_home_page_query_count_is_constant")
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("home"))
+        query_count = len(queries)
+
+        for i in range(10):
+            course = InternalCourse.objects.create(
+                title=f"Course {i}",
+                start_date=date.today() + timedelta(days=i),
+                end_date=date.today() + timedelta(days=i),
+                course_type="dan_bw_teacher",
+                fee_category="regular",
+            )
+            CourseRegistration.objects.create(
+                user=self.user, course=course, accept_terms=True)
+            ExternalCourse.objects.create(
+                title=f"External course {i}",
+                start_date=date.today() + timedelta(days=i),
+                end_date=date.today() + timedelta(days=i),
+            )
+
+        with self.assertNumQueries(query_count):
+            self.client.get(reverse("home"))
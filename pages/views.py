@@ -1,64 +1,37 @@
 import os
-from datetime import date, timedelta
 
 from django.contrib import messages
 from django.core.mail import BadHeaderError, EmailMessage
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render, reverse
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext as _
 from django.views import View, generic
 
 from course_registrations.models import CourseRegistration
-from courses.models import ExternalCourse, InternalCourse
+from courses.queries import get_upcoming_courses
+from danbw_website.conditional import content_condition
+from danbw_website.page_cache import cache_anonymous_page
+from danbw_website.ratelimit import rate_limit
 
 from . import forms
 from .models import Category, Page
 
 
+@method_decorator(cache_anonymous_page, name="dispatch")
 class HomePage(View):
     """Displays the home page"""
 
     def get(self, request):
-        all_courses = (
-            list(InternalCourse.objects.all()) +
-            list(ExternalCourse.objects.all())
-        )
-
         num_days = 120
-        upcoming_courses = []
-        upcoming_courses = [
-            course
-            for course in all_courses
-            if course.end_date >= date.today()
-            and (course.end_date <= date.today() + timedelta(days=num_days)
-                 or (hasattr(course, 'course_type') and course.course_type == 'family_reunion'))
-        ]
-
-        upcoming_courses.sort(key=lambda course: course.start_date)
-
-        for course in upcoming_courses:
-            if (
-                request.user.is_authenticated and
-                course.get_course_type() == "InternalCourse"
-            ):
-                course.user_registered = CourseRegistration.objects.filter(
-                    user=request.user, course=course
-                ).exists()
-            else:
-                course.user_registered = False
+        upcoming_courses = get_upcoming_courses(request.user, num_days)
 
         upcoming_registrations = []
         if request.user.is_authenticated:
-            all_registrations = CourseRegistration.objects.filter(
-                user=request.user
-            )
-            upcoming_registrations = [
-                registration
-                for registration in all_registrations
-                if registration.course.end_date >= date.today()
-                and (registration.course.end_date <= date.today() + timedelta(days=num_days)
-                     or (hasattr(registration.course, 'course_type') and registration.course.course_type == 'family_reunion'))
-            ]
+            upcoming_registrations = CourseRegistration.objects.filter(
+                user=request.user,
+                course__in=[course.pk for course in upcoming_courses],
+            ).select_related("course")
 
         return render(
             request,
@@ -70,6 +43,7 @@ class HomePage(View):
         )
 
 
+@method_decorator(rate_limit("contact", email_field="from_email"), name="post")
 class ContactPage(View):
     """Displays contact information and a contact form
     Instructions from: https://learndjango.com/tutorials/django-email-
@@ -125,6 +99,8 @@ class ContactPage(View):
             )
 
 
+@method_decorator(content_condition(Category, Page), name="dispatch")
+@method_decorator(cache_anonymous_page, name="dispatch")
 class PageDetail(generic.DetailView):
     """Displays a single page"""
     model = Page
@@ -150,6 +126,8 @@ class PageDetail(generic.DetailView):
         return context
 
 
+@method_decorator(content_condition(Category, Page), name="dispatch")
+@method_decorator(cache_anonymous_page, name="dispatch")
 class PageList(generic.ListView):
     """Displays a list of pages of a given category"""
     model = Page
@@ -4,9 +4,19 @@ from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
 from danbw_website import constants
+from danbw_website.slugs import allocate_slug, save_with_unique_slug
 
 
 class User(AbstractUser):
+    calendar_token = models.CharField(
+        _("Calendar token"),
+        max_length=64,
+        unique=True,
+        blank=True,
+        null=True,
+        help_text=_("Secret token of the personal calendar feed."),
+    )
+
     def __str__(self):
         return self.first_name + " " + self.last_name
 
@@ -24,19 +34,13 @@ class UserProfile(models.Model):
 
     def _generate_unique_slug(self):
         slug = slugify(f"{self.user.first_name}-{self.user.last_name}").lower()
-        unique_slug = slug
-        num = 1
-
-        while UserProfile.objects.filter(slug=unique_slug).exists():
-            unique_slug = f'{slug}-{num}'
-            num += 1
-
-        return unique_slug
+        return allocate_slug(UserProfile, slug, self)
 
     # Overriding save method: https://docs.djangoproject.com/en/4.2
     # /topics/db/models/#overriding-predefined-model-methods
     def save(self, *args, **kwargs):
         # Create slug from another field: https://stackoverflow.com/a/837835
+        previous_slug = self.slug
         if not self.slug:
             self.slug = self._generate_unique_slug()
-        super().save(*args, **kwargs)
+        save_with_unique_slug(self, previous_slug, super().save, *args, **kwargs)